@@ -18,6 +18,8 @@ from app.core.config import settings
 from app.models.company import Company
 from app.models.product import Product
 from app.models.transaction import Transaction
+from app.models.country import Country
+from app.models.region import Region
 from app.models.license import License
 from app.models.contact import Contact
 
@@ -0,0 +1,117 @@
+"""Numeric prospect and contact features
+
+Adds the numeric company columns (revenue, purchasing volume, employee range
+bounds, last contact time), turns contact relationship scores into integers
+and replaces the relative last interaction strings with timestamps. Existing
+values are converted with the parsers of app.core.features; company sizes
+that are employee ranges fill the employee range bounds.
+
+Databases created by init_db after this change already have the new schema,
+so every step checks the current columns first.
+
+Revision ID: 3f2a9c1d7b64
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.features import format_employee_range, format_relative_time, parse_employee_range, parse_relative_time
+
+# revision identifiers, used by Alembic.
+revision: str = "3f2a9c1d7b64"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# New company columns and whether each is indexed
+COMPANY_COLUMNS = [
+    ("revenue_usd", sa.Float(), True),
+    ("purchasing_volume_usd", sa.Float(), True),
+    ("employees_min", sa.Integer(), True),
+    ("employees_max", sa.Integer(), False),
+    ("last_contact_at", sa.DateTime(), True),
+]
+
+
+def _columns(table: str) -> dict:
+    """Current columns of a table by name."""
+    return {column["name"]: column for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    company_columns = _columns("company")
+    for name, column_type, indexed in COMPANY_COLUMNS:
+        if name not in company_columns:
+            op.add_column("company", sa.Column(name, column_type, nullable=True))
+            if indexed:
+                op.create_index(f"ix_company_{name}", "company", [name])
+    # Sizes written as employee ranges fill the range bounds
+    for company_id, size in bind.execute(
+        sa.text("SELECT id, size FROM company WHERE size IS NOT NULL AND employees_min IS NULL")
+    ).all():
+        low, high = parse_employee_range(size)
+        if low is not None:
+            bind.execute(
+                sa.text("UPDATE company SET employees_min = :low, employees_max = :high WHERE id = :id"),
+                {"low": low, "high": high, "id": company_id},
+            )
+
+    contact_columns = _columns("contact")
+    if not isinstance(contact_columns["relationship_score"]["type"], sa.Integer):
+        op.alter_column(
+            "contact", "relationship_score", type_=sa.Integer(), existing_nullable=True,
+            postgresql_using="round(NULLIF(regexp_replace(relationship_score, '[^0-9.]', '', 'g'), '')::numeric)::integer",
+        )
+        op.create_index("ix_contact_relationship_score", "contact", ["relationship_score"])
+    if "last_interaction" in contact_columns:
+        if "last_interaction_at" not in contact_columns:
+            op.add_column("contact", sa.Column("last_interaction_at", sa.DateTime(), nullable=True))
+            op.create_index("ix_contact_last_interaction_at", "contact", ["last_interaction_at"])
+        # Relative times are resolved against the time of the migration
+        for contact_id, last_interaction in bind.execute(
+            sa.text("SELECT id, last_interaction FROM contact WHERE last_interaction IS NOT NULL")
+        ).all():
+            bind.execute(
+                sa.text("UPDATE contact SET last_interaction_at = :at WHERE id = :id"),
+                {"at": parse_relative_time(last_interaction), "id": contact_id},
+            )
+        op.drop_column("contact", "last_interaction")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+
+    op.add_column("contact", sa.Column("last_interaction", sa.String(100), nullable=True))
+    for contact_id, last_interaction_at in bind.execute(
+        sa.text("SELECT id, last_interaction_at FROM contact WHERE last_interaction_at IS NOT NULL")
+    ).all():
+        bind.execute(
+            sa.text("UPDATE contact SET last_interaction = :text WHERE id = :id"),
+            {"text": format_relative_time(last_interaction_at), "id": contact_id},
+        )
+    op.drop_index("ix_contact_last_interaction_at", table_name="contact")
+    op.drop_column("contact", "last_interaction_at")
+    op.drop_index("ix_contact_relationship_score", table_name="contact")
+    op.alter_column(
+        "contact", "relationship_score", type_=sa.String(50), existing_nullable=True,
+        postgresql_using="relationship_score::text",
+    )
+
+    # Sizes were the only employee figures before; keep the ranges there
+    for company_id, low, high in bind.execute(
+        sa.text("SELECT id, employees_min, employees_max FROM company WHERE employees_min IS NOT NULL AND size IS NULL")
+    ).all():
+        bind.execute(
+            sa.text("UPDATE company SET size = :size WHERE id = :id"),
+            {"size": format_employee_range(low, high), "id": company_id},
+        )
+    for name, _, indexed in reversed(COMPANY_COLUMNS):
+        if indexed:
+            op.drop_index(f"ix_company_{name}", table_name="company")
+        op.drop_column("company", name)
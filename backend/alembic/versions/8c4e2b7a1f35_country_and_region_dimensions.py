@@ -0,0 +1,147 @@
+"""Country and region dimension tables for transactions
+
+Replaces the source_country and destination_country names of transactions
+with SMALLINT codes of a country dimension table, whose countries reference
+a region table. The dimension tables are created if missing and filled with
+the regions and countries of REGION_COUNTRIES and every other country name
+found in transactions; the codes are then backfilled by joining on the
+country name, compared case-insensitively like resolve_country_ids does.
+
+The monthly trade aggregate reads the country columns, so it is dropped
+first; setup_trade_aggregates recreates it on the next start.
+
+Databases created by init_db after this change already have the new schema,
+so every step checks the current schema first.
+
+Revision ID: 8c4e2b7a1f35
+Revises: 3f2a9c1d7b64
+Create Date: 2026-10-19 03:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.geography import REGION_COUNTRIES
+
+# revision identifiers, used by Alembic.
+revision: str = "8c4e2b7a1f35"
+down_revision: Union[str, None] = "3f2a9c1d7b64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Country name column of transactions and the code column replacing it
+COUNTRY_COLUMNS = [("source_country", "source_country_id"), ("destination_country", "destination_country_id")]
+
+# SQLite only auto-increments INTEGER primary keys
+_CODE_TYPE = sa.SmallInteger().with_variant(sa.Integer(), "sqlite")
+
+_region = sa.table("region", sa.column("id"), sa.column("name"))
+_country = sa.table("country", sa.column("id"), sa.column("name"), sa.column("region_id"))
+
+
+def _columns(table: str) -> dict:
+    """Current columns of a table by name."""
+    return {column["name"]: column for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _drop_trade_aggregate() -> None:
+    """Drop the monthly trade aggregate, which reads the transaction columns being changed."""
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP MATERIALIZED VIEW IF EXISTS trade_monthly CASCADE")
+
+
+def _create_dimensions() -> None:
+    """Create the region and country tables if missing and add the known regions and countries."""
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+    if "region" not in tables:
+        op.create_table(
+            "region",
+            sa.Column("id", _CODE_TYPE, primary_key=True, autoincrement=True),
+            sa.Column("name", sa.String(100), nullable=False, unique=True),
+        )
+    if "country" not in tables:
+        op.create_table(
+            "country",
+            sa.Column("id", _CODE_TYPE, primary_key=True, autoincrement=True),
+            sa.Column("name", sa.String(100), nullable=False, unique=True),
+            sa.Column("region_id", sa.SmallInteger(), sa.ForeignKey("region.id"), nullable=True),
+        )
+        op.create_index("ix_country_region_id", "country", ["region_id"])
+
+    existing_regions = {name for (name,) in bind.execute(sa.select(_region.c.name))}
+    new_regions = [{"name": name} for name in REGION_COUNTRIES if name not in existing_regions]
+    if new_regions:
+        op.bulk_insert(_region, new_regions)
+    region_ids = dict(bind.execute(sa.select(_region.c.name, _region.c.id)).all())
+
+    country_regions = {country: region for region, countries in REGION_COUNTRIES.items() for country in countries}
+    names = list(country_regions)
+    transaction_columns = _columns("transaction")
+    for name_column, _ in COUNTRY_COLUMNS:
+        if name_column in transaction_columns:
+            names += [
+                name for (name,) in bind.execute(
+                    sa.text(f'SELECT DISTINCT {name_column} FROM "transaction" WHERE {name_column} IS NOT NULL')
+                )
+            ]
+
+    known = {name.lower() for (name,) in bind.execute(sa.select(_country.c.name))}
+    new_countries = []
+    for name in names:
+        if name.lower() not in known:
+            known.add(name.lower())
+            new_countries.append({"name": name, "region_id": region_ids.get(country_regions.get(name))})
+    if new_countries:
+        op.bulk_insert(_country, new_countries)
+
+
+def upgrade() -> None:
+    _create_dimensions()
+
+    transaction_columns = _columns("transaction")
+    if all(code_column in transaction_columns for _, code_column in COUNTRY_COLUMNS):
+        return
+    _drop_trade_aggregate()
+
+    with op.batch_alter_table("transaction") as batch:
+        for _, code_column in COUNTRY_COLUMNS:
+            batch.add_column(sa.Column(code_column, sa.SmallInteger(), nullable=True))
+    for name_column, code_column in COUNTRY_COLUMNS:
+        op.execute(
+            f'UPDATE "transaction" SET {code_column} = '
+            f'(SELECT country.id FROM country WHERE lower(country.name) = lower("transaction".{name_column}))'
+        )
+    with op.batch_alter_table("transaction") as batch:
+        for name_column, code_column in COUNTRY_COLUMNS:
+            batch.alter_column(code_column, existing_type=sa.SmallInteger(), nullable=False)
+            batch.create_foreign_key(f"transaction_{code_column}_fkey", "country", [code_column], ["id"])
+            batch.create_index(f"ix_transaction_{code_column}", [code_column])
+            batch.drop_index(f"ix_transaction_{name_column}")
+            batch.drop_column(name_column)
+
+
+def downgrade() -> None:
+    _drop_trade_aggregate()
+
+    with op.batch_alter_table("transaction") as batch:
+        for name_column, _ in COUNTRY_COLUMNS:
+            batch.add_column(sa.Column(name_column, sa.String(100), nullable=True))
+    for name_column, code_column in COUNTRY_COLUMNS:
+        op.execute(
+            f'UPDATE "transaction" SET {name_column} = '
+            f'(SELECT country.name FROM country WHERE country.id = "transaction".{code_column})'
+        )
+    with op.batch_alter_table("transaction") as batch:
+        for name_column, code_column in COUNTRY_COLUMNS:
+            batch.alter_column(name_column, existing_type=sa.String(100), nullable=False)
+            batch.create_index(f"ix_transaction_{name_column}", [name_column])
+            batch.drop_index(f"ix_transaction_{code_column}")
+            batch.drop_constraint(f"transaction_{code_column}_fkey", type_="foreignkey")
+            batch.drop_column(code_column)
+
+    op.drop_index("ix_country_region_id", table_name="country")
+    op.drop_table("country")
+    op.drop_table("region")
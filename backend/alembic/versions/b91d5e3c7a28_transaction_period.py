@@ -0,0 +1,88 @@
+"""Transaction period and product type
+
+Adds the period column (first day of the transaction month) that the
+TimescaleDB hypertable is partitioned on, backfilled from year and month
+with period_for, and makes the primary key (id, period) as hypertables
+require. Also adds the product_type column the monthly trade aggregate
+groups by, backfilled from the form of each transaction's product.
+
+The transaction table is turned into a hypertable by setup_trade_aggregates
+on the next start, once the period is in the primary key.
+
+Databases created by init_db after this change already have the new schema,
+so every step checks the current schema first.
+
+Revision ID: b91d5e3c7a28
+Revises: 8c4e2b7a1f35
+Create Date: 2026-10-19 03:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.models.transaction import period_for
+
+# revision identifiers, used by Alembic.
+revision: str = "b91d5e3c7a28"
+down_revision: Union[str, None] = "8c4e2b7a1f35"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _columns(table: str) -> dict:
+    """Current columns of a table by name."""
+    return {column["name"]: column for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _primary_key() -> dict:
+    """Primary key constraint of the transaction table."""
+    return sa.inspect(op.get_bind()).get_pk_constraint("transaction")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    transaction_columns = _columns("transaction")
+    if "product_type" not in transaction_columns:
+        op.add_column("transaction", sa.Column("product_type", sa.String(50), nullable=True))
+        op.create_index("ix_transaction_product_type", "transaction", ["product_type"])
+        op.execute(
+            'UPDATE "transaction" SET product_type = '
+            '(SELECT product.form FROM product WHERE product.id = "transaction".product_id)'
+        )
+
+    if "period" not in transaction_columns:
+        op.add_column("transaction", sa.Column("period", sa.Date(), nullable=True))
+        # Periods only depend on the year and month, so each distinct pair is one update
+        for year, month in bind.execute(sa.text('SELECT DISTINCT year, month FROM "transaction"')).all():
+            month_condition = "month = :month" if month is not None else "month IS NULL"
+            bind.execute(
+                sa.text(f'UPDATE "transaction" SET period = :period WHERE year = :year AND {month_condition}'),
+                {"period": period_for(year, month), "year": year, "month": month},
+            )
+
+    primary_key = _primary_key()
+    if primary_key["constrained_columns"] != ["id", "period"]:
+        with op.batch_alter_table("transaction") as batch:
+            batch.alter_column("period", existing_type=sa.Date(), nullable=False)
+            # SQLite primary keys are unnamed; the recreated table just takes the new one
+            if primary_key["name"]:
+                batch.drop_constraint(primary_key["name"], type_="primary")
+            batch.create_primary_key("transaction_pkey", ["id", "period"])
+
+
+def downgrade() -> None:
+    # Hypertables cannot drop their partitioning column, so this only applies to plain tables
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP MATERIALIZED VIEW IF EXISTS trade_monthly CASCADE")
+
+    primary_key = _primary_key()
+    with op.batch_alter_table("transaction") as batch:
+        if primary_key["name"]:
+            batch.drop_constraint(primary_key["name"], type_="primary")
+        batch.create_primary_key("transaction_pkey", ["id"])
+        batch.drop_column("period")
+        batch.drop_index("ix_transaction_product_type")
+        batch.drop_column("product_type")
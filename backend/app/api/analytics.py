@@ -4,14 +4,19 @@ Analytics API endpoints.
 This module provides API endpoints for tracking usage metrics.
 """
 from typing import Dict, List, Any, Optional
-from fastapi import APIRouter, Depends, Body, HTTPException
+from fastapi import APIRouter, Depends, Body, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
+from app.api.caching import cached_json_response, conditional_response
+from app.core import data_version
 from app.db.session import get_db
 from app.services import analytics as analytics_service
 
 router = APIRouter()
 
+# Data the analytics read endpoints are computed from, for conditional GET
+ANALYTICS_DATA_DOMAINS = (data_version.ANALYTICS,)
+
 
 @router.post("/event", response_model=Dict[str, str])
 async def track_event(
@@ -41,6 +46,8 @@ async def track_event(
 
 @router.get("/metrics", response_model=Dict[str, Any])
 async def get_metrics(
+    request: Request,
+    response: Response,
     metric_type: str,
     time_period: str = "7d",
     db: Session = Depends(get_db),
@@ -51,6 +58,8 @@ async def get_metrics(
     This endpoint retrieves usage metrics from the system.
     
     Args:
+        request: Incoming request, checked for conditional GET validators
+        response: Outgoing response, carrying the ETag and caching headers
         metric_type: Type of metrics to retrieve
         time_period: Time period for the metrics (1d, 7d, 30d, 90d)
         db: Database session
@@ -58,14 +67,23 @@ async def get_metrics(
     Returns:
         Usage metrics
     """
+    cached = conditional_response(request, response, *ANALYTICS_DATA_DOMAINS)
+    if cached is not None:
+        return cached
+    
     try:
-        return analytics_service.get_metrics(db, metric_type, time_period)
+        return cached_json_response(
+            request, response, ANALYTICS_DATA_DOMAINS,
+            lambda: analytics_service.get_metrics(db, metric_type, time_period)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/popular-searches", response_model=List[Dict[str, Any]])
 async def get_popular_searches(
+    request: Request,
+    response: Response,
     limit: int = 10,
     db: Session = Depends(get_db),
 ) -> List[Dict[str, Any]]:
@@ -75,13 +93,22 @@ async def get_popular_searches(
     This endpoint retrieves the most popular searches in the system.
     
     Args:
+        request: Incoming request, checked for conditional GET validators
+        response: Outgoing response, carrying the ETag and caching headers
         limit: Maximum number of searches to return
         db: Database session
         
     Returns:
         List of popular searches
     """
+    cached = conditional_response(request, response, *ANALYTICS_DATA_DOMAINS)
+    if cached is not None:
+        return cached
+    
     try:
-        return analytics_service.get_popular_searches(db, limit)
+        return cached_json_response(
+            request, response, ANALYTICS_DATA_DOMAINS,
+            lambda: analytics_service.get_popular_searches(db, limit)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,174 @@
+"""
+HTTP conditional GET support.
+
+This module derives ETag and Last-Modified validators for read endpoints from
+the data versions they depend on (see app.core.data_version). A request whose
+If-None-Match or If-Modified-Since validator is still current gets a 304 Not
+Modified response before the service function runs, so nothing is computed or
+serialized.
+
+Responses of read endpoints are also kept encoded: cached_json_response
+stores the JSON bytes per request until the data version changes, and
+returns them as a raw Response, which skips response_model validation and
+re-encoding.
+"""
+import hashlib
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Callable, Optional, Sequence
+
+from fastapi import Request, Response
+
+from app.core import data_version
+from app.core.cache import VersionedCache
+from app.core.serialization import dumps
+
+# Distinguishes this process' data versions from those of a previous or other
+# worker process, whose counters may have the same values
+_EPOCH = uuid.uuid4().hex
+
+# Headers set by conditional_response
+CACHE_HEADERS = ("ETag", "Last-Modified", "Cache-Control")
+
+# Seconds a client may reuse a response without revalidating it
+DEFAULT_MAX_AGE = 0
+
+# Headers of the endpoint's response that json_response doesn't carry over
+_BODY_HEADERS = ("content-length", "content-type")
+
+# Encoded responses by request, valid while their data version is current
+_response_cache = VersionedCache(maxsize=1024)
+
+
+def make_etag(request: Request, *domains: str) -> str:
+    """
+    Build a weak ETag for a request from the data versions it depends on.
+
+    Args:
+        request: Incoming request; its path and query are part of the tag
+        domains: Data domains the response is computed from
+
+    Returns:
+        Quoted weak ETag
+    """
+    key = f"{_EPOCH}:{request.url.path}?{request.url.query}:{data_version.get_version(*domains)}"
+    return f'W/"{hashlib.sha1(key.encode()).hexdigest()[:20]}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Check an If-None-Match header against an ETag, using weak comparison."""
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def _not_modified_since(header: str, last_modified: float) -> bool:
+    """Check whether data modified at last_modified is no newer than an If-Modified-Since header."""
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have a resolution of one second
+    return int(last_modified) <= since
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    *domains: str,
+    max_age: int = DEFAULT_MAX_AGE
+) -> Optional[Response]:
+    """
+    Apply conditional GET handling for a read endpoint.
+
+    Sets the ETag, Last-Modified and Cache-Control headers on the endpoint's
+    response. If the request's validators show the client already has the
+    current representation, a 304 response is returned instead, which the
+    endpoint should return right away.
+
+    Args:
+        request: Incoming request
+        response: Response the endpoint's result will be sent with
+        domains: Data domains the response is computed from
+        max_age: Seconds a client may reuse the response without revalidating
+
+    Returns:
+        A 304 Not Modified response, or None if the endpoint should compute its result
+    """
+    etag = make_etag(request, *domains)
+    last_modified = data_version.get_last_modified(*domains)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": f"private, max-age={max_age}, must-revalidate",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        not_modified = if_modified_since is not None and _not_modified_since(if_modified_since, last_modified)
+
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def json_response(payload: bytes, response: Response) -> Response:
+    """
+    Wrap a pre-serialized JSON payload in a response.
+
+    Returning a Response from an endpoint skips response model validation and
+    encoding; headers set on the endpoint's response (e.g. the caching
+    headers conditional_response set) are carried over.
+
+    Args:
+        payload: UTF-8 encoded JSON
+        response: Response the endpoint's headers were set on
+
+    Returns:
+        Response with the payload and headers
+    """
+    headers = {name: value for name, value in response.headers.items() if name not in _BODY_HEADERS}
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+
+def cached_json_response(
+    request: Request,
+    response: Response,
+    domains: Sequence[str],
+    compute: Callable[[], Any]
+) -> Response:
+    """
+    Get the encoded result of a read endpoint, computing and encoding it only if needed.
+
+    The encoded bytes are cached by request path and query parameters until
+    the version of the data they are computed from changes.
+
+    Args:
+        request: Incoming request
+        response: Response the endpoint's headers were set on
+        domains: Data domains the result is computed from
+        compute: Function computing the result
+
+    Returns:
+        Response with the encoded result
+    """
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    # Read the version first, so a change during compute leaves the entry stale
+    version = data_version.get_version(*domains)
+    payload = _response_cache.get(key, version)
+    if payload is None:
+        payload = dumps(compute())
+        _response_cache.set(key, payload, version)
+    return json_response(payload, response)
@@ -4,20 +4,30 @@ Dashboard API endpoints.
 This module provides API endpoints for the market trends dashboard.
 """
 from typing import Dict, List, Any, Optional
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
+from app.api.caching import cached_json_response, conditional_response
+from app.core import data_version
 from app.db.session import get_db
 from app.services import dashboard as dashboard_service
+from app.services.dashboard_stream import broadcaster
 
 router = APIRouter()
 
+# Data the dashboard endpoints are computed from, for conditional GET
+DASHBOARD_DATA_DOMAINS = (data_version.TRADE, data_version.COMPANY)
+
 
 @router.get("/trends", response_model=Dict[str, Any])
 async def get_market_trends(
+    request: Request,
+    response: Response,
     product_type: Optional[str] = Query(None, description="Filter by product type (API/FDF)"),
     region: Optional[str] = Query(None, description="Filter by geographic region"),
     time_period: Optional[str] = Query("12m", description="Time period (1m, 3m, 6m, 12m, 2y)"),
+    max_points: Optional[int] = Query(None, ge=3, description="Maximum number of monthly trend points"),
     db: Session = Depends(get_db),
 ) -> Dict[str, Any]:
     """
@@ -25,71 +35,194 @@ async def get_market_trends(
     
     This endpoint provides aggregated data for the market trends dashboard,
     including global trade volumes, growth rates, and regional breakdowns.
+    With max_points, longer monthly trend series are downsampled to that
+    many points, keeping the shape of the chart. The encoded response is
+    cached per filter set until the trade or company data changes.
     
     Args:
+        request: Incoming request, checked for conditional GET validators
+        response: Outgoing response, carrying the ETag and caching headers
         product_type: Optional filter by product type
         region: Optional filter by geographic region
         time_period: Time period for the data
+        max_points: Optional maximum number of monthly trend points
         db: Database session
         
     Returns:
         Dict containing market trends data
     """
+    cached = conditional_response(request, response, *DASHBOARD_DATA_DOMAINS)
+    if cached is not None:
+        return cached
+    
     try:
-        return dashboard_service.get_market_trends(db, product_type, region, time_period)
+        return cached_json_response(
+            request, response, DASHBOARD_DATA_DOMAINS,
+            lambda: dashboard_service.get_market_trends(db, product_type, region, time_period, max_points)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/top-exporters", response_model=List[Dict[str, Any]])
 async def get_top_exporters(
+    request: Request,
+    response: Response,
     limit: int = Query(5, description="Number of exporters to return"),
     product_type: Optional[str] = Query(None, description="Filter by product type"),
     region: Optional[str] = Query(None, description="Filter by geographic region"),
+    time_period: Optional[str] = Query("12m", description="Time period (1m, 3m, 6m, 12m, 2y)"),
     db: Session = Depends(get_db),
 ) -> List[Dict[str, Any]]:
     """
     Get top pharmaceutical exporters.
     
     This endpoint provides a list of top pharmaceutical exporters
-    based on trade volume, with optional filtering.
+    based on trade volume, with optional filtering. The encoded response
+    is cached until the trade or company data changes.
     
     Args:
+        request: Incoming request, checked for conditional GET validators
+        response: Outgoing response, carrying the ETag and caching headers
         limit: Number of exporters to return
         product_type: Optional filter by product type
         region: Optional filter by geographic region
+        time_period: Time period for the data
         db: Database session
         
     Returns:
         List of top exporters with their details
     """
+    cached = conditional_response(request, response, *DASHBOARD_DATA_DOMAINS)
+    if cached is not None:
+        return cached
+    
     try:
-        return dashboard_service.get_top_exporters(db, limit, product_type, region)
+        return cached_json_response(
+            request, response, DASHBOARD_DATA_DOMAINS,
+            lambda: dashboard_service.get_top_exporters(db, limit, product_type, region, time_period)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/top-products", response_model=List[Dict[str, Any]])
 async def get_top_products(
+    request: Request,
+    response: Response,
     limit: int = Query(10, description="Number of products to return"),
     region: Optional[str] = Query(None, description="Filter by geographic region"),
+    product_type: Optional[str] = Query(None, description="Filter by product type"),
+    time_period: Optional[str] = Query("12m", description="Time period (1m, 3m, 6m, 12m, 2y)"),
     db: Session = Depends(get_db),
 ) -> List[Dict[str, Any]]:
     """
     Get top pharmaceutical products.
     
     This endpoint provides a list of top pharmaceutical products
-    based on trade volume, with optional filtering.
+    based on trade volume, with optional filtering. The encoded response
+    is cached until the trade or company data changes.
     
     Args:
+        request: Incoming request, checked for conditional GET validators
+        response: Outgoing response, carrying the ETag and caching headers
         limit: Number of products to return
         region: Optional filter by geographic region
+        product_type: Optional filter by product type
+        time_period: Time period for the data
         db: Database session
         
     Returns:
         List of top products with their details
     """
+    cached = conditional_response(request, response, *DASHBOARD_DATA_DOMAINS)
+    if cached is not None:
+        return cached
+    
     try:
-        return dashboard_service.get_top_products(db, limit, region)
+        return cached_json_response(
+            request, response, DASHBOARD_DATA_DOMAINS,
+            lambda: dashboard_service.get_top_products(db, limit, region, product_type, time_period)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/snapshot", response_model=Dict[str, Any])
+async def get_dashboard_snapshot(
+    request: Request,
+    response: Response,
+    product_type: Optional[str] = Query(None, description="Filter by product type (API/FDF)"),
+    region: Optional[str] = Query(None, description="Filter by geographic region"),
+    time_period: Optional[str] = Query("12m", description="Time period (1m, 3m, 6m, 12m, 2y)"),
+    exporters_limit: int = Query(5, description="Number of exporters to return"),
+    products_limit: int = Query(10, description="Number of products to return"),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    """
+    Get all dashboard data in one call.
+    
+    This endpoint combines market trends, regional breakdown, monthly trends,
+    top exporters and top products for one filter combination, computed
+    from one slice of the trade data. The encoded response is cached until
+    the trade or company data changes.
+    
+    Args:
+        request: Incoming request, checked for conditional GET validators
+        response: Outgoing response, carrying the ETag and caching headers
+        product_type: Optional filter by product type
+        region: Optional filter by geographic region
+        time_period: Time period for the data
+        exporters_limit: Number of exporters to return
+        products_limit: Number of products to return
+        db: Database session
+        
+    Returns:
+        Dict containing market trends data plus top exporters and top products
+    """
+    cached = conditional_response(request, response, *DASHBOARD_DATA_DOMAINS)
+    if cached is not None:
+        return cached
+    
+    try:
+        return cached_json_response(
+            request, response, DASHBOARD_DATA_DOMAINS,
+            lambda: dashboard_service.get_dashboard_snapshot(
+                db, product_type, region, time_period, exporters_limit, products_limit
+            )
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/stream")
+async def stream_dashboard(
+    request: Request,
+    product_type: Optional[str] = Query(None, description="Filter by product type (API/FDF)"),
+    region: Optional[str] = Query(None, description="Filter by geographic region"),
+    time_period: Optional[str] = Query("12m", description="Time period (1m, 3m, 6m, 12m, 2y)"),
+) -> StreamingResponse:
+    """
+    Stream live dashboard updates as Server-Sent Events.
+    
+    The stream starts with a "snapshot" event holding the same data as
+    /snapshot. Whenever trade data is loaded, a "delta" event with only the
+    changed fields follows; list fields are sent as
+    {"length": n, "items": {index: item}} with the changed positions.
+    
+    Args:
+        request: Incoming request, used to detect disconnects
+        product_type: Optional filter by product type
+        region: Optional filter by geographic region
+        time_period: Time period for the data
+        
+    Returns:
+        Streaming text/event-stream response
+    """
+    filters = {"product_type": product_type, "region": region, "time_period": time_period}
+    return StreamingResponse(
+        broadcaster.events(filters, request.is_disconnected),
+        media_type="text/event-stream",
+        # Disable caching and proxy buffering so events arrive as they are sent
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
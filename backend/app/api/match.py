@@ -5,9 +5,11 @@ This module provides API endpoints for the prospect matching functionality.
 """
 from typing import Dict, List, Any, Optional
 import logging
-from fastapi import APIRouter, Depends, Body, Query, HTTPException
+from fastapi import APIRouter, Depends, Body, Query, HTTPException, Response
 from sqlalchemy.orm import Session
 
+from app.api.caching import json_response
+from app.core.serialization import dumps
 from app.db.session import get_db
 from app.services import matching as matching_service
 
@@ -16,15 +18,23 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Maximum number of prospects resolved by one batch details request
+MAX_BATCH_PROSPECT_IDS = 200
+
+# Maximum number of prospects returned per page
+MAX_PROSPECT_PAGE_SIZE = 100
+
 
 @router.post("/prospects", response_model=List[Dict[str, Any]])
 async def find_prospects(
+    response: Response,
     company_name: str = Body(..., description="Company name"),
     products: List[str] = Body(..., description="List of product names or IDs"),
     licensed_markets: List[str] = Body(..., description="List of licensed markets"),
-    limit: int = Body(10, description="Maximum number of prospects to return"),
+    limit: int = Body(10, ge=1, le=MAX_PROSPECT_PAGE_SIZE, description="Maximum number of prospects to return"),
     use_deep_research: bool = Body(False, description="Whether to use AI-powered deep research"),
     company_website: Optional[str] = Body(None, description="Company website URL (required if use_deep_research is True)"),
+    cursor: Optional[str] = Body(None, description="Cursor from the X-Next-Cursor header of the previous page"),
     db: Session = Depends(get_db),
 ) -> List[Dict[str, Any]]:
     """
@@ -33,13 +43,19 @@ async def find_prospects(
     This endpoint analyzes the input company, products, and licensed markets
     to identify potential buyers across the supplied markets.
     
+    Results are ranked by opportunity score and paginated with a cursor: when
+    more prospects follow, the cursor for the next page is returned in the
+    X-Next-Cursor response header.
+    
     Args:
+        response: Outgoing response, used to set the next-page cursor header
         company_name: Name of the company
         products: List of product names or IDs
         licensed_markets: List of licensed markets
         limit: Maximum number of prospects to return
         use_deep_research: Whether to use AI-powered deep research
         company_website: Company website URL (required if use_deep_research is True)
+        cursor: Cursor of the page to return
         db: Database session
         
     Returns:
@@ -57,25 +73,68 @@ async def find_prospects(
             )
             
         # Call the service function
-        results = matching_service.find_prospects(
-            db, 
-            company_name, 
-            products, 
-            licensed_markets, 
-            limit,
-            use_deep_research,
-            company_website
-        )
+        try:
+            page = matching_service.find_prospects_page(
+                db, 
+                company_name, 
+                products, 
+                licensed_markets, 
+                limit,
+                use_deep_research,
+                company_website,
+                cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        if page["next_cursor"]:
+            response.headers["X-Next-Cursor"] = page["next_cursor"]
         
         # Debug log the results
-        logger.info(f"API result: {len(results)} prospects")
+        logger.info(f"API result: {len(page['items'])} prospects")
         
-        return results
+        # The prospects are plain dicts already, so skip response model validation
+        return json_response(dumps(page["items"]), response)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"API error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/prospects/details", response_model=Dict[str, Dict[str, Any]])
+async def get_prospect_details_batch(
+    prospect_ids: List[str] = Body(..., description="IDs of the prospects"),
+    fields: Optional[List[str]] = Body(None, description="Fields to return for each prospect (default: all)"),
+    db: Session = Depends(get_db),
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Get detailed information about many prospects at once.
+    
+    This endpoint resolves a list of prospect IDs with bulk lookups, so list
+    views can render all prospect cards with a single request. Passing
+    fields lets them skip heavy payloads such as tradingHistory and description.
+    
+    Args:
+        prospect_ids: IDs of the prospects
+        fields: Optional list of fields to return for each prospect
+        db: Database session
+        
+    Returns:
+        Dict mapping each found prospect ID to its details
+    """
+    if len(prospect_ids) > MAX_BATCH_PROSPECT_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_PROSPECT_IDS} prospect IDs can be requested at once"
+        )
+    
+    try:
+        return matching_service.get_prospect_details_batch(db, prospect_ids, fields)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/prospect/{prospect_id}", response_model=Dict[str, Any])
 async def get_prospect_details(
     prospect_id: str,
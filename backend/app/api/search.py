@@ -4,37 +4,122 @@ Search API endpoints.
 This module provides API endpoints for searching products and companies.
 """
 from typing import Dict, List, Any, Optional
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Body, Depends, Query, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
+from app.api.caching import cached_json_response, conditional_response
+from app.core import data_version
+from app.core.trigrams import DEFAULT_THRESHOLD
 from app.db.session import get_db
 from app.services import search as search_service
 
 router = APIRouter()
 
+# Data the region list is computed from, for conditional GET
+REGION_DATA_DOMAINS = (data_version.TRADE, data_version.COMPANY)
+
+# Maximum number of product names resolved by one request
+MAX_RESOLVED_PRODUCTS = 500
+
 
 @router.get("/products", response_model=List[Dict[str, Any]])
 async def search_products(
     query: str = Query(..., description="Search query for product name or code"),
     limit: int = Query(10, description="Maximum number of results to return"),
+    threshold: float = Query(DEFAULT_THRESHOLD, ge=0, le=1, description="Minimum similarity of fuzzy matches"),
+    atc: Optional[str] = Query(None, description="Filter by ATC group (e.g. N02 or C10AA)"),
     db: Session = Depends(get_db),
 ) -> List[Dict[str, Any]]:
     """
     Search for pharmaceutical products.
     
     This endpoint provides search functionality for pharmaceutical products
-    based on name, code, or synonyms.
+    based on name, code, or synonyms. Misspelled queries match products by
+    trigram similarity.
     
     Args:
         query: Search query string
         limit: Maximum number of results to return
+        threshold: Minimum trigram similarity of fuzzy matches
+        atc: Optional ATC group filter, at any level
         db: Database session
         
     Returns:
         List of matching products
     """
     try:
-        return search_service.search_products(db, query, limit)
+        return search_service.search_products(db, query, limit, threshold, atc)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/products/resolve", response_model=List[Dict[str, Any]])
+async def resolve_products(
+    names: List[str] = Body(..., description="Product names, synonyms or ATC codes"),
+    threshold: float = Body(DEFAULT_THRESHOLD, ge=0, le=1, description="Minimum similarity of fuzzy matches"),
+    db: Session = Depends(get_db),
+) -> List[Dict[str, Any]]:
+    """
+    Resolve a list of product names to product IDs.
+    
+    This endpoint resolves pasted product lists in one request, so that
+    match requests can work on product IDs. Each entry gets the best
+    matching product, exactly by name, synonym or code or else by trigram
+    similarity, with the confidence of the match.
+    
+    Args:
+        names: Product names, synonyms or ATC codes
+        threshold: Minimum trigram similarity of fuzzy matches
+        db: Database session
+        
+    Returns:
+        One resolution per entry, in order, with query, id, api_name, match and confidence
+    """
+    if len(names) > MAX_RESOLVED_PRODUCTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_RESOLVED_PRODUCTS} product names can be resolved at once"
+        )
+    
+    try:
+        return search_service.resolve_products(db, names, threshold)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/atc", response_model=Dict[str, Any])
+async def browse_atc(
+    request: Request,
+    response: Response,
+    code: Optional[str] = Query(None, description="ATC group (e.g. N02 or C10AA); omit for the main groups"),
+    limit: int = Query(50, ge=0, description="Maximum number of products to return"),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    """
+    Browse products by ATC group.
+    
+    This endpoint returns an ATC group with its product count, its
+    subgroups one level down with their counts, and its products.
+    
+    Args:
+        request: Incoming request, checked for conditional GET validators
+        response: Outgoing response, carrying the ETag and caching headers
+        code: Optional ATC group or code prefix
+        limit: Maximum number of products to return
+        db: Database session
+        
+    Returns:
+        Dictionary with the group's code, level, count, children and products
+    """
+    cached = conditional_response(request, response, data_version.PRODUCT)
+    if cached is not None:
+        return cached
+    
+    try:
+        return cached_json_response(
+            request, response, (data_version.PRODUCT,),
+            lambda: search_service.browse_atc(db, code, limit)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -44,31 +129,36 @@ async def search_companies(
     query: str = Query(..., description="Search query for company name"),
     country: Optional[str] = Query(None, description="Filter by country"),
     limit: int = Query(10, description="Maximum number of results to return"),
+    threshold: float = Query(DEFAULT_THRESHOLD, ge=0, le=1, description="Minimum similarity of fuzzy matches"),
     db: Session = Depends(get_db),
 ) -> List[Dict[str, Any]]:
     """
     Search for pharmaceutical companies.
     
     This endpoint provides search functionality for pharmaceutical companies
-    based on name and optional country filter.
+    based on name and optional country filter. Misspelled names match
+    companies by trigram similarity.
     
     Args:
         query: Search query string
         country: Optional country filter
         limit: Maximum number of results to return
+        threshold: Minimum trigram similarity of fuzzy matches
         db: Database session
         
     Returns:
         List of matching companies
     """
     try:
-        return search_service.search_companies(db, query, country, limit)
+        return search_service.search_companies(db, query, country, limit, threshold)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/regions", response_model=List[str])
 async def get_regions(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
 ) -> List[str]:
     """
@@ -77,12 +167,35 @@ async def get_regions(
     This endpoint provides a list of all available regions in the system.
     
     Args:
+        request: Incoming request, checked for conditional GET validators
+        response: Outgoing response, carrying the ETag and caching headers
         db: Database session
         
     Returns:
         List of region names
     """
+    cached = conditional_response(request, response, *REGION_DATA_DOMAINS)
+    if cached is not None:
+        return cached
+    
     try:
-        return search_service.get_regions(db)
+        return cached_json_response(
+            request, response, REGION_DATA_DOMAINS,
+            lambda: search_service.get_regions(db)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/typeahead/stats", response_model=Dict[str, Any])
+async def get_typeahead_stats() -> Dict[str, Any]:
+    """
+    Get typeahead cache statistics.
+    
+    Product and company searches reuse the candidates of a recent search
+    for a prefix of their query; this endpoint reports how often they do.
+    
+    Returns:
+        Hits, misses, hit rate and number of cached queries for product and company searches
+    """
+    return search_service.get_typeahead_stats()
@@ -0,0 +1,169 @@
+"""
+In-process caching utilities.
+
+This module provides a small LRU cache whose entries are tagged with the data
+version they were computed from (see app.core.data_version). An entry is only
+returned while the version still matches and, optionally, before its TTL
+expires. A prefix cache built on it serves typeahead searches.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class VersionedCache:
+    """LRU cache with per-entry data versions and an optional TTL."""
+
+    def __init__(self, maxsize: int = 256, ttl_seconds: Optional[float] = None):
+        """
+        Initialize the cache.
+        
+        Args:
+            maxsize: Maximum number of entries kept
+            ttl_seconds: Optional time-to-live for entries in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Any = None) -> Optional[Any]:
+        """
+        Get a cached value.
+        
+        Args:
+            key: Cache key
+            version: Data version the value must have been computed from
+            
+        Returns:
+            The cached value, or None if missing, stale or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, entry_version, expires_at = entry
+                if entry_version == version and (expires_at is None or expires_at > time.monotonic()):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any, version: Any = None) -> None:
+        """
+        Store a value.
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+            version: Data version the value was computed from
+        """
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._entries[key] = (value, version, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the hit/miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PrefixCache:
+    """
+    Cache of values computed for search queries, looked up by the longest cached prefix of a query.
+
+    Typeahead requests come one keystroke at a time, so a query usually
+    extends one searched just before. The values are meant to be candidate
+    sets that such a longer query only has to narrow down.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl_seconds: Optional[float] = None):
+        """
+        Initialize the cache.
+        
+        Args:
+            maxsize: Maximum number of entries kept
+            ttl_seconds: Optional time-to-live for entries in seconds
+        """
+        self.hits = 0
+        self.misses = 0
+        self._entries = VersionedCache(maxsize, ttl_seconds)
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        query: str,
+        version: Any = None,
+        scope: Hashable = None,
+        reusable: Optional[Callable[[str], bool]] = None
+    ) -> Optional[Tuple[str, Any]]:
+        """
+        Get the value cached for the longest prefix of a query.
+        
+        Args:
+            query: Normalized query
+            version: Data version the value must have been computed from
+            scope: Optional further key, such as the search filters
+            reusable: Optional check of whether the value of a cached prefix
+                can be used for the query
+            
+        Returns:
+            Tuple of (prefix, value), where the prefix can be the query
+            itself, or None if no usable prefix is cached
+        """
+        for length in range(len(query), 0, -1):
+            prefix = query[:length]
+            value = self._entries.get((scope, prefix), version)
+            if value is not None and (reusable is None or prefix == query or reusable(prefix)):
+                with self._lock:
+                    self.hits += 1
+                return prefix, value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, query: str, value: Any, version: Any = None, scope: Hashable = None) -> None:
+        """
+        Store the value of a query.
+        
+        Args:
+            query: Normalized query
+            value: Value to cache
+            version: Data version the value was computed from
+            scope: Optional further key, such as the search filters
+        """
+        self._entries.set((scope, query), value, version)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the lookup statistics.
+        
+        Returns:
+            Dictionary with hits, misses, hit rate and number of entries
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+    def clear(self) -> None:
+        """Remove all entries and reset the hit/miss counters."""
+        self._entries.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
@@ -66,6 +66,21 @@ class Settings(BaseSettings):
             path=f"{postgres_db or ''}",
         )
     
+    # Serve mock data instead of querying the database (development without trade data)
+    USE_MOCK_DATA: bool = os.getenv("USE_MOCK_DATA", "true").lower() == "true"
+
+    # Directory of the memory-mapped trade cube used by the dashboard
+    TRADE_CUBE_DIR: str = os.getenv("TRADE_CUBE_DIR", "data/trade_cube")
+
+    # Where product, company and contact search runs: "memory" (in-process indexes)
+    # or "database" (full-text search and pg_trgm)
+    SEARCH_BACKEND: str = os.getenv("SEARCH_BACKEND", "memory")
+
+    @property
+    def use_database_search(self) -> bool:
+        """Whether searches run in the database rather than against the in-memory indexes."""
+        return self.SEARCH_BACKEND == "database" and not self.USE_MOCK_DATA
+    
     # S3 Data Lake
     S3_BUCKET_NAME: str = os.getenv("S3_BUCKET_NAME", "pharmasage-data-lake")
     AWS_ACCESS_KEY_ID: Optional[str] = os.getenv("AWS_ACCESS_KEY_ID")
@@ -0,0 +1,164 @@
+"""
+Data version tracking.
+
+This module keeps a monotonically increasing version counter per data domain
+(trade, company, research, ...). Caches include the relevant versions in
+their entries so that they are invalidated as soon as the underlying data
+changes, without having to track individual cache keys.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
+
+# Data domains
+TRADE = "trade"
+COMPANY = "company"
+RESEARCH = "research"
+ANALYTICS = "analytics"
+PRODUCT = "product"
+
+# Which domain a change to each table belongs to
+TABLE_DOMAINS = {
+    "transaction": TRADE,
+    "country": TRADE,
+    "region": TRADE,
+    "company": COMPANY,
+    "license": COMPANY,
+    "contact": COMPANY,
+    "product": PRODUCT,
+}
+
+logger = logging.getLogger(__name__)
+
+_versions: Dict[str, int] = {}
+_modified_at: Dict[str, float] = {}
+_lock = threading.Lock()
+_listeners: List[Callable[[Tuple[str, ...]], None]] = []
+
+# Data loaded before this process started is considered modified at startup
+_started_at = time.time()
+
+
+def bump(*domains: str) -> None:
+    """
+    Mark the given data domains as changed.
+    
+    Args:
+        domains: Data domains whose version should be incremented
+    """
+    now = time.time()
+    with _lock:
+        for domain in domains:
+            _versions[domain] = _versions.get(domain, 0) + 1
+            _modified_at[domain] = now
+    
+    for listener in list(_listeners):
+        try:
+            listener(domains)
+        except Exception as e:
+            logger.error(f"Data version listener failed: {str(e)}")
+
+
+def add_listener(listener: Callable[[Tuple[str, ...]], None]) -> None:
+    """
+    Call a function whenever data domains are bumped.
+    
+    Listeners run synchronously in the thread that bumped the versions, so
+    they should only schedule work.
+    
+    Args:
+        listener: Function called with the tuple of bumped domains
+    """
+    _listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[Tuple[str, ...]], None]) -> None:
+    """
+    Stop calling a listener added with add_listener.
+    
+    Args:
+        listener: Listener to remove
+    """
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def get_version(*domains: str) -> Tuple[int, ...]:
+    """
+    Get the current version of the given data domains.
+    
+    Args:
+        domains: Data domains to read
+        
+    Returns:
+        Tuple of versions, in the order the domains were given
+    """
+    return tuple(_versions.get(domain, 0) for domain in domains)
+
+
+def get_last_modified(*domains: str) -> float:
+    """
+    Get the time the given data domains last changed.
+    
+    Args:
+        domains: Data domains to read
+        
+    Returns:
+        Unix timestamp of the latest change, or the process start time if
+        none of the domains changed since
+    """
+    return max([_modified_at.get(domain, _started_at) for domain in domains] + [_started_at])
+
+
+def _changed_domains(session: Session) -> set:
+    """Collect the data domains touched by the pending changes of a session."""
+    domains = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        domain = TABLE_DOMAINS.get(getattr(obj, "__tablename__", None))
+        if domain:
+            domains.add(domain)
+    return domains
+
+
+def discard_session_changes(session: Session, *domains: str) -> None:
+    """
+    Keep a tracked session's next commit from bumping the given domains.
+    
+    For callers that bump these domains themselves once the commit's
+    derived data is refreshed, so that each change is bumped exactly once.
+    
+    Args:
+        session: Session from a tracked factory (see track_session_changes)
+        domains: Data domains the caller bumps itself
+    """
+    session.info.get("changed_domains", set()).difference_update(domains)
+
+
+def track_session_changes(session_factory: sessionmaker) -> None:
+    """
+    Bump data versions whenever sessions from the factory commit changes.
+    
+    Changed domains are collected on flush and only bumped once the
+    transaction commits; a rollback discards them.
+    
+    Args:
+        session_factory: Session factory whose sessions should be tracked
+    """
+    def after_flush(session: Session, flush_context: Any) -> None:
+        session.info.setdefault("changed_domains", set()).update(_changed_domains(session))
+
+    def after_commit(session: Session) -> None:
+        domains = session.info.pop("changed_domains", None)
+        if domains:
+            bump(*domains)
+
+    def after_rollback(session: Session) -> None:
+        session.info.pop("changed_domains", None)
+
+    event.listen(session_factory, "after_flush", after_flush)
+    event.listen(session_factory, "after_commit", after_commit)
+    event.listen(session_factory, "after_rollback", after_rollback)
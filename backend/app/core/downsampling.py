@@ -0,0 +1,60 @@
+"""
+Time series downsampling.
+
+This module provides Largest-Triangle-Three-Buckets downsampling (Steinarsson,
+2013), which reduces a series to a fixed number of points while keeping its
+visual shape. The first and last points are always kept; the points in
+between are split into equal buckets and each bucket keeps the point forming
+the largest triangle with the point kept from the bucket before and the
+average of the bucket after.
+"""
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Select the points of a series to keep when downsampling it.
+
+    Bucket bounds and averages are computed for all buckets at once; only the
+    choice of each bucket's point, which depends on the point kept before it,
+    walks the buckets in order.
+
+    Args:
+        x: Point positions, ascending
+        y: Point values
+        max_points: Number of points to keep, at least 3
+
+    Returns:
+        Indices of the kept points, ascending; all indices if the series has
+        no more than max_points points
+    """
+    if max_points < 3:
+        raise ValueError("max_points must be at least 3")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    count = len(y)
+    if count <= max_points:
+        return np.arange(count)
+
+    # Split the points between the first and last into max_points - 2 buckets
+    bounds = np.floor(np.linspace(1, count - 1, max_points - 1)).astype(np.int64)
+    starts, ends = bounds[:-1], bounds[1:]
+    sizes = ends - starts
+    average_x = np.add.reduceat(x[:-1], starts) / sizes
+    average_y = np.add.reduceat(y[:-1], starts) / sizes
+    # Each bucket is compared against the next bucket's average; the last one against the last point
+    next_x = np.append(average_x[1:], x[-1])
+    next_y = np.append(average_y[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, count - 1
+    previous = 0
+    for bucket, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        # Twice the triangle area, up to sign, for every point of the bucket
+        areas = np.abs(
+            (x[previous] - next_x[bucket]) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y[bucket] - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
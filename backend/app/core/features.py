@@ -0,0 +1,302 @@
+"""
+Numeric feature parsing and display formatting.
+
+Prospects and contacts are shown with display strings such as "$2.4B",
+"5,000-10,000" or "2 days ago". This module converts those strings to a
+canonical numeric form (USD amounts, employee range bounds, timestamps,
+integer scores) once, when data is loaded, and formats the numbers back into
+display strings when a response is serialized.
+"""
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+_USD_SUFFIXES = {"": 1, "K": 1e3, "M": 1e6, "B": 1e9, "T": 1e12}
+_USD_PATTERN = re.compile(r"^\s*\$?\s*([0-9][0-9,]*(?:\.[0-9]+)?)\s*([KMBT]?)\s*$", re.IGNORECASE)
+_RELATIVE_PATTERN = re.compile(r"^\s*(\d+)\s+(minute|hour|day|week|month|year)s?\s+ago\s*$", re.IGNORECASE)
+_RELATIVE_UNITS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+    "year": timedelta(days=365),
+}
+
+# Prospect display fields and the numeric fields they are stored as
+PROSPECT_AMOUNT_FIELDS = {"revenue": "revenueUsd", "purchasingVolume": "purchasingVolumeUsd"}
+
+
+def parse_usd_amount(text: Optional[str]) -> Optional[float]:
+    """
+    Parse a display amount such as "$2.4B" or "$180M" into USD.
+
+    Args:
+        text: Display amount
+
+    Returns:
+        Amount in USD, or None if the text is not an amount
+    """
+    if not text:
+        return None
+    match = _USD_PATTERN.match(text)
+    if not match:
+        return None
+    number, suffix = match.groups()
+    return float(number.replace(",", "")) * _USD_SUFFIXES[suffix.upper()]
+
+
+def format_usd(amount: Optional[float]) -> str:
+    """
+    Format a USD amount for display (e.g. 175000000 -> "$175M").
+
+    Args:
+        amount: Amount in USD
+
+    Returns:
+        Display string for the amount
+    """
+    if amount is None:
+        return "N/A"
+    for threshold, suffix in ((1e12, "T"), (1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if abs(amount) >= threshold:
+            return f"${amount / threshold:.1f}".rstrip("0").rstrip(".") + suffix
+    return f"${amount:.0f}"
+
+
+def parse_growth(text: Optional[str]) -> Optional[float]:
+    """
+    Parse a display growth such as "+12%" into a ratio.
+
+    Args:
+        text: Display growth
+
+    Returns:
+        Growth as a ratio of the previous period, or None if not a percentage
+    """
+    if not text:
+        return None
+    try:
+        return float(text.strip().rstrip("%")) / 100
+    except ValueError:
+        return None
+
+
+def format_growth(growth: Optional[float], decimals: int = 0) -> str:
+    """
+    Format a growth ratio for display (e.g. 0.12 -> "+12%").
+
+    Args:
+        growth: Growth as a ratio of the previous period
+        decimals: Number of decimals to show
+
+    Returns:
+        Display string for the growth
+    """
+    if growth is None:
+        return "N/A"
+    return f"{growth * 100:+.{decimals}f}%"
+
+
+def parse_employee_range(text: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Parse an employee range such as "5,000-10,000" or "10,000+".
+
+    Args:
+        text: Display employee range
+
+    Returns:
+        Tuple of (lower bound, upper bound); the upper bound is None if open-ended
+    """
+    if not text:
+        return None, None
+    bounds = [b.strip().replace(",", "").rstrip("+") for b in text.split("-")]
+    try:
+        numbers = [int(b) for b in bounds if b]
+    except ValueError:
+        return None, None
+    if not numbers:
+        return None, None
+    if len(numbers) == 1:
+        return numbers[0], None if text.strip().endswith("+") else numbers[0]
+    return numbers[0], numbers[1]
+
+
+def format_employee_range(low: Optional[int], high: Optional[int]) -> Optional[str]:
+    """
+    Format employee range bounds for display (e.g. (5000, 10000) -> "5,000-10,000").
+
+    Args:
+        low: Lower bound
+        high: Upper bound, or None if open-ended
+
+    Returns:
+        Display string for the range, or None if the lower bound is unknown
+    """
+    if low is None:
+        return None
+    if high is None:
+        return f"{low:,}+"
+    if high == low:
+        return f"{low:,}"
+    return f"{low:,}-{high:,}"
+
+
+def parse_relative_time(text: Optional[str], now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Parse a relative time such as "2 days ago" into a timestamp.
+
+    Args:
+        text: Display relative time
+        now: Reference time (default: current UTC time)
+
+    Returns:
+        The timestamp, or None if the text is not a relative time
+    """
+    if not text:
+        return None
+    now = now or datetime.utcnow()
+    if text.strip().lower() in ("just now", "today"):
+        return now
+    match = _RELATIVE_PATTERN.match(text)
+    if not match:
+        return None
+    count, unit = match.groups()
+    return now - int(count) * _RELATIVE_UNITS[unit.lower()]
+
+
+def format_relative_time(timestamp: Optional[datetime], now: Optional[datetime] = None) -> Optional[str]:
+    """
+    Format a timestamp relative to now (e.g. "2 days ago").
+
+    Args:
+        timestamp: Timestamp to format
+        now: Reference time (default: current UTC time)
+
+    Returns:
+        Display string, or None if the timestamp is unknown
+    """
+    if timestamp is None:
+        return None
+    elapsed = (now or datetime.utcnow()) - timestamp
+    for unit in ("year", "month", "week", "day", "hour", "minute"):
+        count = int(elapsed / _RELATIVE_UNITS[unit])
+        if count >= 1:
+            return f"{count} {unit}{'s' if count > 1 else ''} ago"
+    return "just now"
+
+
+def parse_score(value: Any) -> Optional[int]:
+    """
+    Parse a relationship score stored as a number or string into an integer.
+
+    Args:
+        value: Score such as 95, "95" or "95.0"
+
+    Returns:
+        Integer score, or None if the value is not a number
+    """
+    if value is None or value == "":
+        return None
+    try:
+        return int(round(float(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+def load_prospect(prospect: Dict[str, Any], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Convert a prospect with display strings into its canonical numeric form.
+
+    Args:
+        prospect: Prospect with display fields such as "revenue" and "lastContact"
+        now: Reference time for relative times
+
+    Returns:
+        Copy of the prospect with numeric fields in place of the display fields
+    """
+    record = dict(prospect)
+    for display_field, numeric_field in PROSPECT_AMOUNT_FIELDS.items():
+        if display_field in record:
+            record[numeric_field] = parse_usd_amount(record.pop(display_field))
+    if "employees" in record:
+        record["employeesMin"], record["employeesMax"] = parse_employee_range(record.pop("employees"))
+    if "lastContact" in record:
+        record["lastContactAt"] = parse_relative_time(record.pop("lastContact"), now)
+    if "tradingHistory" in record:
+        record["tradingHistory"] = [
+            {"year": h["year"], "volumeUsd": parse_usd_amount(h["volume"]), "growthRatio": parse_growth(h["growth"])}
+            for h in record["tradingHistory"]
+        ]
+    return record
+
+
+def serialize_prospect(record: Dict[str, Any], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Format a prospect record's numeric fields into display strings.
+
+    Args:
+        record: Prospect in canonical numeric form
+        now: Reference time for relative times
+
+    Returns:
+        Prospect with display fields in place of the numeric fields
+    """
+    prospect = dict(record)
+    for display_field, numeric_field in PROSPECT_AMOUNT_FIELDS.items():
+        if numeric_field in prospect:
+            prospect[display_field] = format_usd(prospect.pop(numeric_field))
+    if "employeesMin" in prospect:
+        prospect["employees"] = format_employee_range(prospect.pop("employeesMin"), prospect.pop("employeesMax", None))
+    if "lastContactAt" in prospect:
+        prospect["lastContact"] = format_relative_time(prospect.pop("lastContactAt"), now)
+    if "tradingHistory" in prospect:
+        prospect["tradingHistory"] = [_serialize_trading_year(h) for h in prospect["tradingHistory"]]
+    return prospect
+
+
+def _serialize_trading_year(history: Dict[str, Any]) -> Dict[str, Any]:
+    """Format one year of numeric trading history for display."""
+    if "volumeUsd" not in history:
+        return history
+    return {
+        "year": history["year"],
+        "volume": format_usd(history["volumeUsd"]),
+        "growth": format_growth(history["growthRatio"]),
+    }
+
+
+def load_contact(contact: Dict[str, Any], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Convert a contact with display strings into its canonical numeric form.
+
+    Args:
+        contact: Contact with "relationship_score" and "last_interaction" display fields
+        now: Reference time for relative times
+
+    Returns:
+        Copy of the contact with an integer score and a last_interaction_at timestamp
+    """
+    record = dict(contact)
+    if "relationship_score" in record:
+        record["relationship_score"] = parse_score(record["relationship_score"])
+    if "last_interaction" in record:
+        record["last_interaction_at"] = parse_relative_time(record.pop("last_interaction"), now)
+    return record
+
+
+def serialize_contact(record: Dict[str, Any], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Format a contact record's numeric fields into display strings.
+
+    Args:
+        record: Contact in canonical numeric form
+        now: Reference time for relative times
+
+    Returns:
+        Contact with a "last_interaction" display field
+    """
+    contact = dict(record)
+    if "last_interaction_at" in contact:
+        contact["last_interaction"] = format_relative_time(contact.pop("last_interaction_at"), now)
+    return contact
@@ -0,0 +1,147 @@
+"""
+Heavy-hitters sketches.
+
+This module provides a weighted Space-Saving sketch (Metwally et al.), which
+tracks the items with the largest total weight in a stream using a fixed
+number of counters. Every tracked item's count overestimates its true total
+by at most its recorded error, and any untracked item's total is at most the
+smallest tracked count. Sketches are mergeable, so sketches of disjoint parts
+of a stream (e.g. one per month) can be combined at query time.
+"""
+import heapq
+from typing import Dict, Hashable, Iterable, List, NamedTuple, Tuple
+
+
+class HeavyHitter(NamedTuple):
+    """An item's estimated total and the bound on its overestimation."""
+
+    item: Hashable
+    count: float  # Upper bound of the item's total
+    error: float  # count - error is a lower bound of the item's total
+
+
+class SpaceSaving:
+    """Weighted Space-Saving sketch with a fixed number of counters."""
+
+    def __init__(self, capacity: int):
+        """
+        Initialize the sketch.
+
+        Args:
+            capacity: Number of items tracked
+        """
+        self.capacity = capacity
+        self.counts: Dict[Hashable, float] = {}
+        self.errors: Dict[Hashable, float] = {}
+        # Min-heap of (count, item); entries go stale when an item's count grows
+        self._heap: List[Tuple[float, Hashable]] = []
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def floor(self) -> float:
+        """Upper bound of the total of any untracked item."""
+        if len(self.counts) < self.capacity:
+            return 0.0
+        return self._min()[0]
+
+    def _min(self) -> Tuple[float, Hashable]:
+        """Smallest tracked count and its item, refreshing stale heap entries."""
+        while True:
+            count, item = self._heap[0]
+            if self.counts.get(item) == count:
+                return count, item
+            heapq.heappop(self._heap)
+            if item in self.counts:
+                heapq.heappush(self._heap, (self.counts[item], item))
+
+    def update(self, item: Hashable, weight: float = 1.0) -> None:
+        """
+        Add weight to an item.
+
+        Args:
+            item: Item (must be orderable with the other items)
+            weight: Non-negative weight
+        """
+        if item in self.counts:
+            self.counts[item] += weight
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = weight
+            self.errors[item] = 0.0
+            heapq.heappush(self._heap, (weight, item))
+            return
+
+        # Replace the item with the smallest count; the newcomer inherits it as error
+        floor, evicted = self._min()
+        heapq.heappop(self._heap)
+        del self.counts[evicted], self.errors[evicted]
+        self.counts[item] = floor + weight
+        self.errors[item] = floor
+        heapq.heappush(self._heap, (floor + weight, item))
+
+    def load(self, totals: Iterable[Tuple[Hashable, float]]) -> None:
+        """
+        Fill an empty sketch from exact totals.
+
+        The largest totals are kept with no error, which satisfies the same
+        bounds as streaming the underlying weights.
+
+        Args:
+            totals: Pairs of (item, exact total)
+        """
+        for item, total in heapq.nlargest(self.capacity, totals, key=lambda pair: pair[1]):
+            self.counts[item] = total
+            self.errors[item] = 0.0
+        self._heap = [(count, item) for item, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+
+def _merge(sketches: Iterable[SpaceSaving]) -> Tuple[Dict[Hashable, float], Dict[Hashable, float], float]:
+    """Merge sketches into (counts, errors, floor); untracked items are bounded by the floor."""
+    floors = [(sketch, sketch.floor) for sketch in sketches if len(sketch)]
+    floor = sum(sketch_floor for _, sketch_floor in floors)
+    counts: Dict[Hashable, float] = {}
+    errors: Dict[Hashable, float] = {}
+    for sketch, sketch_floor in floors:
+        # Start each item at the full floor and swap this sketch's share for its own count
+        sketch_errors = sketch.errors
+        for item, count in sketch.counts.items():
+            counts[item] = counts.get(item, floor) - sketch_floor + count
+            errors[item] = errors.get(item, floor) - sketch_floor + sketch_errors[item]
+    return counts, errors, floor
+
+
+def merge_top(sketches: Iterable[SpaceSaving], limit: int) -> List[HeavyHitter]:
+    """
+    Merge sketches of disjoint parts of a stream and get the largest items.
+
+    An item missing from a sketch may still have had up to that sketch's
+    floor there, which is added to both its count and its error.
+
+    Args:
+        sketches: Sketches to merge
+        limit: Number of items to return
+
+    Returns:
+        Items by descending estimated count
+    """
+    counts, errors, _ = _merge(sketches)
+    top = heapq.nlargest(limit, counts.items(), key=lambda pair: pair[1])
+    return [HeavyHitter(item, count, errors[item]) for item, count in top]
+
+
+def merge_estimates(sketches: Iterable[SpaceSaving], items: Iterable[Hashable]) -> Dict[Hashable, HeavyHitter]:
+    """
+    Merge sketches of disjoint parts of a stream and estimate the totals of some items.
+
+    Args:
+        sketches: Sketches to merge
+        items: Items to estimate
+
+    Returns:
+        Estimate by item; items no sketch tracks get the merged floor as count and error
+    """
+    counts, errors, floor = _merge(sketches)
+    return {item: HeavyHitter(item, counts.get(item, floor), errors.get(item, floor)) for item in items}
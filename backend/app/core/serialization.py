@@ -0,0 +1,39 @@
+"""
+JSON serialization utilities.
+
+This module encodes API payloads to compact UTF-8 JSON bytes. orjson is used
+when it is installed, which is several times faster than the standard
+library on the large nested dicts and lists the read endpoints return; the
+standard json module is the fallback.
+"""
+import json
+from typing import Any
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Convert values the encoders don't handle natively (NumPy scalars)."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Encode a value as compact JSON.
+
+    Args:
+        value: JSON-compatible value; NumPy scalars are allowed
+
+    Returns:
+        UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
@@ -0,0 +1,163 @@
+"""
+Trigram similarity.
+
+This module provides trigram similarity with the semantics of PostgreSQL's
+pg_trgm extension, so that in-memory fuzzy search ranks like the database
+does: text is lowercased and split into words of letters and digits, each
+word is padded with two spaces in front and one behind, and the similarity
+of two texts is the number of trigrams they share divided by the number of
+distinct trigrams in either.
+
+TrigramIndex keeps a posting list of texts per trigram. Trigrams of a whole
+catalogue are extracted in a few NumPy passes over the joined texts, and a
+query only touches the postings of its own trigrams.
+"""
+import re
+from typing import List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+# Default minimum similarity of a fuzzy match (pg_trgm.similarity_threshold)
+DEFAULT_THRESHOLD = 0.3
+
+_WORD = re.compile(r"[^\W_]+")
+
+# Characters that are not part of a word; the newline separates texts when they are joined
+_NON_WORD = re.compile(r"[^\w\n]|_")
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Get the trigrams of a text.
+
+    Args:
+        text: Text
+
+    Returns:
+        Set of trigrams
+    """
+    result = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(word) + 1))
+    return result
+
+
+def similarity(a: str, b: str) -> float:
+    """
+    Get the trigram similarity of two texts, between 0 and 1.
+
+    Args:
+        a: First text
+        b: Second text
+
+    Returns:
+        Shared trigrams over distinct trigrams of either text
+    """
+    first, second = trigrams(a), trigrams(b)
+    if not first or not second:
+        return 0.0
+    shared = len(first & second)
+    return shared / (len(first) + len(second) - shared)
+
+
+def _first_of_runs(values: np.ndarray) -> np.ndarray:
+    """Mask of the elements of a sorted array that differ from the element before."""
+    first = np.ones(len(values), dtype=bool)
+    first[1:] = values[1:] != values[:-1]
+    return first
+
+
+class TrigramIndex:
+    """Posting lists of texts by trigram, for ranking texts by similarity to a query."""
+
+    def __init__(self, texts: Sequence[str]):
+        """
+        Build the index.
+
+        Args:
+            texts: Texts to index; results refer to them by position
+        """
+        self.size = len(texts)
+        # Lowercase, turn non-word characters into spaces and end every text with a separator
+        joined = _NON_WORD.sub(" ", "\n".join(text.replace("\n", " ") for text in texts).lower()) + "\n"
+        chars = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32)
+        # Characters are numbered densely so that a trigram fits in one integer
+        occurring = np.bincount(chars, minlength=ord(" ") + 1)
+        occurring[ord(" ")] = 1
+        self._alphabet = np.flatnonzero(occurring)
+        dense = np.zeros(int(self._alphabet[-1]) + 1, dtype=np.int64)
+        dense[self._alphabet] = np.arange(len(self._alphabet))
+        codes = dense[chars]
+        space = int(np.searchsorted(self._alphabet, ord(" ")))
+        self._base = len(self._alphabet) + 1
+        is_word = (chars != ord(" ")) & (chars != ord("\n"))
+        text_ids = np.cumsum(chars == ord("\n")) - (chars == ord("\n"))
+
+        # A trigram ends at every word character and at the character after each word
+        previous = np.concatenate(([False], is_word[:-1]))
+        before_previous = previous & np.concatenate(([False, False], is_word[:-2]))
+        ends = np.flatnonzero(is_word | previous)
+        first = np.where(before_previous[ends], codes[ends - 2], space)
+        second = np.where(previous[ends], codes[ends - 1], space)
+        third = np.where(is_word[ends], codes[ends], space)
+        grams = (first * self._base + second) * self._base + third
+
+        # Distinct (trigram, text) pairs, sorted by trigram and then text (sorting is much faster than np.unique)
+        keys = grams * max(self.size, 1) + text_ids[ends]
+        keys.sort()
+        keys = keys[_first_of_runs(keys)]
+        grams, texts_of_keys = np.divmod(keys, max(self.size, 1))
+        self.counts = np.bincount(texts_of_keys, minlength=self.size)
+        starts = np.flatnonzero(_first_of_runs(grams))
+        self._grams = grams[starts]
+        self._offsets = np.append(starts, len(keys))
+        self._postings = texts_of_keys.astype(np.int32)
+
+    def _code(self, trigram: str) -> int:
+        """Integer code of a trigram, or -1 if one of its characters is in no indexed text."""
+        code = 0
+        for char in trigram:
+            position = int(np.searchsorted(self._alphabet, ord(char)))
+            if position == len(self._alphabet) or self._alphabet[position] != ord(char):
+                return -1
+            code = code * self._base + position
+        return code
+
+    def search(
+        self,
+        query: str,
+        threshold: float = DEFAULT_THRESHOLD,
+        limit: Optional[int] = 10
+    ) -> List[Tuple[int, float]]:
+        """
+        Find the texts most similar to a query.
+
+        Args:
+            query: Query text
+            threshold: Minimum similarity of a result
+            limit: Maximum number of results to return (None for all)
+
+        Returns:
+            (text position, similarity) pairs, by descending similarity, then position
+        """
+        query_grams = trigrams(query)
+        codes = np.array([code for code in map(self._code, query_grams) if code >= 0], dtype=np.int64)
+        if not len(codes) or not self.size or limit == 0:
+            return []
+        found = np.searchsorted(self._grams, codes)
+        found = found[(found < len(self._grams)) & (self._grams[np.minimum(found, len(self._grams) - 1)] == codes)]
+        if not len(found):
+            return []
+
+        postings = np.concatenate([self._postings[self._offsets[g]:self._offsets[g + 1]] for g in found.tolist()])
+        shared = np.bincount(postings, minlength=self.size)
+        # A text needs at least this many shared trigrams to reach the threshold
+        needed = max(int(np.ceil(threshold * len(query_grams) - 1e-9)), 1)
+        candidates = np.flatnonzero(shared >= needed)
+        shared = shared[candidates]
+        scores = shared / (len(query_grams) + self.counts[candidates] - shared)
+        keep = scores >= threshold
+        candidates, scores = candidates[keep], scores[keep]
+        order = np.lexsort((candidates, -scores))[:limit]
+        return list(zip(candidates[order].tolist(), scores[order].tolist()))
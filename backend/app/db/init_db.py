@@ -8,8 +8,11 @@ import logging
 from sqlalchemy.orm import Session
 
 from app.db.base import Base
-from app.db.session import engine
+from app.db.session import SessionLocal, engine
+from app.db.search_indexes import setup_search_indexes
+from app.db.trade_aggregates import setup_trade_aggregates
 from app.core.config import settings
+from app.services.geography import seed_geography
 
 # Import all models to ensure they are registered with SQLAlchemy
 from app.models.company import Company
@@ -17,6 +20,8 @@ from app.models.product import Product
 from app.models.transaction import Transaction
 from app.models.license import License
 from app.models.contact import Contact
+from app.models.country import Country
+from app.models.region import Region
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +36,19 @@ def init_db() -> None:
     logger.info("Creating database tables")
     Base.metadata.create_all(bind=engine)
     logger.info("Database tables created")
+    
+    # Fill the country and region dimension tables referenced by transactions
+    db = SessionLocal()
+    try:
+        seed_geography(db)
+    finally:
+        db.close()
+    
+    # Turn transactions into a hypertable and create the monthly trade aggregates
+    setup_trade_aggregates(engine)
+    
+    # Create the trigram indexes used by database-backed fuzzy search
+    setup_search_indexes(engine)
 
 
 def seed_initial_data(db: Session) -> None:
@@ -0,0 +1,119 @@
+"""
+Search indexes.
+
+This module creates the indexes behind database-backed product, company and
+contact search (settings.SEARCH_BACKEND = "database"):
+
+- Generated search_vector tsvector columns on the product, company and
+  contact tables, with GIN indexes, for full-text search ranked with
+  ts_rank. Each field is weighted, so that a match in a name ranks above
+  one in a description (see full_text_match).
+- pg_trgm GIN trigram indexes, which serve both the ILIKE '%...%' substring
+  conditions and the % similarity operator, so that partial words and
+  misspelled names are found without scanning the tables. Contact names
+  and roles have them too, for partial names such as "Joh".
+
+Product synonyms are an array; they are indexed as one string through
+search_text(), an IMMUTABLE wrapper of array_to_string (which is only
+STABLE and so can't be used in an index expression).
+
+The search_vector columns are not declared on the models, since they are
+generated by the database; queries refer to them through full_text_match.
+"""
+import logging
+from typing import List, Tuple
+
+from sqlalchemy import func, literal_column, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import ColumnElement
+
+logger = logging.getLogger(__name__)
+
+# Text search configuration of the search vectors and of the queries against them
+TEXT_SEARCH_CONFIG = "english"
+
+# Fields of each table's search vector with their weights, from A (highest) to D
+SEARCH_VECTOR_FIELDS = {
+    "product": [("api_name", "A"), ("search_text(synonyms)", "B"), ("description", "C")],
+    "company": [("name", "A"), ("sector", "B"), ("description", "C")],
+    "contact": [("name", "A"), ("role", "B"), ("notes", "C")],
+}
+
+
+def _search_vector_setup(table: str) -> List[str]:
+    """Statements adding a table's generated search vector column and its GIN index."""
+    vector = " || ".join(
+        f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce({field}, '')), '{weight}')"
+        for field, weight in SEARCH_VECTOR_FIELDS[table]
+    )
+    return [
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED",
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING gin (search_vector)",
+    ]
+
+
+_SEARCH_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """CREATE OR REPLACE FUNCTION search_text(text[]) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$ SELECT array_to_string($1, ' ') $$""",
+    *(statement for table in SEARCH_VECTOR_FIELDS for statement in _search_vector_setup(table)),
+    "CREATE INDEX IF NOT EXISTS ix_product_api_name_trgm ON product USING gin (api_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_product_synonyms_trgm ON product USING gin (search_text(synonyms) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_product_code_trgm ON product USING gin (code gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_company_name_trgm ON company USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_contact_name_trgm ON contact USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_contact_role_trgm ON contact USING gin (role gin_trgm_ops)",
+]
+
+
+def full_text_match(table: str, query: str) -> Tuple[ColumnElement, ColumnElement]:
+    """
+    Build a full-text search condition on a table's search vector.
+
+    Args:
+        table: Table with a search vector (a key of SEARCH_VECTOR_FIELDS)
+        query: Query in web search syntax: words, "quoted phrases", or and -exclusions
+
+    Returns:
+        Tuple of (condition matching the rows, ts_rank of each row for ordering)
+    """
+    vector = literal_column(f"{table}.search_vector", type_=TSVECTOR)
+    tsquery = func.websearch_to_tsquery(literal_column(f"'{TEXT_SEARCH_CONFIG}'::regconfig"), query)
+    return vector.op("@@")(tsquery), func.ts_rank(vector, tsquery)
+
+
+def contains_pattern(query: str) -> str:
+    """
+    Build an ILIKE pattern matching text that contains the query.
+
+    Args:
+        query: Text to look for; LIKE wildcards in it are escaped with a backslash
+
+    Returns:
+        The pattern, to be used with escape="\\"
+    """
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def setup_search_indexes(engine: Engine) -> bool:
+    """
+    Create the full-text and trigram search indexes if they don't exist.
+
+    Args:
+        engine: Database engine
+
+    Returns:
+        Whether the indexes were set up (False for databases other than PostgreSQL)
+    """
+    if engine.dialect.name != "postgresql":
+        logger.info("Search indexes require PostgreSQL, skipping setup")
+        return False
+
+    with engine.begin() as connection:
+        for statement in _SEARCH_SETUP:
+            connection.execute(text(statement))
+
+    logger.info("Search indexes set up")
+    return True
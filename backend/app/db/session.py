@@ -9,6 +9,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 
 from app.core.config import settings
+from app.core import data_version
 
 # Create SQLAlchemy engine
 # Convert PostgresDsn to string before passing to create_engine
@@ -23,6 +24,9 @@ engine = create_engine(
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Invalidate version-tagged caches when sessions commit data changes
+data_version.track_session_changes(SessionLocal)
+
 
 def get_db() -> Generator[Session, None, None]:
     """
@@ -0,0 +1,167 @@
+"""
+Trade aggregates.
+
+This module turns the transaction table into a TimescaleDB hypertable keyed
+on its period date and maintains a monthly aggregate of trade value and
+quantity by source and destination country (as country dimension codes),
+product type and flow type. Dashboard queries read the aggregate instead of
+scanning transactions.
+
+With TimescaleDB the aggregate is a continuous aggregate refreshed by a
+policy; it is fully materialized once when created and reads real-time data
+for months the policy has not materialized yet. On plain PostgreSQL it is a materialized view that is refreshed after
+each trade ingest (see refresh_trade_aggregates).
+"""
+import logging
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import Column, Date, Float, Integer, MetaData, SmallInteger, String, Table, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+# Name of the monthly aggregate view
+TRADE_MONTHLY_VIEW = "trade_monthly"
+
+# Table definition of the aggregate view, for building queries against it.
+# It has its own metadata so that create_all() does not create it as a table.
+trade_monthly = Table(
+    TRADE_MONTHLY_VIEW,
+    MetaData(),
+    Column("bucket", Date, nullable=False),
+    Column("source_country_id", SmallInteger, nullable=False),
+    Column("destination_country_id", SmallInteger, nullable=False),
+    Column("product_type", String(50), nullable=False),
+    Column("flow_type", String(50), nullable=False),
+    Column("value", Float),
+    Column("qty", Float),
+    Column("transactions", Integer),
+)
+
+# Aggregate backends
+TIMESCALE = "timescale"
+POSTGRES = "postgres"
+
+_AGGREGATE_COLUMNS = """
+        source_country_id,
+        destination_country_id,
+        COALESCE(product_type, 'Unknown') AS product_type,
+        flow_type,
+        SUM(value) AS value,
+        SUM(qty) AS qty,
+        COUNT(*) AS transactions
+    FROM "transaction"
+    GROUP BY bucket, source_country_id, destination_country_id, COALESCE(product_type, 'Unknown'), flow_type
+"""
+
+_TIMESCALE_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS timescaledb",
+    """SELECT create_hypertable('"transaction"', 'period',
+        chunk_time_interval => INTERVAL '3 months', if_not_exists => TRUE, migrate_data => TRUE)""",
+    f"""CREATE MATERIALIZED VIEW IF NOT EXISTS {TRADE_MONTHLY_VIEW}
+    WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+    SELECT time_bucket(INTERVAL '1 month', period) AS bucket,{_AGGREGATE_COLUMNS}
+    WITH NO DATA""",
+    # Trade batches for recent months keep arriving, so re-aggregate the last quarter hourly
+    f"""SELECT add_continuous_aggregate_policy('{TRADE_MONTHLY_VIEW}',
+        start_offset => INTERVAL '3 months', end_offset => INTERVAL '1 day',
+        schedule_interval => INTERVAL '1 hour', if_not_exists => TRUE)""",
+]
+
+_POSTGRES_SETUP = [
+    f"""CREATE MATERIALIZED VIEW IF NOT EXISTS {TRADE_MONTHLY_VIEW} AS
+    SELECT date_trunc('month', period)::date AS bucket,{_AGGREGATE_COLUMNS}""",
+    # REFRESH ... CONCURRENTLY requires a unique index
+    f"""CREATE UNIQUE INDEX IF NOT EXISTS ix_{TRADE_MONTHLY_VIEW}_key ON {TRADE_MONTHLY_VIEW}
+    (bucket, source_country_id, destination_country_id, product_type, flow_type)""",
+]
+
+_COMMON_SETUP = [
+    f"CREATE INDEX IF NOT EXISTS ix_{TRADE_MONTHLY_VIEW}_bucket ON {TRADE_MONTHLY_VIEW} (bucket)",
+]
+
+
+def detect_backend(connection: Connection) -> Optional[str]:
+    """
+    Detect which aggregate backend the database supports.
+
+    Args:
+        connection: Database connection
+
+    Returns:
+        TIMESCALE if the timescaledb extension is available, POSTGRES for plain
+        PostgreSQL, or None for other databases (e.g. SQLite in tests)
+    """
+    if connection.dialect.name != "postgresql":
+        return None
+    available = connection.execute(
+        text("SELECT 1 FROM pg_available_extensions WHERE name = 'timescaledb'")
+    ).first()
+    return TIMESCALE if available else POSTGRES
+
+
+def setup_trade_aggregates(engine: Engine) -> Optional[str]:
+    """
+    Create the hypertable and monthly trade aggregate if they don't exist.
+
+    Args:
+        engine: Database engine
+
+    Returns:
+        The aggregate backend that was set up, or None if unsupported
+    """
+    with engine.connect() as connection:
+        backend = detect_backend(connection)
+    if backend is None:
+        logger.info("Trade aggregates require PostgreSQL, skipping setup")
+        return None
+
+    statements = (_TIMESCALE_SETUP if backend == TIMESCALE else _POSTGRES_SETUP) + _COMMON_SETUP
+    # Continuous aggregates cannot be created inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        created = connection.execute(
+            text("SELECT to_regclass(:view) IS NULL"), {"view": TRADE_MONTHLY_VIEW}
+        ).scalar()
+        for statement in statements:
+            connection.execute(text(statement))
+        # The continuous aggregate is created WITH NO DATA and the policy only
+        # re-aggregates recent months, so materialize the existing history once
+        if backend == TIMESCALE and created:
+            connection.execute(text(f"CALL refresh_continuous_aggregate('{TRADE_MONTHLY_VIEW}', NULL, NULL)"))
+
+    logger.info(f"Trade aggregates set up using {backend}")
+    return backend
+
+
+def refresh_trade_aggregates(
+    engine: Engine,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> None:
+    """
+    Refresh the monthly trade aggregate after new transactions were loaded.
+
+    With TimescaleDB only the given period range is re-aggregated; the
+    refresh policy would pick it up later anyway, this makes it visible
+    immediately. On plain PostgreSQL the materialized view is refreshed
+    concurrently so readers are not blocked.
+
+    Args:
+        engine: Database engine
+        start: First period that changed (TimescaleDB only)
+        end: Period after the last one that changed (TimescaleDB only)
+    """
+    with engine.connect() as connection:
+        backend = detect_backend(connection)
+    if backend is None:
+        return
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if backend == TIMESCALE:
+            connection.execute(
+                text(f"CALL refresh_continuous_aggregate('{TRADE_MONTHLY_VIEW}', :start, :end)"),
+                {"start": start, "end": end},
+            )
+        else:
+            connection.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {TRADE_MONTHLY_VIEW}"))
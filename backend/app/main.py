@@ -4,6 +4,9 @@ PharmaSage Backend API
 This is the main entry point for the PharmaSage backend API.
 It initializes the FastAPI application and includes all routers.
 """
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -13,11 +16,33 @@ import logging
 
 from app.api import dashboard, search, match, contacts, export, analytics, research
 from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services import search as search_service
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Build the in-memory product and company search indexes before the first request."""
+    db = SessionLocal()
+    try:
+        search_service.get_product_index(db)
+        search_service.get_company_search_index(db)
+    except Exception as e:
+        # The indexes are built on the first search instead
+        logger.warning(f"Could not build the search indexes at startup: {e}")
+    finally:
+        db.close()
+    yield
+
+
+# Keep the company search index up to date with committed company changes
+search_service.track_company_changes(SessionLocal)
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -26,6 +51,7 @@ app = FastAPI(
     docs_url="/api/docs",
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json",
+    lifespan=lifespan,
 )
 
 # Set up CORS middleware
@@ -35,6 +61,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include API routers
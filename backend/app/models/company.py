@@ -3,7 +3,7 @@ Company model.
 
 This module defines the Company model for storing company information.
 """
-from sqlalchemy import Column, String, Text
+from sqlalchemy import Column, String, Text, Float, Integer, DateTime
 from sqlalchemy.orm import relationship
 
 from app.db.base import Base, TimestampMixin, UUIDMixin
@@ -27,6 +27,13 @@ class Company(Base, UUIDMixin, TimestampMixin):
     description = Column(Text, nullable=True)
     website = Column(String(255), nullable=True)
     
+    # Numeric features, parsed once on load; display strings are formatted on output
+    revenue_usd = Column(Float, nullable=True, index=True)
+    purchasing_volume_usd = Column(Float, nullable=True, index=True)
+    employees_min = Column(Integer, nullable=True, index=True)
+    employees_max = Column(Integer, nullable=True)
+    last_contact_at = Column(DateTime, nullable=True, index=True)
+    
     # Relationships
     products = relationship("Product", back_populates="company", cascade="all, delete-orphan")
     transactions = relationship("Transaction", back_populates="company", cascade="all, delete-orphan")
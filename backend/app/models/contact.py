@@ -3,7 +3,7 @@ Contact model.
 
 This module defines the Contact model for storing contact information for pharmaceutical companies.
 """
-from sqlalchemy import Column, String, Text, ForeignKey
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 
@@ -30,8 +30,8 @@ class Contact(Base, UUIDMixin, TimestampMixin):
     
     # Notes and metadata
     notes = Column(Text, nullable=True)
-    relationship_score = Column(String(50), nullable=True)
-    last_interaction = Column(String(100), nullable=True)
+    relationship_score = Column(Integer, nullable=True, index=True)
+    last_interaction_at = Column(DateTime, nullable=True, index=True)
     
     # Foreign keys
     company_id = Column(UUID(as_uuid=True), ForeignKey("company.id"), nullable=False)
@@ -0,0 +1,32 @@
+"""
+Country model.
+
+This module defines the Country dimension table referenced by transactions.
+"""
+from sqlalchemy import Column, Integer, SmallInteger, String, ForeignKey
+from sqlalchemy.orm import relationship
+
+from app.db.base import Base
+
+
+class Country(Base):
+    """
+    Country model.
+    
+    Represents a country in the system. Countries are identified by small
+    integer codes so that transactions can reference them compactly.
+    """
+    
+    # SQLite only auto-increments INTEGER primary keys
+    id = Column(SmallInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    name = Column(String(100), nullable=False, unique=True)
+    
+    # Foreign keys
+    region_id = Column(SmallInteger, ForeignKey("region.id"), nullable=True, index=True)
+    
+    # Relationships
+    region = relationship("Region", back_populates="countries")
+    
+    def __repr__(self) -> str:
+        """String representation of the country."""
+        return f"<Country {self.name}>"
@@ -0,0 +1,29 @@
+"""
+Region model.
+
+This module defines the Region dimension table for grouping countries.
+"""
+from sqlalchemy import Column, Integer, SmallInteger, String
+from sqlalchemy.orm import relationship
+
+from app.db.base import Base
+
+
+class Region(Base):
+    """
+    Region model.
+    
+    Represents a geographic region (e.g. Europe) that countries belong to.
+    Regions are identified by small integer codes.
+    """
+    
+    # SQLite only auto-increments INTEGER primary keys
+    id = Column(SmallInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    name = Column(String(100), nullable=False, unique=True)
+    
+    # Relationships
+    countries = relationship("Country", back_populates="region")
+    
+    def __repr__(self) -> str:
+        """String representation of the region."""
+        return f"<Region {self.name}>"
@@ -3,30 +3,59 @@ Transaction model.
 
 This module defines the Transaction model for storing pharmaceutical trade transactions.
 """
-from sqlalchemy import Column, String, Integer, Float, ForeignKey
+from datetime import date
+from typing import Any, Optional
+
+from sqlalchemy import Column, String, Integer, SmallInteger, Float, Date, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.db.base import Base, TimestampMixin, UUIDMixin
 
 
+def period_for(year: int, month: Optional[int]) -> date:
+    """
+    Get the period date (first day of the month) for a transaction.
+    
+    Args:
+        year: Transaction year
+        month: Transaction month, or None if only the year is known
+        
+    Returns:
+        First day of the month (January if the month is unknown)
+    """
+    return date(year, month or 1, 1)
+
+
+def _default_period(context: Any) -> date:
+    """Derive the period column from the year and month of the inserted row."""
+    params = context.get_current_parameters()
+    return period_for(params["year"], params.get("month"))
+
+
 class Transaction(Base, UUIDMixin, TimestampMixin):
     """
     Transaction model.
     
     Represents a pharmaceutical trade transaction (import/export) in the system.
+    
+    In PostgreSQL deployments the table is a TimescaleDB hypertable partitioned
+    on period, which is therefore part of the primary key
+    (see app.db.trade_aggregates).
     """
     
     # Transaction details
     year = Column(Integer, nullable=False, index=True)
     month = Column(Integer, nullable=True, index=True)
+    period = Column(Date, primary_key=True, default=_default_period)
     qty = Column(Float, nullable=True)
     value = Column(Float, nullable=True)
     flow_type = Column(String(50), nullable=False, index=True)  # export/import
+    product_type = Column(String(50), nullable=True, index=True)  # API/FDF/Excipients, copied from Product.form
     
-    # Geographic information
-    source_country = Column(String(100), nullable=False, index=True)
-    destination_country = Column(String(100), nullable=False, index=True)
+    # Geographic information, as codes of the country dimension table
+    source_country_id = Column(SmallInteger, ForeignKey("country.id"), nullable=False, index=True)
+    destination_country_id = Column(SmallInteger, ForeignKey("country.id"), nullable=False, index=True)
     
     # Additional information
     customs_proc_code = Column(String(100), nullable=True)
@@ -39,7 +68,9 @@ class Transaction(Base, UUIDMixin, TimestampMixin):
     # Relationships
     company = relationship("Company", back_populates="transactions")
     product = relationship("Product", back_populates="transactions")
+    source_country = relationship("Country", foreign_keys=[source_country_id])
+    destination_country = relationship("Country", foreign_keys=[destination_country_id])
     
     def __repr__(self) -> str:
         """String representation of the transaction."""
-        return f"<Transaction {self.flow_type} {self.source_country}->{self.destination_country} ({self.year}-{self.month or 'XX'})>"
+        return f"<Transaction {self.flow_type} {self.source_country_id}->{self.destination_country_id} ({self.year}-{self.month or 'XX'})>"
@@ -7,6 +7,8 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime
 from sqlalchemy.orm import Session
 
+from app.core import data_version
+
 # Mock data for development
 MOCK_METRICS = {
     "search_volume": {
@@ -65,6 +67,7 @@ def track_event(
     # In a real implementation, this would store the event in the database
     # For now, just log it
     print(f"[{datetime.now().isoformat()}] Event: {event_type}, Data: {event_data}")
+    data_version.bump(data_version.ANALYTICS)
 
 
 def get_metrics(
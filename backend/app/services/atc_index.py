@@ -0,0 +1,149 @@
+"""
+ATC index service.
+
+Product codes are Anatomical Therapeutic Chemical (ATC) codes, whose
+prefixes are the levels of the classification: N (nervous system), N02
+(analgesics), N02B (other analgesics and antipyretics), N02BE (anilides) and
+N02BE01 (paracetamol). This module keeps the codes of the product catalogue
+sorted, so that the products under any group are one contiguous range found
+by binary search, and keeps the distinct groups of every level sorted with
+their product counts, so that the subgroups of a group are a range as well.
+
+The index is built with the product index, once per catalogue version (see
+product_index.ProductIndex.atc).
+"""
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Length of the codes at each level of the classification, from 1 (anatomical main group) to 5 (chemical substance)
+ATC_LEVEL_LENGTHS = (1, 3, 4, 5, 7)
+
+
+def normalize_code(code: str) -> str:
+    """Uppercase an ATC code and remove its whitespace, as codes and queries are compared."""
+    return "".join(code.split()).upper()
+
+
+def atc_level(code: str) -> Optional[int]:
+    """
+    Get the level of an ATC code.
+
+    Args:
+        code: ATC code or group
+
+    Returns:
+        Level from 1 to 5, or None if the code's length is not that of a level
+    """
+    length = len(normalize_code(code))
+    return ATC_LEVEL_LENGTHS.index(length) + 1 if length in ATC_LEVEL_LENGTHS else None
+
+
+def _prefix_range(values: Sequence[str], prefix: str) -> Tuple[int, int]:
+    """Range of the values of a sorted sequence that start with a prefix."""
+    if not prefix:
+        return 0, len(values)
+    first = bisect_left(values, prefix)
+    return first, bisect_left(values, prefix[:-1] + chr(ord(prefix[-1]) + 1), first)
+
+
+class AtcIndex:
+    """Sorted ATC codes of a product catalogue, with product counts for the groups of every level."""
+
+    def __init__(self, products: Sequence[Dict[str, Any]]):
+        """
+        Build the index.
+
+        Args:
+            products: Catalogue of products with a code; results refer to
+                them by position, and products without a code are left out
+        """
+        self.size = len(products)
+        coded = [position for position, product in enumerate(products) if product.get("code")]
+        codes = np.array([normalize_code(products[position]["code"]) for position in coded], dtype=str)
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+        self._codes = codes.tolist()
+        self._positions = np.array(coded, dtype=np.int32)[order]
+
+        # Distinct groups of each level with the number of products under them; the codes
+        # are sorted, so the groups of a level are too and equal groups are adjacent
+        self._groups: List[List[str]] = []
+        self._counts: List[np.ndarray] = []
+        lengths = np.char.str_len(codes)
+        for length in ATC_LEVEL_LENGTHS:
+            groups = codes[lengths >= length].astype(f"U{length}")
+            distinct = np.ones(len(groups), dtype=bool)
+            distinct[1:] = groups[1:] != groups[:-1]
+            starts = np.flatnonzero(distinct)
+            self._groups.append(groups[starts].tolist())
+            self._counts.append(np.diff(np.append(starts, len(groups))))
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def count(self, prefix: str = "") -> int:
+        """
+        Count the products with a code under a group.
+
+        Args:
+            prefix: ATC group or any code prefix; empty for all coded products
+
+        Returns:
+            Number of products
+        """
+        first, last = _prefix_range(self._codes, normalize_code(prefix))
+        return last - first
+
+    def positions(self, prefix: str = "", limit: Optional[int] = None) -> np.ndarray:
+        """
+        Get the products with a code under a group.
+
+        Args:
+            prefix: ATC group or any code prefix; empty for all coded products
+            limit: Maximum number of positions to return (None for all)
+
+        Returns:
+            Catalogue positions, ordered by code and then position
+        """
+        first, last = _prefix_range(self._codes, normalize_code(prefix))
+        if limit is not None:
+            last = min(last, first + max(limit, 0))
+        return self._positions[first:last]
+
+    def mask(self, prefix: str) -> np.ndarray:
+        """
+        Get a mask of the products with a code under a group.
+
+        Args:
+            prefix: ATC group or any code prefix
+
+        Returns:
+            Boolean array over the catalogue positions
+        """
+        allowed = np.zeros(self.size, dtype=bool)
+        allowed[self.positions(prefix)] = True
+        return allowed
+
+    def children(self, prefix: str = "") -> List[Dict[str, Any]]:
+        """
+        Get the groups one level below a group.
+
+        Args:
+            prefix: ATC group or any code prefix; empty for the anatomical main groups
+
+        Returns:
+            Groups of the first level longer than the prefix that start with
+            it, in code order, as dictionaries with code, level and count
+        """
+        prefix = normalize_code(prefix)
+        level = next((i for i, length in enumerate(ATC_LEVEL_LENGTHS) if length > len(prefix)), None)
+        if level is None:
+            return []
+        groups = self._groups[level]
+        first, last = _prefix_range(groups, prefix)
+        return [
+            {"code": code, "level": level + 1, "count": count}
+            for code, count in zip(groups[first:last], self._counts[level][first:last].tolist())
+        ]
@@ -3,17 +3,29 @@ Buyer research service.
 
 This module provides services for researching potential buyers using the Perplexity API.
 """
+import hashlib
 import logging
 import re
 from typing import Dict, List, Any, Optional
 from sqlalchemy.orm import Session
 
+from app.core.cache import VersionedCache
 from app.prompts.buyer_discovery import PROSPECT_IDENTIFICATION_PROMPT
+from app.services.entity_resolution import name_tokens, normalize_country
 from app.services.perplexity_client import run_deep_research_with_cache
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Maximum number of research-based prospects kept for lookup by ID
+RESEARCH_STORE_SIZE = 10_000
+
+# Hours research-based prospects can be looked up by ID, like the research results they come from
+RESEARCH_STORE_TTL_HOURS = 24
+
+# Recent research-based prospects by ID (replace with Redis in production)
+_research_store = VersionedCache(maxsize=RESEARCH_STORE_SIZE, ttl_seconds=RESEARCH_STORE_TTL_HOURS * 3600)
+
 def format_prompt_with_company_data(company_website: str) -> str:
     """
     Format the prompt template with company data.
@@ -87,6 +99,24 @@ def parse_markdown_table(table_text: str) -> List[Dict[str, str]]:
     
     return data_rows
 
+def research_prospect_id(name: str, location: str) -> str:
+    """
+    Derive the ID of a research-based prospect from its company.
+    
+    The ID is a hash of the normalized name and country, so that the same
+    company keeps its ID whenever research results are parsed again, while
+    prospects of different companies never replace each other in the store.
+    
+    Args:
+        name: Company name
+        location: Country or region of the company
+        
+    Returns:
+        Prospect ID starting with "research-"
+    """
+    key = " ".join(name_tokens(name)) + "|" + (normalize_country(location) or "")
+    return f"research-{hashlib.sha1(key.encode()).hexdigest()[:16]}"
+
 def parse_research_results(research_response: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
     Parse the markdown response from Perplexity into structured prospect data.
@@ -115,12 +145,14 @@ def parse_research_results(research_response: Dict[str, Any]) -> List[Dict[str,
     
     # Convert table data to prospect format
     prospects = []
-    for i, row in enumerate(table_data):
+    for row in table_data:
+        name = row.get("Company Name", "Unknown Company")
+        location = row.get("Country/Region", "Unknown Location")
         # Map table columns to prospect fields
         prospect = {
-            "id": f"research-{i+1}",
-            "name": row.get("Company Name", "Unknown Company"),
-            "location": row.get("Country/Region", "Unknown Location"),
+            "id": research_prospect_id(name, location),
+            "name": name,
+            "location": location,
             "segment": row.get("Target Segment", "Unknown Segment"),
             "website": row.get("Website", ""),
             "keyContacts": [row.get("Key Contacts", "")] if row.get("Key Contacts") else [],
@@ -133,6 +165,33 @@ def parse_research_results(research_response: Dict[str, Any]) -> List[Dict[str,
     
     return prospects
 
+def store_research_prospects(prospects: List[Dict[str, Any]]) -> None:
+    """
+    Store research-based prospects for later lookup by ID.
+    
+    Args:
+        prospects: Parsed research-based prospects
+    """
+    for prospect in prospects:
+        _research_store.set(prospect["id"], prospect)
+
+def get_research_prospects(prospect_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Look up stored research-based prospects.
+    
+    Args:
+        prospect_ids: IDs of the research-based prospects
+        
+    Returns:
+        Dict mapping each found ID to a copy of its prospect
+    """
+    found = {}
+    for prospect_id in prospect_ids:
+        prospect = _research_store.get(prospect_id)
+        if prospect is not None:
+            found[prospect_id] = dict(prospect)
+    return found
+
 def research_potential_buyers(
     db: Session, 
     company_name: str,
@@ -163,6 +222,9 @@ def research_potential_buyers(
         # Parse the results into structured data
         prospects = parse_research_results(research_response)
         
+        # Keep the prospects so their details can be looked up by ID later
+        store_research_prospects(prospects)
+        
         logger.info(f"Found {len(prospects)} potential buyers through research")
         return prospects
         
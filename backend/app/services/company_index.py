@@ -0,0 +1,574 @@
+"""
+Company index service.
+
+This module keeps an inverted index of the companies' names, sectors and
+descriptions and ranks company searches with BM25, so that the company
+search no longer scans every company and returns matches in list order.
+
+- Each term has a postings list of the companies it occurs in, with its
+  frequency weighted by field: a term in the name counts more than one in
+  the sector, which counts more than one in the description. Words written
+  in CamelCase (BioPharma) are indexed whole and by their parts.
+- The last query term also matches the terms it is a prefix of, with a
+  lower weight, so that results keep up while the user is typing.
+- The country filter intersects each postings list with the sorted postings
+  of the country before scoring.
+- A query that only extends the last word of an earlier query matches a
+  subset of its companies (see narrows), so while the user is typing, the
+  companies matching the earlier query can be passed as candidates and only
+  they are scored.
+
+Postings live in one sorted base segment and a small delta segment that
+upserts append to. Replaced or removed companies are masked out until the
+delta grows past a fraction of the base, when both are merged into a new
+base segment. Term document frequencies and lengths are kept up to date on
+every change, so that scores don't depend on when segments were merged.
+
+Queries that match no term fall back to the names most similar by trigram
+similarity (see similar_companies). The base segment's names get a trigram
+index on the first such query, rebuilt lazily after each merge; names in
+the delta segment are compared one by one.
+"""
+import re
+import threading
+from bisect import bisect_left
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.trigrams import DEFAULT_THRESHOLD, TrigramIndex, similarity
+
+# Weight of a term occurrence in each indexed field
+FIELD_WEIGHTS = (("name", 3.0), ("sector", 2.0), ("description", 1.0))
+
+# BM25 parameters: term frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+# Score weight of the terms the last query term is a prefix of, and the most of them to score
+PREFIX_WEIGHT = 0.5
+MAX_EXPANSIONS = 32
+
+# Merge the delta segment into the base segment once it holds this fraction of the base postings
+MERGE_RATIO = 0.1
+
+_WORD = re.compile(r"[^\W_]+")
+# Words with a capital letter after their first character
+_CAMEL_WORD = re.compile(r"(?<![^\W_])(?=[^\W_]*?[^\W_][A-Z])[^\W_]+")
+# The same, also matching the line breaks between texts tokenized together
+_WORD_OR_BREAK = re.compile(r"[^\W_]+|\n")
+_CAMEL_WORD_OR_BREAK = re.compile(_CAMEL_WORD.pattern + r"|\n")
+_CAMEL_PART = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|[0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase index terms.
+
+    Args:
+        text: Text to index
+
+    Returns:
+        Terms of the words in text order, followed by the parts of the CamelCase words
+    """
+    terms = _WORD.findall(text.lower())
+    if not text.islower():
+        terms += _camel_parts(_CAMEL_WORD.findall(text))
+    return terms
+
+
+def _camel_parts(words: List[str]) -> List[str]:
+    """Lowercase parts of CamelCase words; line breaks are kept."""
+    parts = []
+    for word in words:
+        if word == "\n":
+            parts.append(word)
+            continue
+        word_parts = _CAMEL_PART.findall(word)
+        if len(word_parts) > 1:
+            parts.extend(part.lower() for part in word_parts)
+    return parts
+
+
+def _document_terms(company: Dict[str, Any]) -> Dict[str, float]:
+    """Field-weighted frequency of each term of a company."""
+    frequencies: Dict[str, float] = {}
+    for field, weight in FIELD_WEIGHTS:
+        for term in tokenize(company.get(field) or ""):
+            frequencies[term] = frequencies.get(term, 0.0) + weight
+    return frequencies
+
+
+def _grown(array: np.ndarray, size: int) -> np.ndarray:
+    """Array with room for at least size elements, doubling its capacity when it has to grow."""
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _merge_postings(
+    terms: np.ndarray,
+    docs: np.ndarray,
+    freqs: np.ndarray,
+    term_count: int,
+    doc_count: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Group (term, document, frequency) triples into postings lists.
+
+    Args:
+        terms: Term ID of each triple, in range(term_count)
+        docs: Document of each triple, in range(doc_count)
+        freqs: Frequency of each triple; triples of the same term and
+            document are summed
+        term_count: Number of terms
+        doc_count: Number of documents
+
+    Returns:
+        Tuple of (offsets, docs, freqs): the ascending documents of term t
+        and their frequencies are at offsets[t]:offsets[t + 1]
+    """
+    span = max(doc_count, 1)
+    keys = terms.astype(np.int64) * span + docs
+    order = np.argsort(keys)
+    keys, freqs = keys[order], freqs[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    starts = np.flatnonzero(first)
+    freqs = np.add.reduceat(freqs, starts) if len(starts) else freqs[:0]
+    terms, docs = np.divmod(keys[starts], span)
+    offsets = np.zeros(term_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(terms, minlength=term_count), out=offsets[1:])
+    return offsets, docs.astype(np.int32), freqs.astype(np.float32)
+
+
+def top_scores(positions: np.ndarray, scores: np.ndarray, limit: int) -> List[Tuple[int, float]]:
+    """
+    Select the best scored companies.
+
+    Args:
+        positions: Positions of the companies, ascending
+        scores: Score of each company
+        limit: Maximum number of results to return
+
+    Returns:
+        (position, score) pairs, by descending score, then position
+    """
+    if limit <= 0:
+        return []
+    if len(positions) > limit:
+        # Keep everything scoring at least the limit-th best, so that ties are cut by position
+        floor = np.partition(scores, len(positions) - limit)[len(positions) - limit]
+        keep = scores >= floor
+        positions, scores = positions[keep], scores[keep]
+    order = np.lexsort((positions, -scores))[:limit]
+    return list(zip(positions[order].tolist(), scores[order].tolist()))
+
+
+class CompanyIndex:
+    """BM25-ranked inverted index over the names, sectors and descriptions of companies."""
+
+    def __init__(self, companies: Sequence[Dict[str, Any]]):
+        """
+        Build the index.
+
+        Args:
+            companies: Companies with id, name, country, sector and
+                description; ties in score keep their order
+        """
+        self._lock = threading.RLock()
+        # Incremented on every change, as the scores and positions of companies can change
+        self.version = 0
+        self.companies: List[Optional[Dict[str, Any]]] = list(companies)
+        self._doc_ids = {str(company["id"]): doc for doc, company in enumerate(self.companies)}
+
+        # Every term occurrence of every company; each field of all companies is tokenized
+        # as one text with line breaks between the companies, which is much faster
+        streams = []
+        for field, weight in FIELD_WEIGHTS:
+            joined = "\n".join((company.get(field) or "").replace("\n", " ") for company in self.companies)
+            streams.append((_WORD_OR_BREAK.findall(joined.lower()), weight))
+            if not joined.islower():
+                streams.append((_camel_parts(_CAMEL_WORD_OR_BREAK.findall(joined)), weight))
+        # Terms are numbered in order of appearance
+        vocabulary = dict.fromkeys(chain.from_iterable(tokens for tokens, _ in streams))
+        vocabulary.pop("\n", None)
+        self._term_ids: Dict[str, int] = {term: term_id for term_id, term in enumerate(vocabulary)}
+        self._vocabulary = sorted(self._term_ids)
+        self._vocabulary_ids = [self._term_ids[term] for term in self._vocabulary]
+        codes = dict(self._term_ids, **{"\n": -1})
+        terms, docs, weights = [], [], []
+        for tokens, weight in streams:
+            stream_terms = np.fromiter(map(codes.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+            breaks = stream_terms < 0
+            terms.append(stream_terms[~breaks])
+            docs.append(np.cumsum(breaks)[~breaks])
+            weights.append(np.full(len(terms[-1]), weight))
+        terms, docs, weights = np.concatenate(terms), np.concatenate(docs), np.concatenate(weights)
+
+        size = len(self.companies)
+        self._lengths = np.bincount(docs, weights=weights, minlength=size)
+        self._live = np.ones(size, dtype=bool)
+        self._live_count = size
+        self._total_length = float(self._lengths.sum())
+        self._offsets, self._docs, self._freqs = _merge_postings(terms, docs, weights, len(self._term_ids), size)
+        self._df = np.diff(self._offsets)
+
+        self._country_docs: Dict[str, np.ndarray] = {}
+        self._index_countries()
+
+        # Postings appended since the base segment was built, by term ID
+        self._delta: Dict[int, Tuple[List[int], List[float]]] = {}
+        self._delta_countries: Dict[str, List[int]] = {}
+        self._delta_size = 0
+        # Companies in the base segment and the trigram index of their names, built on first use
+        self._base_size = len(self.companies)
+        self._names: Optional[TrigramIndex] = None
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    def _index_countries(self) -> None:
+        """Rebuild the sorted documents of each country; called when no company is removed."""
+        countries = [(company.get("country") or "").lower() for company in self.companies]
+        country_ids = {country: country_id for country_id, country in enumerate(dict.fromkeys(countries))}
+        codes = np.fromiter(map(country_ids.__getitem__, countries), dtype=np.int64, count=len(countries))
+        docs = np.argsort(codes, kind="stable").astype(np.int32)
+        bounds = np.cumsum(np.bincount(codes, minlength=len(country_ids)))[:-1]
+        self._country_docs = dict(zip(country_ids, np.split(docs, bounds)))
+
+    def _add(self, company: Dict[str, Any]) -> None:
+        """Append a company to the delta segment."""
+        doc = len(self.companies)
+        self.companies.append(company)
+        self._doc_ids[str(company["id"])] = doc
+        frequencies = _document_terms(company)
+        length = sum(frequencies.values())
+        # The per-document arrays grow by doubling, so they can be longer than companies
+        self._lengths = _grown(self._lengths, doc + 1)
+        self._live = _grown(self._live, doc + 1)
+        self._lengths[doc] = length
+        self._live[doc] = True
+        self._live_count += 1
+        self._total_length += length
+
+        for term, frequency in frequencies.items():
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                term_id = self._term_ids[term] = len(self._term_ids)
+                position = bisect_left(self._vocabulary, term)
+                self._vocabulary.insert(position, term)
+                self._vocabulary_ids.insert(position, term_id)
+                self._df = _grown(self._df, term_id + 1)
+            self._df[term_id] += 1
+            docs, freqs = self._delta.setdefault(term_id, ([], []))
+            docs.append(doc)
+            freqs.append(frequency)
+        self._delta_size += len(frequencies)
+        self._delta_countries.setdefault((company.get("country") or "").lower(), []).append(doc)
+
+    def _remove(self, doc: int) -> None:
+        """Mask out a company and take it out of the term statistics."""
+        frequencies = _document_terms(self.companies[doc])
+        for term in frequencies:
+            self._df[self._term_ids[term]] -= 1
+        self._live[doc] = False
+        self._live_count -= 1
+        self._total_length -= float(self._lengths[doc])
+        del self._doc_ids[str(self.companies[doc]["id"])]
+        self.companies[doc] = None
+
+    def _merge(self) -> None:
+        """Merge the delta segment into the base segment, dropping removed companies and renumbering the rest."""
+        base_terms = np.repeat(np.arange(len(self._offsets) - 1), np.diff(self._offsets))
+        delta_terms = [term_id for term_id, (docs, _) in self._delta.items() for _ in docs]
+        delta_docs = [doc for docs, _ in self._delta.values() for doc in docs]
+        delta_freqs = [freq for _, freqs in self._delta.values() for freq in freqs]
+        terms = np.concatenate([base_terms, np.array(delta_terms, dtype=np.int64)])
+        docs = np.concatenate([self._docs.astype(np.int64), np.array(delta_docs, dtype=np.int64)])
+        freqs = np.concatenate([self._freqs.astype(np.float64), np.array(delta_freqs, dtype=np.float64)])
+
+        live = self._live[:len(self.companies)]
+        keep = live[docs]
+        renumbered = np.cumsum(live) - 1
+        self.companies = [company for company in self.companies if company is not None]
+        self._doc_ids = {str(company["id"]): doc for doc, company in enumerate(self.companies)}
+        self._lengths = self._lengths[:len(live)][live]
+        self._live = np.ones(len(self.companies), dtype=bool)
+        self._offsets, self._docs, self._freqs = _merge_postings(
+            terms[keep], renumbered[docs[keep]], freqs[keep], len(self._term_ids), len(self.companies)
+        )
+        self._index_countries()
+        self._delta = {}
+        self._delta_countries = {}
+        self._delta_size = 0
+        self._base_size = len(self.companies)
+        self._names = None
+
+    def upsert(self, companies: Iterable[Dict[str, Any]]) -> None:
+        """
+        Add companies, replacing those already indexed with the same ID.
+
+        Args:
+            companies: Companies with id, name, country, sector and description
+        """
+        with self._lock:
+            for company in companies:
+                doc = self._doc_ids.get(str(company["id"]))
+                if doc is not None:
+                    self._remove(doc)
+                self._add(company)
+            self.version += 1
+            self._merge_if_needed()
+
+    def remove(self, company_ids: Iterable[str]) -> None:
+        """
+        Remove companies from the index.
+
+        Args:
+            company_ids: IDs of the companies to remove; unknown IDs are ignored
+        """
+        with self._lock:
+            for company_id in company_ids:
+                doc = self._doc_ids.get(str(company_id))
+                if doc is not None:
+                    self._remove(doc)
+            self.version += 1
+            self._merge_if_needed()
+
+    def _merge_if_needed(self) -> None:
+        """Merge the segments once the delta or the removed companies are a large enough part of the base."""
+        removed = len(self.companies) - self._live_count
+        if max(self._delta_size, removed) > MERGE_RATIO * max(len(self._docs), len(self.companies), 1):
+            self._merge()
+
+    def _postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Ascending documents of a term and its frequencies in them, from both segments."""
+        # Terms first seen after the base segment was built only have delta postings
+        start, end = (self._offsets[term_id], self._offsets[term_id + 1]) if term_id < len(self._offsets) - 1 else (0, 0)
+        docs, freqs = self._docs[start:end], self._freqs[start:end]
+        delta = self._delta.get(term_id)
+        if delta:
+            docs = np.concatenate([docs, np.array(delta[0], dtype=np.int32)])
+            freqs = np.concatenate([freqs, np.array(delta[1], dtype=np.float32)])
+        return docs, freqs
+
+    def _country_postings(self, country: str) -> np.ndarray:
+        """Ascending documents of the companies in a country, from both segments."""
+        country = country.lower()
+        docs = self._country_docs.get(country, np.zeros(0, dtype=np.int32))
+        delta = self._delta_countries.get(country)
+        return np.concatenate([docs, np.array(delta, dtype=np.int32)]) if delta else docs
+
+    def _expansions(self, word: str, prefix: bool) -> List[Tuple[int, float]]:
+        """Term IDs a query word matches with their score weights: itself, and if prefix, the most frequent terms it starts."""
+        expansions = [(self._term_ids[word], 1.0)] if word in self._term_ids else []
+        if prefix:
+            first = bisect_left(self._vocabulary, word)
+            last = bisect_left(self._vocabulary, word[:-1] + chr(ord(word[-1]) + 1), first)
+            term_ids = np.array(self._vocabulary_ids[first:last], dtype=np.int64)
+            term_ids = term_ids[term_ids != (expansions[0][0] if expansions else -1)]
+            if len(term_ids) > MAX_EXPANSIONS:
+                term_ids = term_ids[np.argpartition(-self._df[term_ids], MAX_EXPANSIONS - 1)[:MAX_EXPANSIONS]]
+            expansions.extend((term_id, PREFIX_WEIGHT) for term_id in term_ids.tolist())
+        return expansions
+
+    def narrows(self, previous: str, query: str) -> bool:
+        """
+        Check whether every company matching a query also matches an earlier query.
+
+        This is the case when the query has the same words as the earlier
+        query except for the last, which the earlier query's last word
+        starts, and the earlier last word's prefix matches were not cut to
+        the most frequent terms.
+
+        Args:
+            previous: Earlier search text
+            query: Search text
+
+        Returns:
+            True if the companies matching previous can be the candidates of query
+        """
+        previous_words = _WORD.findall(previous.lower())
+        words = _WORD.findall(query.lower())
+        if not words or len(words) != len(previous_words) or words[:-1] != previous_words[:-1]:
+            return False
+        word, previous_word = words[-1], previous_words[-1]
+        if word == previous_word:
+            return True
+        if not word.startswith(previous_word):
+            return False
+        with self._lock:
+            first = bisect_left(self._vocabulary, previous_word)
+            last = bisect_left(self._vocabulary, previous_word[:-1] + chr(ord(previous_word[-1]) + 1), first)
+            return last - first - (previous_word in self._term_ids) <= MAX_EXPANSIONS
+
+    def score(
+        self,
+        query: str,
+        country: Optional[str] = None,
+        candidates: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score every company matching a query with BM25.
+
+        Args:
+            query: Search text; its last word also matches as a prefix
+            country: Optional country the companies must be in, compared case-insensitively
+            candidates: Optional ascending positions of companies including
+                all that match the query (see narrows); only they are scored
+
+        Returns:
+            Tuple of (positions, scores) of the matching companies, by ascending position
+        """
+        words = _WORD.findall(query.lower())
+        with self._lock:
+            if not words or not self._live_count:
+                return np.zeros(0, dtype=np.int64), np.zeros(0)
+            allowed = self._country_postings(country) if country else None
+            if allowed is not None and not len(allowed):
+                return np.zeros(0, dtype=np.int64), np.zeros(0)
+            if candidates is not None:
+                if allowed is not None:
+                    candidates = candidates[np.isin(candidates, allowed, assume_unique=True)]
+                    allowed = None
+                candidates = candidates.astype(np.int64)
+            size = len(self.companies) if candidates is None else len(candidates)
+
+            average_length = self._total_length / self._live_count
+            scores = np.zeros(size)
+            for i, word in enumerate(words):
+                expansions = self._expansions(word, prefix=i == len(words) - 1)
+                # A word scores by its best matching term in each company
+                word_scores = np.zeros(size) if len(expansions) > 1 else scores
+                for term_id, weight in expansions:
+                    docs, freqs = self._postings(term_id)
+                    if allowed is not None:
+                        found = np.searchsorted(allowed, docs)
+                        hit = allowed[np.minimum(found, len(allowed) - 1)] == docs
+                        docs, freqs = docs[hit], freqs[hit]
+                    docs = docs.astype(np.int64)
+                    df = self._df[term_id]
+                    idf = np.log(1 + (self._live_count - df + 0.5) / (df + 0.5))
+                    norms = K1 * (1 - B + B * self._lengths[docs] / average_length)
+                    if candidates is not None:
+                        # Look the candidates up in the postings rather than the other way around
+                        found = np.searchsorted(docs, candidates)
+                        hit = docs[np.minimum(found, len(docs) - 1)] == candidates if len(docs) else found < 0
+                        freqs, norms = freqs[found[hit]], norms[found[hit]]
+                        docs = np.flatnonzero(hit)
+                    term_scores = weight * idf * freqs * (K1 + 1) / (freqs + norms)
+                    # A term's documents are distinct, so fancy indexing updates each once
+                    if word_scores is scores:
+                        scores[docs] += term_scores
+                    else:
+                        word_scores[docs] = np.maximum(word_scores[docs], term_scores)
+                if word_scores is not scores:
+                    scores += word_scores
+
+            matches = np.flatnonzero(scores > 0)
+            positions = matches if candidates is None else candidates[matches]
+            live = self._live[positions]
+            return positions[live], scores[matches[live]]
+
+    def search(
+        self,
+        query: str,
+        country: Optional[str] = None,
+        limit: int = 10,
+        candidates: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Rank companies by the BM25 score of their terms for a query.
+
+        Args:
+            query: Search text; its last word also matches as a prefix
+            country: Optional country the companies must be in, compared case-insensitively
+            limit: Maximum number of results to return
+            candidates: Optional ascending positions of companies including all that match the query
+
+        Returns:
+            (position in companies, score) pairs, by descending score, then position
+        """
+        return top_scores(*self.score(query, country, candidates), limit)
+
+    def search_companies(
+        self,
+        query: str,
+        country: Optional[str] = None,
+        limit: int = 10,
+        candidates: Optional[np.ndarray] = None,
+        version: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], np.ndarray, int]:
+        """
+        Rank companies for a query and look them up while the index is locked.
+
+        Positions change when the segments are merged, so they are only
+        valid for the version of the index they were found in.
+
+        Args:
+            query: Search text; its last word also matches as a prefix
+            country: Optional country the companies must be in, compared case-insensitively
+            limit: Maximum number of companies to return
+            candidates: Optional ascending positions of companies including all that match the query
+            version: Version of the index the candidates are positions in;
+                they are ignored if the index changed since
+
+        Returns:
+            Tuple of (companies by descending score, then position, ascending
+            positions of all matching companies, version of the index they are
+            positions in)
+        """
+        with self._lock:
+            if candidates is not None and version != self.version:
+                candidates = None
+            positions, scores = self.score(query, country, candidates)
+            companies = [self.companies[position] for position, _ in top_scores(positions, scores, limit)]
+            return companies, positions, self.version
+
+    def similar_companies(
+        self,
+        query: str,
+        country: Optional[str] = None,
+        limit: int = 10,
+        threshold: float = DEFAULT_THRESHOLD
+    ) -> List[Dict[str, Any]]:
+        """
+        Find the companies whose name is most similar to a query, for misspelled queries.
+
+        Args:
+            query: Search text
+            country: Optional country the companies must be in, compared case-insensitively
+            limit: Maximum number of companies to return
+            threshold: Minimum trigram similarity of a name to the query
+
+        Returns:
+            Companies by descending similarity, then position
+        """
+        with self._lock:
+            if self._names is None:
+                self._names = TrigramIndex([
+                    (company or {}).get("name") or "" for company in self.companies[:self._base_size]
+                ])
+            matches = [
+                (position, score) for position, score in self._names.search(query, threshold, limit=None)
+                if self._live[position]
+            ]
+            for doc in range(self._base_size, len(self.companies)):
+                if self._live[doc]:
+                    score = similarity(query, self.companies[doc].get("name") or "")
+                    if score >= threshold:
+                        matches.append((doc, score))
+            matches.sort(key=lambda match: (-match[1], match[0]))
+
+            companies = []
+            for position, _ in matches:
+                company = self.companies[position]
+                if not country or (company.get("country") or "").lower() == country.lower():
+                    companies.append(company)
+                    if len(companies) == limit:
+                        break
+            return companies
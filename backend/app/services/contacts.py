@@ -3,9 +3,17 @@ Contacts service.
 
 This module provides services for the contact intelligence functionality.
 """
-from typing import Dict, List, Any, Optional
+import uuid
+from typing import Dict, List, Any, Optional, Tuple
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
+from app.core import features
+from app.core.config import settings
+from app.db.search_indexes import contains_pattern, full_text_match
+from app.models.company import Company
+from app.models.contact import Contact
+
 # Mock data for development
 MOCK_CONTACTS = [
     {
@@ -90,6 +98,10 @@ MOCK_CONTACTS = [
     }
 ]
 
+# Mock contacts in canonical numeric form (integer scores, interaction
+# timestamps), parsed once at load time
+_CONTACT_RECORDS = [features.load_contact(contact) for contact in MOCK_CONTACTS]
+
 MOCK_CONTACT_STATS = {
     "total_contacts": 8942,
     "key_contacts": 234,
@@ -130,7 +142,85 @@ def get_prospect_contacts(
     # In a real implementation, this would query the database
     # For now, return mock data filtered by company_id
     
-    return [contact for contact in MOCK_CONTACTS if contact["company_id"] == prospect_id]
+    return [
+        features.serialize_contact(contact)
+        for contact in _CONTACT_RECORDS
+        if contact["company_id"] == prospect_id
+    ]
+
+
+def _parse_score_range(relationship_score: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parse a relationship score filter such as "80-100", or None if it is missing or malformed."""
+    if not relationship_score:
+        return None
+    try:
+        score_range = tuple(map(int, relationship_score.split("-")))
+    except ValueError:
+        return None
+    return score_range if len(score_range) == 2 else None
+
+
+def _search_contacts_in_database(
+    db: Session,
+    query: Optional[str],
+    company_id: Optional[str],
+    department: Optional[str],
+    seniority: Optional[str],
+    score_range: Optional[Tuple[int, int]],
+    limit: int
+) -> List[Dict[str, Any]]:
+    """
+    Search the contact table.
+    
+    The query is matched by full-text search on the contacts' name, role
+    and notes and ranked by ts_rank (see app.db.search_indexes). Queries
+    without whole-word matches, such as partial names, fall back to names
+    and roles containing the query. Without a query, contacts are ordered
+    by name.
+    """
+    contacts = db.query(Contact, Company.name).join(Company, Contact.company_id == Company.id)
+    if company_id:
+        try:
+            contacts = contacts.filter(Contact.company_id == uuid.UUID(company_id))
+        except ValueError:
+            return []
+    if department:
+        contacts = contacts.filter(Contact.department == department)
+    if seniority:
+        contacts = contacts.filter(Contact.seniority == seniority)
+    if score_range:
+        contacts = contacts.filter(Contact.relationship_score.between(*score_range))
+    
+    query = " ".join((query or "").split())
+    if query:
+        matches, rank = full_text_match("contact", query)
+        rows = contacts.filter(matches).order_by(rank.desc(), Contact.name).limit(limit).all()
+        if not rows:
+            contains = contains_pattern(query)
+            rows = contacts.filter(
+                or_(Contact.name.ilike(contains, escape="\\"), Contact.role.ilike(contains, escape="\\"))
+            ).order_by(Contact.name).limit(limit).all()
+    else:
+        rows = contacts.order_by(Contact.name).limit(limit).all()
+    
+    return [
+        features.serialize_contact({
+            "id": str(contact.id),
+            "name": contact.name,
+            "role": contact.role,
+            "company_id": str(contact.company_id),
+            "company_name": company_name,
+            "linkedin_url": contact.linkedin_url,
+            "email": contact.email,
+            "phone": contact.phone,
+            "department": contact.department,
+            "seniority": contact.seniority,
+            "relationship_score": contact.relationship_score,
+            "last_interaction_at": contact.last_interaction_at,
+            "notes": contact.notes,
+        })
+        for contact, company_name in rows
+    ]
 
 
 def search_contacts(
@@ -145,6 +235,10 @@ def search_contacts(
     """
     Search for contacts.
     
+    With settings.SEARCH_BACKEND set to "database", contacts are searched
+    in the contact table, ranked by full-text search on their name, role
+    and notes, or else matched by names and roles containing the query.
+    
     Args:
         db: Database session
         query: Search query for contact name or title
@@ -157,12 +251,17 @@ def search_contacts(
     Returns:
         List of matching contacts
     """
-    # In a real implementation, this would query the database
-    # For now, return mock data filtered by the parameters
+    # Parse the relationship score filter (e.g., "80-100") once per request;
+    # if parsing fails, the filter is ignored
+    score_range = _parse_score_range(relationship_score)
     
+    if settings.use_database_search:
+        return _search_contacts_in_database(db, query, company_id, department, seniority, score_range, limit)
+    
+    # Otherwise, return mock data filtered by the parameters
     results = []
     
-    for contact in MOCK_CONTACTS:
+    for contact in _CONTACT_RECORDS:
         # Apply company filter if specified
         if company_id and contact["company_id"] != company_id:
             continue
@@ -176,15 +275,10 @@ def search_contacts(
             continue
             
         # Apply relationship score filter if specified
-        if relationship_score:
-            # Parse relationship score filter (e.g., "80-100")
-            try:
-                min_score, max_score = map(int, relationship_score.split("-"))
-                if not (min_score <= contact["relationship_score"] <= max_score):
-                    continue
-            except ValueError:
-                # If parsing fails, ignore this filter
-                pass
+        if score_range:
+            min_score, max_score = score_range
+            if contact["relationship_score"] is None or not (min_score <= contact["relationship_score"] <= max_score):
+                continue
                 
         # Apply query filter if specified
         if query:
@@ -194,9 +288,10 @@ def search_contacts(
                 
         # If all filters pass, add contact to results
         results.append(contact)
+        if len(results) >= limit:
+            break
     
-    # Limit the results
-    return results[:limit]
+    return [features.serialize_contact(contact) for contact in results]
 
 
 def get_contact_stats(db: Session) -> Dict[str, Any]:
@@ -3,9 +3,46 @@ Dashboard service.
 
 This module provides services for the market trends dashboard.
 """
-from typing import Dict, List, Any, Optional
+import threading
+from typing import Dict, Iterable, List, Any, NamedTuple, Optional, Tuple
+from datetime import date
+
+import numpy as np
+from sqlalchemy import and_, case, distinct, func
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.core.downsampling import lttb
+from app.core.features import format_growth, format_usd
+from app.db.trade_aggregates import trade_monthly
+from app.models.transaction import Transaction
+from app.services.geography import REGION_COUNTRIES, country_region, get_geography
+from app.services.growth_table import get_growth_table
+from app.services.product_sketches import ProductSketches, get_product_sketches
+from app.services.trade_cube import TradeCube, get_trade_cube, month_index
+from app.services.trade_series import TOTAL_DIMENSIONS, get_trade_series
+
+# Months covered by each time period filter
+TIME_PERIOD_MONTHS = {"1m": 1, "3m": 3, "6m": 6, "12m": 12, "2y": 24}
+
+# Region filter values used by the frontend that don't match a region name
+REGION_ALIASES = {
+    "asia": ["Asia Pacific"],
+    "americas": ["North America", "Latin America"],
+}
+
+# Number of top companies per ranking whose leading products are materialized
+RANKING_DETAIL_DEPTH = 50
+
+# Chart colors of the regions in the regional breakdown
+REGION_COLORS = {
+    "North America": "primary",
+    "Europe": "success",
+    "Asia Pacific": "accent",
+    "Latin America": "warning",
+    "Africa": "primary-glow"
+}
+
 # Mock data for development
 MOCK_MARKET_TRENDS = {
     "global_trade_volume": {
@@ -115,11 +152,621 @@ MOCK_TOP_PRODUCTS = [
 ]
 
 
+def _region_names(region: Optional[str]) -> Optional[List[str]]:
+    """
+    Resolve a region filter to region names.
+    
+    Args:
+        region: Region name or frontend alias (e.g. "europe", "americas")
+        
+    Returns:
+        List of region names, or None if the filter doesn't restrict regions
+    """
+    if not region or region.lower() in ("all", "global"):
+        return None
+    key = region.lower()
+    if key in REGION_ALIASES:
+        return REGION_ALIASES[key]
+    return [name for name in REGION_COUNTRIES if name.lower() == key]
+
+
+def _region_countries(region: Optional[str]) -> Optional[List[str]]:
+    """
+    Resolve a region filter to the countries it covers.
+    
+    Args:
+        region: Region name or frontend alias
+        
+    Returns:
+        List of countries, or None if the filter doesn't restrict countries
+    """
+    names = _region_names(region)
+    if names is None:
+        return None
+    return [country for name in names for country in REGION_COUNTRIES[name]]
+
+
+def _add_months(period: date, months: int) -> date:
+    """Shift the first day of a month by a number of months."""
+    index = period.year * 12 + period.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _change(current: float, previous: float) -> Tuple[float, str]:
+    """Percentage change between two periods and its trend direction."""
+    change = (current - previous) / previous * 100 if previous else 0.0
+    return round(change, 1), "up" if change >= 0 else "down"
+
+
+def _count_metric(current: int, previous: int) -> Dict[str, Any]:
+    """Build a count metric with its absolute change against the previous period."""
+    return {"value": current, "change": current - previous, "trend": "up" if current >= previous else "down"}
+
+
+def _get_market_trends_from_aggregates(
+    db: Session, 
+    product_type: Optional[str], 
+    region: Optional[str], 
+    time_period: Optional[str]
+) -> Dict[str, Any]:
+    """
+    Compute market trends from the monthly trade aggregate.
+    
+    The selected period is compared with the period of the same length
+    before it. Both are read in three queries: monthly totals by source
+    country and distinct destination markets from the aggregate, and distinct
+    product and company counts from the (period-partitioned) transactions.
+    
+    Args:
+        db: Database session
+        product_type: Optional filter by product type
+        region: Optional filter by geographic region
+        time_period: Time period for the data
+        
+    Returns:
+        Dict containing market trends data
+    """
+    latest = db.query(func.max(trade_monthly.c.bucket)).scalar()
+    if latest is None:
+        latest = date.today().replace(day=1)
+    
+    months = TIME_PERIOD_MONTHS.get(time_period or "12m", 12)
+    end = _add_months(latest, 1)
+    start = _add_months(end, -months)
+    previous_start = _add_months(start, -months)
+    
+    geography = get_geography(db)
+    region_names = _region_names(region)
+    aggregate_filters = [trade_monthly.c.bucket >= previous_start, trade_monthly.c.bucket < end]
+    transaction_filters = [Transaction.period >= previous_start, Transaction.period < end]
+    if product_type and product_type.lower() != "all":
+        aggregate_filters.append(func.lower(trade_monthly.c.product_type) == product_type.lower())
+        transaction_filters.append(func.lower(Transaction.product_type) == product_type.lower())
+    if region_names is not None:
+        country_ids = sorted(geography.region_country_ids(region_names))
+        aggregate_filters.append(trade_monthly.c.source_country_id.in_(country_ids))
+        transaction_filters.append(Transaction.source_country_id.in_(country_ids))
+    
+    is_current = trade_monthly.c.bucket >= start
+    monthly_rows = (
+        db.query(trade_monthly.c.bucket, trade_monthly.c.source_country_id, func.sum(trade_monthly.c.value))
+        .filter(*aggregate_filters)
+        .group_by(trade_monthly.c.bucket, trade_monthly.c.source_country_id)
+        .all()
+    )
+    markets = (
+        db.query(
+            func.count(distinct(case((is_current, trade_monthly.c.destination_country_id)))),
+            func.count(distinct(case((~is_current, trade_monthly.c.destination_country_id)))),
+        )
+        .filter(*aggregate_filters)
+        .one()
+    )
+    transaction_is_current = Transaction.period >= start
+    counts = (
+        db.query(
+            func.count(distinct(case((transaction_is_current, Transaction.product_id)))),
+            func.count(distinct(case((~transaction_is_current, Transaction.product_id)))),
+            func.count(distinct(case((and_(transaction_is_current, Transaction.flow_type == "export"), Transaction.company_id)))),
+            func.count(distinct(case((and_(~transaction_is_current, Transaction.flow_type == "export"), Transaction.company_id)))),
+        )
+        .filter(*transaction_filters)
+        .one()
+    )
+    
+    monthly_values: Dict[date, float] = {}
+    region_values: Dict[str, List[float]] = {name: [0.0, 0.0] for name in REGION_COUNTRIES}
+    for bucket, source_country_id, value in monthly_rows:
+        value = value or 0.0
+        current = bucket >= start
+        if current:
+            monthly_values[bucket] = monthly_values.get(bucket, 0.0) + value
+        region_name = geography.country_regions.get(source_country_id)
+        if region_name in region_values:
+            region_values[region_name][0 if current else 1] += value
+    previous_total = sum(value or 0.0 for bucket, _, value in monthly_rows if bucket < start)
+    
+    return _market_trends_response(
+        region, start, [monthly_values.get(_add_months(start, offset), 0.0) for offset in range(months)],
+        previous_total, region_values, (counts[0], counts[1]), (counts[2], counts[3]), (markets[0], markets[1])
+    )
+
+
+def _get_market_trends_from_cube(
+    cube: TradeCube, 
+    product_type: Optional[str], 
+    region: Optional[str], 
+    time_period: Optional[str]
+) -> Dict[str, Any]:
+    """
+    Compute market trends from the in-process trade cube.
+    
+    Same result as _get_market_trends_from_aggregates. Trade values and
+    their changes are read from the cube's cumulative series, the distinct
+    counts from vectorized masks and bincounts over the cube's rows.
+    
+    Args:
+        cube: Trade cube
+        product_type: Optional filter by product type
+        region: Optional filter by geographic region
+        time_period: Time period for the data
+        
+    Returns:
+        Dict containing market trends data
+    """
+    latest = cube.latest_period or date.today().replace(day=1)
+    months = TIME_PERIOD_MONTHS.get(time_period or "12m", 12)
+    end = _add_months(latest, 1)
+    start = _add_months(end, -months)
+    previous_start = _add_months(start, -months)
+    
+    series = get_trade_series(cube, TOTAL_DIMENSIONS)
+    selected = series.select(**_series_filters(product_type, region))
+    _, previous_total = series.window_sum(selected, start, months)
+    by_region = series.window_sum(selected, start, months, by="region")
+    region_values = {
+        name: [float(by_region[0][code]), float(by_region[1][code])]
+        for code, name in enumerate(series.dictionaries["region"])
+    }
+    
+    filters = _cube_filters(product_type, region)
+    current_rows = cube.rows(start, end, **filters)
+    previous_rows = cube.rows(previous_start, start, **filters)
+    current_exports = cube.subset(current_rows, flow_type=["export"])
+    previous_exports = cube.subset(previous_rows, flow_type=["export"])
+    
+    return _market_trends_response(
+        region, start, series.month_sum(selected, start, months).tolist(), float(previous_total), region_values,
+        (cube.distinct_count("product", current_rows), cube.distinct_count("product", previous_rows)),
+        (cube.distinct_count("company", current_exports), cube.distinct_count("company", previous_exports)),
+        (cube.distinct_count("destination_country", current_rows),
+         cube.distinct_count("destination_country", previous_rows))
+    )
+
+
+def _cube_filters(product_type: Optional[str], region: Optional[str]) -> Dict[str, Optional[List[str]]]:
+    """Translate dashboard filters into trade cube dimension filters."""
+    product_types = [product_type] if product_type and product_type.lower() != "all" else None
+    return {"product_type": product_types, "source_country": _region_countries(region)}
+
+
+def _series_filters(product_type: Optional[str], region: Optional[str]) -> Dict[str, Optional[List[str]]]:
+    """Translate dashboard filters into trade series dimension filters."""
+    product_types = [product_type] if product_type and product_type.lower() != "all" else None
+    return {"product_type": product_types, "region": _region_names(region)}
+
+
+def _market_trends_response(
+    region: Optional[str],
+    start: date,
+    monthly_values: List[float],
+    previous_total: float,
+    region_values: Dict[str, List[float]],
+    products: Tuple[int, int],
+    companies: Tuple[int, int],
+    markets: Tuple[int, int]
+) -> Dict[str, Any]:
+    """
+    Build the market trends response from totals of the current and previous period.
+    
+    Args:
+        region: Region filter, restricting the regional breakdown
+        start: First month of the current period
+        monthly_values: Trade value of each month of the current period
+        previous_total: Trade value of the previous period
+        region_values: (current, previous) trade value by region name
+        products: (current, previous) number of traded products
+        companies: (current, previous) number of exporting companies
+        markets: (current, previous) number of destination markets
+        
+    Returns:
+        Dict containing market trends data
+    """
+    current_total = sum(monthly_values)
+    volume_change, volume_trend = _change(current_total, previous_total)
+    
+    regional_breakdown = []
+    for name in _region_names(region) or REGION_COUNTRIES:
+        current, previous = region_values[name]
+        regional_breakdown.append({
+            "name": name,
+            "volume": round(current / 1e9, 1),
+            "growth": _change(current, previous)[0],
+            "color": REGION_COLORS.get(name, "primary"),
+        })
+    
+    monthly_trends = []
+    peak = max(monthly_values, default=0.0)
+    previous_value = None
+    for offset, value in enumerate(monthly_values):
+        if value and value == peak:
+            color = "bg-accent"
+        elif previous_value is not None and value > previous_value:
+            color = "bg-success"
+        else:
+            color = "bg-primary"
+        month = _add_months(start, offset).strftime("%b")
+        monthly_trends.append({"month": month, "value": round(value / 1e9, 1), "color": color})
+        previous_value = value
+    
+    return {
+        "global_trade_volume": {
+            "value": round(current_total / 1e9, 1),
+            "unit": "B",
+            "currency": "USD",
+            "change": volume_change,
+            "trend": volume_trend
+        },
+        "active_products": _count_metric(*products),
+        "export_companies": _count_metric(*companies),
+        "active_markets": _count_metric(*markets),
+        "regional_breakdown": regional_breakdown,
+        "monthly_trends": monthly_trends
+    }
+
+
+class Ranking(NamedTuple):
+    """Companies or products of one dashboard slice, sorted by trade value."""
+    
+    codes: np.ndarray  # Trade cube codes, by descending value
+    volume: np.ndarray  # Value in the selected period
+    previous: np.ndarray  # Value in the period before
+    total: float  # Value of the whole slice in the selected period
+    products: Dict[int, List[int]]  # Leading product codes of the top companies
+
+
+def _ranking_key(
+    dim: str, 
+    product_type: Optional[str], 
+    region: Optional[str], 
+    time_period: Optional[str]
+) -> Tuple[str, str, str, int]:
+    """Normalize dashboard filters into a ranking slice key."""
+    product_type = product_type.lower() if product_type and product_type.lower() != "all" else "all"
+    region = region.lower() if region and region.lower() not in ("all", "global") else "all"
+    return dim, product_type, region, TIME_PERIOD_MONTHS.get(time_period or "12m", 12)
+
+
+def _ranking_slices(cube: TradeCube) -> List[Tuple[str, str, str, int]]:
+    """All exporter ranking slices selectable in the dashboard filters (top products come from sketches)."""
+    regions = ["all"] + [name.lower() for name in REGION_COUNTRIES] + list(REGION_ALIASES)
+    product_types = ["all"] + [product_type.lower() for product_type in cube.dictionaries["product_type"]]
+    return [
+        (dim, product_type, region, months)
+        for dim in ("company",)
+        for product_type in product_types
+        for region in regions
+        for months in sorted(set(TIME_PERIOD_MONTHS.values()))
+    ]
+
+
+def _ranking_period(cube: TradeCube, months: int) -> Tuple[date, date]:
+    """First month and the month after the last month of a ranking slice's period."""
+    end = _add_months(cube.latest_period or date.today().replace(day=1), 1)
+    return _add_months(end, -months), end
+
+
+def _ranking_rows(
+    cube: TradeCube, 
+    product_type: str, 
+    region: str, 
+    months: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Select the export rows of a ranking slice's period and the period before."""
+    start, end = _ranking_period(cube, months)
+    filters = _cube_filters(product_type, region)
+    return (
+        cube.rows(start, end, flow_type=["export"], **filters),
+        cube.rows(_add_months(start, -months), start, flow_type=["export"], **filters),
+    )
+
+
+def _leading_products(
+    cube: TradeCube, 
+    rows: np.ndarray, 
+    company_codes: np.ndarray, 
+    count: int = 3
+) -> Dict[int, List[int]]:
+    """
+    Find the highest-value products of each of the given companies.
+    
+    Args:
+        cube: Trade cube
+        rows: Row indices to include
+        company_codes: Companies to look at
+        count: Number of products per company
+        
+    Returns:
+        Product codes by company code, by descending value
+    """
+    selected = np.zeros(len(cube.dictionaries["company"]), dtype=bool)
+    selected[company_codes] = True
+    rows = rows[selected[cube.codes["company"][rows]]]
+    
+    # Sum value per (company, product) pair, then keep the first pairs of each company
+    product_count = max(len(cube.dictionaries["product"]), 1)
+    keys = cube.codes["company"][rows].astype(np.int64) * product_count + cube.codes["product"][rows]
+    pairs, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse, weights=cube.measures["value"][rows])
+    companies, products = np.divmod(pairs, product_count)
+    order = np.lexsort((-sums, companies))
+    companies, products = companies[order], products[order]
+    positions = np.arange(len(companies))
+    group_starts = np.maximum.accumulate(np.where(np.r_[True, companies[1:] != companies[:-1]], positions, 0))
+    leading = positions - group_starts < count
+    
+    result: Dict[int, List[int]] = {int(code): [] for code in company_codes}
+    for company, product in zip(companies[leading].tolist(), products[leading].tolist()):
+        result[company].append(product)
+    return result
+
+
+def _compute_ranking(cube: TradeCube, dim: str, product_type: str, region: str, months: int) -> Ranking:
+    """
+    Rank the companies or products of a slice by export value.
+    
+    Args:
+        cube: Trade cube
+        dim: "company" or "product"
+        product_type: Product type filter ("all" for none)
+        region: Region filter ("all" for none)
+        months: Length of the period in months
+        
+    Returns:
+        The ranking
+    """
+    if dim == "company":
+        # Company totals are window differences of the cumulative series
+        series = get_trade_series(cube)
+        start, end = _ranking_period(cube, months)
+        selected = series.select(flow_type=["export"], **_series_filters(product_type, region))
+        current, previous = series.window_sum(selected, start, months, by="company")
+    else:
+        current_rows, previous_rows = _ranking_rows(cube, product_type, region, months)
+        current = cube.group_sum(dim, current_rows)
+        previous = cube.group_sum(dim, previous_rows)
+    order = np.argsort(-current, kind="stable")
+    order = order[current[order] > 0]
+    
+    products = {}
+    if dim == "company":
+        # Only the leading products of the top companies need the cube's rows
+        current_rows = cube.rows(start, end, flow_type=["export"], **_cube_filters(product_type, region))
+        products = _leading_products(cube, current_rows, order[:RANKING_DETAIL_DEPTH])
+    return Ranking(order, current[order], previous[order], float(current.sum()), products)
+
+
+_rankings: Dict[Tuple[str, str, str, int], Ranking] = {}
+_rankings_cube: Optional[TradeCube] = None
+_rankings_lock = threading.Lock()
+
+
+def _get_ranking(
+    cube: TradeCube, 
+    dim: str, 
+    product_type: Optional[str], 
+    region: Optional[str], 
+    time_period: Optional[str]
+) -> Ranking:
+    """Get the ranking of a slice, computing it if it has not been materialized."""
+    global _rankings, _rankings_cube
+    key = _ranking_key(dim, product_type, region, time_period)
+    with _rankings_lock:
+        if _rankings_cube is not cube:
+            # The cube was replaced without refresh_rankings (e.g. loaded from disk)
+            _rankings, _rankings_cube = {}, cube
+        ranking = _rankings.get(key)
+    if ranking is None:
+        ranking = _compute_ranking(cube, *key)
+        with _rankings_lock:
+            if _rankings_cube is cube:
+                _rankings[key] = ranking
+    return ranking
+
+
+def refresh_rankings(
+    cube: TradeCube, 
+    source_countries: Optional[Iterable[str]] = None, 
+    product_types: Optional[Iterable[Optional[str]]] = None
+) -> None:
+    """
+    Materialize the top exporter and top product rankings of every dashboard slice.
+    
+    When a batch of transactions only touched some source countries and
+    product types and the latest month is unchanged, only the slices
+    containing them are recomputed; the rest are carried over.
+    
+    Args:
+        cube: Trade cube the rankings are computed from
+        source_countries: Source countries of the new transactions (None if unknown)
+        product_types: Product types of the new transactions (None if unknown)
+    """
+    global _rankings, _rankings_cube
+    with _rankings_lock:
+        previous_cube, rankings = _rankings_cube, dict(_rankings)
+    
+    incremental = (
+        previous_cube is not None
+        and source_countries is not None
+        and product_types is not None
+        and previous_cube.latest_period == cube.latest_period
+    )
+    if incremental:
+        touched_countries = set(source_countries)
+        touched_types = {(product_type or "Unknown").lower() for product_type in product_types}
+        for key in list(rankings):
+            _, product_type, region, _ = key
+            countries = _region_countries(region)
+            if (product_type == "all" or product_type in touched_types) and (
+                countries is None or touched_countries.intersection(countries)
+            ):
+                del rankings[key]
+    else:
+        rankings = {}
+    
+    for key in _ranking_slices(cube):
+        if key not in rankings:
+            rankings[key] = _compute_ranking(cube, *key)
+    
+    with _rankings_lock:
+        _rankings, _rankings_cube = rankings, cube
+
+
+def _top_exporters_from_cube(
+    cube: TradeCube, 
+    limit: int, 
+    product_type: Optional[str], 
+    region: Optional[str], 
+    time_period: Optional[str]
+) -> List[Dict[str, Any]]:
+    """
+    Read the top exporters of a slice from its materialized ranking.
+    
+    Args:
+        cube: Trade cube
+        limit: Number of exporters to return
+        product_type: Optional filter by product type
+        region: Optional filter by geographic region
+        time_period: Time period for the data
+        
+    Returns:
+        List of top exporters with their details
+    """
+    ranking = _get_ranking(cube, "company", product_type, region, time_period)
+    codes = ranking.codes[:limit]
+    products = ranking.products
+    if len(codes) > len(products):
+        # Deeper than the materialized details, compute the rest on demand
+        current_rows, _ = _ranking_rows(cube, *_ranking_key("company", product_type, region, time_period)[1:])
+        products = dict(products, **_leading_products(cube, current_rows, codes[len(products):]))
+    return _exporters_response(cube, ranking._replace(products=products), limit)
+
+
+def _exporters_response(cube: TradeCube, ranking: Ranking, limit: int) -> List[Dict[str, Any]]:
+    """
+    Build the top exporters response from a company ranking.
+    
+    Args:
+        cube: Trade cube, for company names and product categories
+        ranking: Company ranking with the leading products of at least its first limit companies
+        limit: Number of exporters to return
+        
+    Returns:
+        List of top exporters with their details
+    """
+    products = ranking.products
+    exporters = []
+    for rank, code in enumerate(ranking.codes[:limit].tolist(), start=1):
+        company_id = cube.dictionaries["company"][code]
+        label = cube.labels["company"].get(company_id, {})
+        categories = [
+            cube.labels["product"].get(cube.dictionaries["product"][p], {}).get("category") for p in products[code]
+        ]
+        exporters.append({
+            "rank": rank,
+            "company": label.get("name", company_id),
+            "country": label.get("country"),
+            "volume": format_usd(ranking.volume[rank - 1]),
+            "marketShare": round(ranking.volume[rank - 1] / ranking.total * 100, 1),
+            "growth": format_growth(_growth(ranking.volume[rank - 1], ranking.previous[rank - 1]), decimals=1),
+            "products": list(dict.fromkeys(c for c in categories if c)),
+        })
+    return exporters
+
+
+def _top_products_from_sketches(
+    sketches: ProductSketches, 
+    cube: TradeCube, 
+    limit: int, 
+    product_type: Optional[str], 
+    region: Optional[str], 
+    time_period: Optional[str]
+) -> List[Dict[str, Any]]:
+    """
+    Read the top products of a slice from the product heavy-hitters sketches.
+    
+    Volumes are upper bounds; volumeError is how much each may be
+    overestimated ("$0" when exact). Without a region filter, growth is
+    read from the growth table; a product's growth doesn't depend on the
+    product type filter, as each product has one type. With a region
+    filter it is estimated from the sketches and left out when the
+    product's value in the previous period isn't known to be positive.
+    
+    Args:
+        sketches: Product sketches
+        cube: Trade cube, for product names and categories
+        limit: Number of products to return
+        product_type: Optional filter by product type
+        region: Optional filter by geographic region
+        time_period: Time period for the data
+        
+    Returns:
+        List of top products with their details
+    """
+    product_types = [product_type] if product_type and product_type.lower() != "all" else None
+    months = TIME_PERIOD_MONTHS.get(time_period or "12m", 12)
+    
+    region_names = _region_names(region)
+    growth_table = get_growth_table(cube) if region_names is None else None
+    
+    products = []
+    for rank, (hit, previous) in enumerate(sketches.top(limit, months, region_names, product_types), start=1):
+        label = cube.labels["product"].get(hit.item, {})
+        if growth_table is not None:
+            growth = growth_table.window_growth("product", hit.item, months)
+        else:
+            growth = _growth(hit.count, previous.count) if previous.count > previous.error else None
+        products.append({
+            "rank": rank,
+            "name": label.get("name", hit.item),
+            "category": label.get("category"),
+            "volume": format_usd(hit.count),
+            "volumeError": format_usd(hit.error),
+            "growth": format_growth(growth, decimals=1),
+        })
+    return products
+
+
+def _growth(current: float, previous: float) -> Optional[float]:
+    """Growth ratio against the previous period, or None without a previous value."""
+    return (current - previous) / previous if previous else None
+
+
+def _downsample_trends(data: Dict[str, Any], max_points: Optional[int]) -> Dict[str, Any]:
+    """Reduce the monthly trends of a market trends response to at most max_points points with LTTB."""
+    trends = data["monthly_trends"]
+    if max_points is None or len(trends) <= max_points:
+        return data
+    kept = lttb(np.arange(len(trends)), [point["value"] for point in trends], max_points)
+    return {**data, "monthly_trends": [trends[index] for index in kept.tolist()]}
+
+
 def get_market_trends(
     db: Session, 
     product_type: Optional[str] = None, 
     region: Optional[str] = None, 
-    time_period: Optional[str] = "12m"
+    time_period: Optional[str] = "12m",
+    max_points: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Get market trends data for the dashboard.
@@ -129,28 +776,37 @@ def get_market_trends(
         product_type: Optional filter by product type
         region: Optional filter by geographic region
         time_period: Time period for the data
+        max_points: Optional maximum number of monthly trend points; longer
+            series are downsampled with Largest-Triangle-Three-Buckets
         
     Returns:
         Dict containing market trends data
     """
-    # In a real implementation, this would query the database
-    # For now, return mock data
+    if not settings.USE_MOCK_DATA:
+        cube = get_trade_cube()
+        if cube is not None:
+            data = _get_market_trends_from_cube(cube, product_type, region, time_period)
+        else:
+            data = _get_market_trends_from_aggregates(db, product_type, region, time_period)
+        return _downsample_trends(data, max_points)
     
     # Apply filters (simulated)
     data = MOCK_MARKET_TRENDS.copy()
     
     # Filter regional breakdown by region if specified
-    if region:
-        data["regional_breakdown"] = [r for r in data["regional_breakdown"] if r["name"] == region]
+    names = _region_names(region)
+    if names is not None:
+        data["regional_breakdown"] = [r for r in data["regional_breakdown"] if r["name"] in names]
     
-    return data
+    return _downsample_trends(data, max_points)
 
 
 def get_top_exporters(
     db: Session, 
     limit: int = 5, 
     product_type: Optional[str] = None, 
-    region: Optional[str] = None
+    region: Optional[str] = None, 
+    time_period: Optional[str] = "12m"
 ) -> List[Dict[str, Any]]:
     """
     Get top pharmaceutical exporters.
@@ -160,30 +816,25 @@ def get_top_exporters(
         limit: Number of exporters to return
         product_type: Optional filter by product type
         region: Optional filter by geographic region
+        time_period: Time period for the data
         
     Returns:
         List of top exporters with their details
     """
-    # In a real implementation, this would query the database
-    # For now, return mock data
+    if not settings.USE_MOCK_DATA:
+        cube = get_trade_cube()
+        if cube is not None:
+            return _top_exporters_from_cube(cube, limit, product_type, region, time_period)
+    
+    # Without a trade cube, fall back to mock data
     
     # Apply filters (simulated)
     data = MOCK_TOP_EXPORTERS.copy()
     
     # Filter by country if region is specified
-    if region:
-        # This is a simplified mapping for demonstration
-        region_country_map = {
-            "North America": ["United States", "Canada", "Mexico"],
-            "Europe": ["Switzerland", "Germany", "France", "United Kingdom"],
-            "Asia Pacific": ["Japan", "China", "India", "Australia"],
-            "Latin America": ["Brazil", "Argentina", "Colombia"],
-            "Africa": ["South Africa", "Egypt", "Nigeria"]
-        }
-        
-        countries = region_country_map.get(region, [])
-        if countries:
-            data = [e for e in data if e["country"] in countries]
+    countries = _region_countries(region)
+    if countries:
+        data = [e for e in data if e["country"] in countries]
     
     # Limit the results
     return data[:limit]
@@ -192,7 +843,9 @@ def get_top_exporters(
 def get_top_products(
     db: Session, 
     limit: int = 10, 
-    region: Optional[str] = None
+    region: Optional[str] = None, 
+    product_type: Optional[str] = None, 
+    time_period: Optional[str] = "12m"
 ) -> List[Dict[str, Any]]:
     """
     Get top pharmaceutical products.
@@ -201,15 +854,145 @@ def get_top_products(
         db: Database session
         limit: Number of products to return
         region: Optional filter by geographic region
+        product_type: Optional filter by product type
+        time_period: Time period for the data
         
     Returns:
         List of top products with their details
     """
-    # In a real implementation, this would query the database
-    # For now, return mock data
+    if not settings.USE_MOCK_DATA:
+        cube = get_trade_cube()
+        if cube is not None:
+            sketches = get_product_sketches(cube)
+            return _top_products_from_sketches(sketches, cube, limit, product_type, region, time_period)
+    
+    # Without a trade cube, fall back to mock data
     
     # Apply filters (simulated)
     data = MOCK_TOP_PRODUCTS.copy()
     
     # Limit the results
     return data[:limit]
+
+
+def _dashboard_snapshot_from_cube(
+    cube: TradeCube, 
+    product_type: Optional[str], 
+    region: Optional[str], 
+    time_period: Optional[str], 
+    exporters_limit: int, 
+    products_limit: int
+) -> Dict[str, Any]:
+    """
+    Compute the dashboard snapshot from one filtered slice of the trade cube.
+    
+    The rows of the selected period and the period before are selected once;
+    the trends, the exporter ranking and the product ranking are all sums
+    and distinct counts over that slice. Product volumes are exact, so their
+    volumeError is "$0" and their growth is the change against the previous
+    period of the same slice.
+    
+    Args:
+        cube: Trade cube
+        product_type: Optional filter by product type
+        region: Optional filter by geographic region
+        time_period: Time period for the data
+        exporters_limit: Number of exporters to return
+        products_limit: Number of products to return
+        
+    Returns:
+        Dict containing market trends data plus "top_exporters" and "top_products"
+    """
+    months = TIME_PERIOD_MONTHS.get(time_period or "12m", 12)
+    start, end = _ranking_period(cube, months)
+    
+    rows = cube.rows(_add_months(start, -months), end, **_cube_filters(product_type, region))
+    is_current = cube.month[rows] >= month_index(start)
+    current_rows, previous_rows = rows[is_current], rows[~is_current]
+    current_exports = cube.subset(current_rows, flow_type=["export"])
+    previous_exports = cube.subset(previous_rows, flow_type=["export"])
+    
+    region_values: Dict[str, List[float]] = {name: [0.0, 0.0] for name in REGION_COUNTRIES}
+    for index, country_rows in enumerate((current_rows, previous_rows)):
+        country_values = cube.group_sum("source_country", country_rows)
+        for code in np.flatnonzero(country_values).tolist():
+            region_name = country_region(cube.dictionaries["source_country"][code])
+            if region_name in region_values:
+                region_values[region_name][index] += float(country_values[code])
+    
+    snapshot = _market_trends_response(
+        region, start, cube.month_sum(start, months, current_rows).tolist(),
+        float(cube.measures["value"][previous_rows].sum()), region_values,
+        (cube.distinct_count("product", current_rows), cube.distinct_count("product", previous_rows)),
+        (cube.distinct_count("company", current_exports), cube.distinct_count("company", previous_exports)),
+        (cube.distinct_count("destination_country", current_rows),
+         cube.distinct_count("destination_country", previous_rows))
+    )
+    
+    rankings = {}
+    for dim in ("company", "product"):
+        current = cube.group_sum(dim, current_exports)
+        previous = cube.group_sum(dim, previous_exports)
+        order = np.argsort(-current, kind="stable")
+        order = order[current[order] > 0]
+        rankings[dim] = Ranking(order, current[order], previous[order], float(current.sum()), {})
+    
+    companies = rankings["company"]
+    companies = companies._replace(products=_leading_products(cube, current_exports, companies.codes[:exporters_limit]))
+    snapshot["top_exporters"] = _exporters_response(cube, companies, exporters_limit)
+    
+    products = rankings["product"]
+    snapshot["top_products"] = []
+    for rank, code in enumerate(products.codes[:products_limit].tolist(), start=1):
+        product_id = cube.dictionaries["product"][code]
+        label = cube.labels["product"].get(product_id, {})
+        snapshot["top_products"].append({
+            "rank": rank,
+            "name": label.get("name", product_id),
+            "category": label.get("category"),
+            "volume": format_usd(products.volume[rank - 1]),
+            "volumeError": format_usd(0),
+            "growth": format_growth(_growth(products.volume[rank - 1], products.previous[rank - 1]), decimals=1),
+        })
+    return snapshot
+
+
+def get_dashboard_snapshot(
+    db: Session, 
+    product_type: Optional[str] = None, 
+    region: Optional[str] = None, 
+    time_period: Optional[str] = "12m", 
+    exporters_limit: int = 5, 
+    products_limit: int = 10
+) -> Dict[str, Any]:
+    """
+    Get everything the dashboard page shows for one filter combination.
+    
+    With a trade cube, market trends (including the regional breakdown and
+    monthly trends), top exporters and top products are all computed from
+    one filtered slice of the cube; otherwise each section falls back to
+    its own service function.
+    
+    Args:
+        db: Database session
+        product_type: Optional filter by product type
+        region: Optional filter by geographic region
+        time_period: Time period for the data
+        exporters_limit: Number of exporters to return
+        products_limit: Number of products to return
+        
+    Returns:
+        Dict containing market trends data plus "top_exporters" and "top_products"
+    """
+    if not settings.USE_MOCK_DATA:
+        cube = get_trade_cube()
+        if cube is not None:
+            return _dashboard_snapshot_from_cube(
+                cube, product_type, region, time_period, exporters_limit, products_limit
+            )
+    
+    snapshot = dict(get_market_trends(db, product_type, region, time_period))
+    snapshot["top_exporters"] = get_top_exporters(db, exporters_limit, product_type, region, time_period)
+    snapshot["top_products"] = get_top_products(db, products_limit, region, product_type, time_period)
+    return snapshot
+
@@ -0,0 +1,251 @@
+"""
+Dashboard stream service.
+
+This module pushes dashboard updates to clients over Server-Sent Events.
+Subscribers are grouped into channels by their dashboard filters. When the
+trade data changes, each channel's snapshot is recomputed once, compared
+with the previous one, and the same small delta (changed metrics, changed
+rank positions, new or changed month points) is sent to every subscriber of
+the channel.
+"""
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+from app.core import data_version
+from app.core.serialization import dumps
+from app.db.session import SessionLocal
+from app.services import dashboard as dashboard_service
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Data changes that trigger a push
+STREAM_DATA_DOMAINS = (data_version.TRADE, data_version.COMPANY)
+
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_SECONDS = 15
+
+# Events buffered per subscriber before it is sent a full snapshot instead
+SUBSCRIBER_QUEUE_SIZE = 32
+
+
+def snapshot_delta(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compute the changes between two dashboard snapshots.
+
+    Dict fields are compared as a whole. List fields (breakdowns, trends and
+    rankings) are compared position by position, so a reordered ranking
+    only sends the positions that changed.
+
+    Args:
+        previous: Snapshot the client has
+        current: New snapshot
+
+    Returns:
+        Changed fields; list fields map to {"length": ..., "items": {index: item}}
+    """
+    delta: Dict[str, Any] = {}
+    for key, value in current.items():
+        old = previous.get(key)
+        if value == old:
+            continue
+        if isinstance(value, list) and isinstance(old, list):
+            items = {
+                str(index): item
+                for index, item in enumerate(value)
+                if index >= len(old) or old[index] != item
+            }
+            delta[key] = {"length": len(value), "items": items}
+        else:
+            delta[key] = value
+    return delta
+
+
+def format_event(event: str, data: Dict[str, Any]) -> str:
+    """
+    Format a Server-Sent Event.
+
+    Args:
+        event: Event name
+        data: Event payload
+
+    Returns:
+        The event in text/event-stream format
+    """
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+
+def _compute_snapshot(filters: Dict[str, Optional[str]]) -> Dict[str, Any]:
+    """Compute a dashboard snapshot with its own database session."""
+    db = SessionLocal()
+    try:
+        return dashboard_service.get_dashboard_snapshot(db, **filters)
+    finally:
+        db.close()
+
+
+class _Channel:
+    """Subscribers sharing one filter combination and their last snapshot."""
+
+    def __init__(self, filters: Dict[str, Optional[str]]):
+        self.filters = filters
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self.version: Optional[Tuple[int, ...]] = None
+
+
+class DashboardBroadcaster:
+    """Pushes dashboard deltas to subscribers, computing each delta once per filter combination."""
+
+    def __init__(self, compute_snapshot=_compute_snapshot):
+        """
+        Initialize the broadcaster.
+
+        Args:
+            compute_snapshot: Function computing a snapshot from dashboard filters
+        """
+        self._compute_snapshot = compute_snapshot
+        self._channels: Dict[Tuple, _Channel] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Snapshots are updated one channel at a time, so that deltas are computed and sent in order
+        self._update_lock = asyncio.Lock()
+        self._refresh_pending = False
+        self._listening = False
+
+    @staticmethod
+    def channel_key(filters: Dict[str, Optional[str]]) -> Tuple:
+        """Normalize filters into the key of their channel."""
+        return tuple(sorted((name, (value or "").lower()) for name, value in filters.items()))
+
+    async def _update(self, channel: _Channel) -> None:
+        """
+        Recompute a channel's snapshot off the event loop and push the delta to its subscribers.
+
+        Called with the update lock held; channels whose snapshot is still
+        current are left as they are.
+        """
+        version = data_version.get_version(*STREAM_DATA_DOMAINS)
+        if channel.snapshot is not None and channel.version == version:
+            return
+        snapshot = await asyncio.get_running_loop().run_in_executor(None, self._compute_snapshot, channel.filters)
+        delta = snapshot_delta(channel.snapshot or {}, snapshot)
+        channel.snapshot = snapshot
+        channel.version = version
+        if not delta:
+            return
+
+        event = format_event("delta", delta)
+        for queue in list(channel.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # The subscriber fell behind; replace its backlog with a full snapshot
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(format_event("snapshot", snapshot))
+
+    async def subscribe(self, filters: Dict[str, Optional[str]]) -> Tuple[Tuple, asyncio.Queue, Dict[str, Any]]:
+        """
+        Subscribe to the dashboard updates of a filter combination.
+
+        Args:
+            filters: Dashboard filters (product_type, region, time_period)
+
+        Returns:
+            Tuple of (channel key, queue of events, current snapshot)
+        """
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        if not self._listening:
+            data_version.add_listener(self._on_data_change)
+            self._listening = True
+
+        key = self.channel_key(filters)
+        async with self._update_lock:
+            channel = self._channels.get(key)
+            if channel is None:
+                channel = self._channels[key] = _Channel(filters)
+            joined = False
+            try:
+                # A stale snapshot is updated like in a refresh, so that existing subscribers get the delta
+                await self._update(channel)
+                # Unsubscribing doesn't wait for the lock, so the last other subscriber may have dropped
+                # the channel during the update; registering it again keeps it in the refreshes
+                self._channels[key] = channel
+                queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+                channel.subscribers.add(queue)
+                joined = True
+                return key, queue, channel.snapshot
+            finally:
+                # A channel created for a subscriber whose first snapshot failed is not kept
+                if not joined and not channel.subscribers and self._channels.get(key) is channel:
+                    del self._channels[key]
+
+    def unsubscribe(self, key: Tuple, queue: asyncio.Queue) -> None:
+        """
+        Remove a subscriber; channels without subscribers are dropped.
+
+        Args:
+            key: Channel key returned by subscribe
+            queue: Queue returned by subscribe
+        """
+        channel = self._channels.get(key)
+        if channel is None:
+            return
+        channel.subscribers.discard(queue)
+        if not channel.subscribers:
+            del self._channels[key]
+
+    def _on_data_change(self, domains: Tuple[str, ...]) -> None:
+        """Schedule a refresh on the event loop; called from whichever thread bumped the data."""
+        if self._loop is None or not set(domains) & set(STREAM_DATA_DOMAINS):
+            return
+        self._loop.call_soon_threadsafe(self._schedule_refresh)
+
+    def _schedule_refresh(self) -> None:
+        """Start a refresh unless one is already pending; bursts of changes share one refresh."""
+        if self._refresh_pending:
+            return
+        self._refresh_pending = True
+        asyncio.ensure_future(self.refresh())
+
+    async def refresh(self) -> None:
+        """Recompute the snapshot of every stale channel and push the deltas to its subscribers."""
+        async with self._update_lock:
+            # Changes after this point schedule another refresh, which runs once this one is done
+            self._refresh_pending = False
+            for channel in list(self._channels.values()):
+                try:
+                    await self._update(channel)
+                except Exception as e:
+                    logger.error(f"Error refreshing dashboard stream {channel.filters}: {str(e)}")
+
+    async def events(self, filters: Dict[str, Optional[str]], is_disconnected) -> AsyncIterator[str]:
+        """
+        Stream the events of a subscriber.
+
+        The stream starts with the current snapshot, followed by deltas and
+        periodic keep-alive comments until the client disconnects.
+
+        Args:
+            filters: Dashboard filters
+            is_disconnected: Coroutine function telling whether the client has gone
+
+        Yields:
+            Events in text/event-stream format
+        """
+        key, queue, snapshot = await self.subscribe(filters)
+        try:
+            yield format_event("snapshot", snapshot)
+            while not await is_disconnected():
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(key, queue)
+
+
+# Broadcaster shared by all dashboard stream requests
+broadcaster = DashboardBroadcaster()
@@ -0,0 +1,287 @@
+"""
+Entity resolution service.
+
+This module merges prospects that refer to the same company, such as a
+research-based prospect and a company already known to the database.
+
+Instead of comparing every pair of prospects, each prospect is assigned a
+small set of blocking keys (normalized website domain, and legal-suffix-stripped
+name tokens plus country). Only prospects sharing a block are compared.
+
+A prospect's name keys are its rarest name tokens: just enough of them that
+any two prospects whose names reach the similarity threshold share one
+(prefix filtering), so word order doesn't matter and common words such as
+"pharma" only become keys of names that have nothing rarer. Blocks stop
+growing at MAX_BLOCK_SIZE, which bounds the comparisons per prospect.
+"""
+import math
+import re
+from collections import Counter
+from itertools import chain
+from typing import Dict, List, Any, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+# Legal-form suffixes that do not identify a company
+LEGAL_SUFFIXES = {
+    "ag", "as", "bv", "co", "corp", "corporation", "company", "gmbh", "inc",
+    "incorporated", "kg", "kgaa", "limited", "llc", "llp", "lp", "ltd", "nv",
+    "oy", "plc", "pte", "pty", "pvt", "sa", "sab", "sarl", "sas", "se", "spa",
+    "srl", "ab", "aps",
+}
+
+# Filler words and industry terms that are normalized to a canonical form
+NAME_STOPWORDS = {"the", "and", "of"}
+NAME_SYNONYMS = {
+    "pharmaceutical": "pharma",
+    "pharmaceuticals": "pharma",
+    "pharmaceutica": "pharma",
+    "laboratories": "labs",
+    "laboratory": "labs",
+    "lab": "labs",
+    "intl": "international",
+}
+
+# Common aliases for country names used in research results
+COUNTRY_ALIASES = {
+    "usa": "united states",
+    "us": "united states",
+    "united states of america": "united states",
+    "uk": "united kingdom",
+    "great britain": "united kingdom",
+    "uae": "united arab emirates",
+}
+
+# Minimum name-token Jaccard similarity for two prospects to be considered the same company
+NAME_SIMILARITY_THRESHOLD = 0.6
+
+# Most prospects a block holds; later prospects with the same key are not added to it
+MAX_BLOCK_SIZE = 50
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_domain(website: Optional[str]) -> Optional[str]:
+    """
+    Normalize a website URL to its bare domain.
+
+    Args:
+        website: Website URL, with or without scheme
+
+    Returns:
+        Lowercase domain without "www." and port, or None if no domain is present
+    """
+    if not website:
+        return None
+
+    website = website.strip().lower()
+    if "//" not in website:
+        website = f"//{website}"
+
+    host = urlparse(website).hostname
+    if not host:
+        return None
+    if host.startswith("www."):
+        host = host[4:]
+    return host or None
+
+
+def name_tokens(name: Optional[str]) -> Tuple[str, ...]:
+    """
+    Tokenize a company name, dropping legal suffixes and filler words.
+
+    Args:
+        name: Company name
+
+    Returns:
+        Tuple of normalized name tokens, in their original order
+    """
+    if not name:
+        return ()
+
+    tokens = []
+    # Dots are dropped first, so that dotted legal forms such as "S.A." become suffixes ("sa")
+    for token in _TOKEN_PATTERN.findall(name.lower().replace(".", "")):
+        if token in LEGAL_SUFFIXES or token in NAME_STOPWORDS:
+            continue
+        tokens.append(NAME_SYNONYMS.get(token, token))
+    return tuple(tokens)
+
+
+def normalize_country(location: Optional[str]) -> Optional[str]:
+    """
+    Extract and normalize the country from a prospect location.
+
+    Args:
+        location: Location string such as "Berlin, Germany" or "USA"
+
+    Returns:
+        Lowercase country name, or None if the location is empty
+    """
+    if not location:
+        return None
+
+    country = location.split(",")[-1].strip().lower()
+    return COUNTRY_ALIASES.get(country, country) or None
+
+
+class _Record:
+    """Precomputed matching features for one prospect."""
+
+    __slots__ = ("prospect", "domain", "tokens", "country")
+
+    def __init__(self, prospect: Dict[str, Any]):
+        self.prospect = prospect
+        self.domain = normalize_domain(prospect.get("website"))
+        self.tokens = name_tokens(prospect.get("name"))
+        self.country = normalize_country(prospect.get("location"))
+
+    def blocking_keys(self, token_counts: Dict[str, int], threshold: float) -> Set[Tuple[str, ...]]:
+        """Blocking keys for this record; records sharing any key are compared."""
+        keys = set()
+        if self.domain:
+            keys.add(("domain", self.domain))
+        tokens = sorted(set(self.tokens), key=lambda token: (token_counts.get(token, 0), token))
+        # Names with a Jaccard similarity of at least threshold share one of their rarest tokens
+        prefix = len(tokens) - math.ceil(threshold * len(tokens) - 1e-9) + 1
+        for token in tokens[:max(1, prefix)]:
+            keys.add(("name", token, self.country or ""))
+        return keys
+
+
+def blocking_keys(
+    prospect: Dict[str, Any],
+    token_counts: Optional[Dict[str, int]] = None,
+    threshold: float = NAME_SIMILARITY_THRESHOLD
+) -> Set[Tuple[str, ...]]:
+    """
+    Derive the blocking keys for a prospect.
+
+    Keys are the normalized website domain, and the rarest legal-suffix-stripped
+    name tokens, each together with the country.
+
+    Args:
+        prospect: Prospect dictionary
+        token_counts: Number of prospects each name token occurs in; without
+            it, tokens are taken in alphabetical order
+        threshold: Minimum similarity of the prospects that must share a key
+
+    Returns:
+        Set of blocking keys; prospects sharing any key are compared
+    """
+    return _Record(prospect).blocking_keys(token_counts or {}, threshold)
+
+
+def _similarity(a: _Record, b: _Record) -> float:
+    """
+    Score how likely two records refer to the same company.
+
+    Args:
+        a: First record
+        b: Second record
+
+    Returns:
+        Similarity between 0 and 1
+    """
+    if a.domain and a.domain == b.domain:
+        return 1.0
+    if a.country and b.country and a.country != b.country:
+        return 0.0
+    if not a.tokens or not b.tokens:
+        return 0.0
+    a_tokens, b_tokens = set(a.tokens), set(b.tokens)
+    return len(a_tokens & b_tokens) / len(a_tokens | b_tokens)
+
+
+def _merge(known: Dict[str, Any], duplicate: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merge a duplicate prospect into a known prospect.
+
+    The known prospect's ID and values win; fields it lacks are filled in from
+    the duplicate, and the higher opportunity score is kept.
+
+    Args:
+        known: Prospect to keep
+        duplicate: Prospect describing the same company
+
+    Returns:
+        The merged prospect
+    """
+    merged = dict(known)
+    for key, value in duplicate.items():
+        if merged.get(key) in (None, "", []):
+            merged[key] = value
+
+    merged["opportunityScore"] = max(
+        known.get("opportunityScore") or 0, duplicate.get("opportunityScore") or 0
+    )
+    merged["mergedIds"] = known.get("mergedIds", []) + [duplicate.get("id")] + duplicate.get("mergedIds", [])
+    return merged
+
+
+def merge_prospects(
+    known: List[Dict[str, Any]],
+    incoming: List[Dict[str, Any]],
+    threshold: float = NAME_SIMILARITY_THRESHOLD
+) -> List[Dict[str, Any]]:
+    """
+    Merge incoming prospects into a list of known prospects.
+
+    Incoming prospects that match a known prospect (or an earlier incoming
+    prospect) are merged into it; the rest are appended. Input dictionaries
+    are never modified.
+
+    Args:
+        known: Prospects already known, e.g. from the database
+        incoming: New prospects, e.g. from deep research
+        threshold: Minimum similarity for two prospects to be merged
+
+    Returns:
+        Deduplicated list of prospects, known prospects first
+    """
+    known_records = [_Record(prospect) for prospect in known]
+    incoming_records = [_Record(prospect) for prospect in incoming]
+    token_counts = Counter(
+        token for record in chain(known_records, incoming_records) for token in set(record.tokens)
+    )
+    records: List[_Record] = []
+    blocks: Dict[Tuple[str, ...], List[int]] = {}
+
+    def add_to_block(key: Tuple[str, ...], index: int) -> None:
+        block = blocks.setdefault(key, [])
+        if len(block) < MAX_BLOCK_SIZE and index not in block:
+            block.append(index)
+
+    def add(record: _Record) -> None:
+        index = len(records)
+        records.append(record)
+        for key in record.blocking_keys(token_counts, threshold):
+            add_to_block(key, index)
+
+    for record in known_records:
+        add(record)
+
+    for candidate in incoming_records:
+        prospect = candidate.prospect
+        candidate_keys = candidate.blocking_keys(token_counts, threshold)
+        best_index, best_score = None, threshold
+        seen = set()
+        for key in candidate_keys:
+            for index in blocks.get(key, ()):
+                if index in seen:
+                    continue
+                seen.add(index)
+                score = _similarity(candidate, records[index])
+                if score >= best_score:
+                    best_index, best_score = index, score
+
+        if best_index is None:
+            add(candidate)
+            continue
+
+        # Rebuild the features so fields filled in by the merge (e.g. website) count
+        records[best_index] = _Record(_merge(records[best_index].prospect, prospect))
+        # Let later duplicates find the merged prospect through this one's keys too
+        for key in candidate_keys:
+            add_to_block(key, best_index)
+
+    return [record.prospect for record in records]
@@ -0,0 +1,175 @@
+"""
+Geography service.
+
+This module maintains the country and region dimension tables that
+transactions reference by small integer codes, and an in-process index of
+them: code to name, name to code, and the set of country codes in each
+region, so that region filters become a precomputed code-set lookup.
+"""
+import logging
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core import data_version
+from app.core.cache import VersionedCache
+from app.models.country import Country
+from app.models.region import Region
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Countries in each region, used to seed the dimension tables. Trade is
+# attributed to the region of its source (exporting) country.
+REGION_COUNTRIES = {
+    "North America": ["United States", "Canada", "Mexico"],
+    "Europe": ["Switzerland", "Germany", "France", "United Kingdom"],
+    "Asia Pacific": ["Japan", "China", "India", "Australia"],
+    "Latin America": ["Brazil", "Argentina", "Colombia"],
+    "Africa": ["South Africa", "Egypt", "Nigeria"]
+}
+
+_COUNTRY_REGIONS = {country: region for region, countries in REGION_COUNTRIES.items() for country in countries}
+
+_REGIONS_BY_COUNTRY = {country.lower(): region for country, region in _COUNTRY_REGIONS.items()}
+
+# Geography index, reloaded when the trade data (which the dimensions belong to) changes
+_index_cache = VersionedCache(maxsize=1)
+
+
+class GeographyIndex:
+    """Lookups between country codes, country names and regions."""
+
+    def __init__(self, countries: Iterable[Tuple[int, str, Optional[str]]]):
+        """
+        Initialize the index.
+
+        Args:
+            countries: Tuples of (country code, country name, region name or None)
+        """
+        self.country_names: Dict[int, str] = {}
+        self.country_regions: Dict[int, str] = {}
+        self._country_ids: Dict[str, int] = {}
+        region_countries: Dict[str, set] = {}
+        for country_id, name, region in countries:
+            self.country_names[country_id] = name
+            self._country_ids[name.lower()] = country_id
+            if region:
+                self.country_regions[country_id] = region
+                region_countries.setdefault(region, set()).add(country_id)
+        self.region_countries: Dict[str, FrozenSet[int]] = {
+            region: frozenset(ids) for region, ids in region_countries.items()
+        }
+
+    def country_id(self, name: str) -> Optional[int]:
+        """
+        Get the code of a country.
+
+        Args:
+            name: Country name, matched case-insensitively
+
+        Returns:
+            The country code, or None if the country is unknown
+        """
+        return self._country_ids.get(name.lower())
+
+    def region_country_ids(self, regions: Iterable[str]) -> FrozenSet[int]:
+        """
+        Get the codes of the countries in some regions.
+
+        Args:
+            regions: Region names
+
+        Returns:
+            Set of country codes
+        """
+        return frozenset().union(*(self.region_countries.get(region, frozenset()) for region in regions))
+
+
+def country_region(country: Optional[str]) -> Optional[str]:
+    """
+    Get the region of a country from REGION_COUNTRIES, without a database lookup.
+
+    Args:
+        country: Country name, matched case-insensitively
+
+    Returns:
+        The region name, or None if the country is in no region
+    """
+    return _REGIONS_BY_COUNTRY.get(country.lower()) if country else None
+
+
+def get_geography(db: Session) -> GeographyIndex:
+    """
+    Get the geography index, loading it from the dimension tables if needed.
+
+    Args:
+        db: Database session
+
+    Returns:
+        The geography index
+    """
+    version = data_version.get_version(data_version.TRADE)
+    index = _index_cache.get("geography", version)
+    if index is None:
+        rows = db.query(Country.id, Country.name, Region.name).outerjoin(Region, Country.region_id == Region.id).all()
+        index = GeographyIndex(rows)
+        _index_cache.set("geography", index, version)
+    return index
+
+
+def resolve_country_ids(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """
+    Get the codes of countries by name, adding unknown countries to the dimension table.
+
+    New countries are assigned to their region when it is known from
+    REGION_COUNTRIES. The session is flushed but not committed.
+
+    Args:
+        db: Database session
+        names: Country names
+
+    Returns:
+        Country code by name, for every given name
+    """
+    names = set(names)
+    if not names:
+        return {}
+    lowered = {name.lower(): name for name in names}
+    found = {
+        name.lower(): country_id
+        for country_id, name in db.query(Country.id, Country.name).filter(func.lower(Country.name).in_(list(lowered)))
+    }
+
+    missing = [lowered[key] for key in lowered if key not in found]
+    if missing:
+        region_ids = dict(db.query(Region.name, Region.id).all())
+        countries = [Country(name=name, region_id=region_ids.get(_COUNTRY_REGIONS.get(name))) for name in missing]
+        db.add_all(countries)
+        db.flush()
+        found.update({country.name.lower(): country.id for country in countries})
+        _index_cache.clear()
+        logger.info(f"Added {len(countries)} countries to the country dimension")
+
+    return {name: found[name.lower()] for name in names}
+
+
+def seed_geography(db: Session) -> None:
+    """
+    Add the regions and countries of REGION_COUNTRIES to the dimension tables.
+
+    Existing rows are kept, so this can run on every start.
+
+    Args:
+        db: Database session
+    """
+    existing_regions = {name for (name,) in db.query(Region.name)}
+    new_regions = [Region(name=name) for name in REGION_COUNTRIES if name not in existing_regions]
+    if new_regions:
+        db.add_all(new_regions)
+        db.flush()
+
+    countries: List[str] = [country for members in REGION_COUNTRIES.values() for country in members]
+    resolve_country_ids(db, countries)
+    db.commit()
@@ -0,0 +1,229 @@
+"""
+Growth table service.
+
+This module computes the growth figures of every company, exporter, product,
+region and trade lane from the trade cube in one batch. Each entity's trade
+value is laid out as a row of a monthly matrix. Calendar-year totals and
+their year-over-year growth, and the rolling-window totals of the dashboard
+time periods with their growth against the window before, are then whole-
+matrix array shifts rather than per-entity loops.
+
+The table is rebuilt once per trade cube (the ingest service builds it
+right after refreshing the cube) and read by the dashboard and prospect
+endpoints.
+"""
+import threading
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.services.geography import country_region
+from app.services.trade_cube import TradeCube
+
+# Window lengths in months that growth is precomputed for (the dashboard time periods)
+WINDOW_MONTHS = (1, 3, 6, 12, 24)
+
+# Entity kinds of the table: the cube dimension they are keyed by and the flow type counted (None for all)
+ENTITY_KINDS = {
+    "company": ("company", None),
+    "exporter": ("company", "export"),
+    "product": ("product", "export"),
+    "region": ("region", None),
+    "lane": ("lane", None),
+}
+
+
+class EntityGrowth(NamedTuple):
+    """Yearly and rolling-window totals and growth of the entities of one kind."""
+
+    index: Dict[Hashable, int]  # Row of each entity
+    years: np.ndarray  # Calendar years of the yearly columns
+    yearly: np.ndarray  # Value per entity and calendar year
+    yearly_growth: np.ndarray  # Growth against the year before (NaN without a value that year)
+    # Window months -> (value, growth) per entity; growth is NaN if the cube doesn't span two whole windows
+    windows: Dict[int, Tuple[np.ndarray, np.ndarray]]
+
+
+def _growth(current: np.ndarray, previous: np.ndarray) -> np.ndarray:
+    """Element-wise growth ratio, NaN where there is no previous value."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(previous > 0, current / previous - 1, np.nan)
+
+
+def _entity_growth(monthly: np.ndarray, first_month: int, labels: List[Hashable]) -> EntityGrowth:
+    """
+    Compute the yearly and window growth of entities from their monthly values.
+
+    Args:
+        monthly: Value per entity (rows) and month (columns)
+        first_month: Month index of the first column
+        labels: Entity of each row
+
+    Returns:
+        The entities' growth
+    """
+    entities, months = monthly.shape
+
+    # Pad to whole calendar years, then sum each year's twelve months
+    lead = first_month % 12
+    trail = -(lead + months) % 12
+    padded = np.pad(monthly, ((0, 0), (lead, trail)))
+    yearly = padded.reshape(entities, -1, 12).sum(axis=2)
+    years = np.arange(yearly.shape[1]) + first_month // 12
+    yearly_growth = np.full(yearly.shape, np.nan)
+    yearly_growth[:, 1:] = _growth(yearly[:, 1:], yearly[:, :-1])
+
+    # Window totals are differences of the running total shifted by the window length
+    cumulative = np.zeros((entities, months + 1))
+    np.cumsum(monthly, axis=1, out=cumulative[:, 1:])
+    windows = {}
+    for length in WINDOW_MONTHS:
+        end = cumulative[:, months]
+        start = cumulative[:, max(months - length, 0)]
+        if months < 2 * length:
+            # The window before starts before the first month, so its total would be too low
+            windows[length] = (end - start, np.full(entities, np.nan))
+            continue
+        previous_start = cumulative[:, months - 2 * length]
+        windows[length] = (end - start, _growth(end - start, start - previous_start))
+
+    return EntityGrowth(
+        {label: row for row, label in enumerate(labels)}, years, yearly, yearly_growth, windows
+    )
+
+
+class GrowthTable:
+    """Growth figures of all entities of a trade cube, by entity kind."""
+
+    def __init__(self, entities: Dict[str, EntityGrowth]):
+        """
+        Initialize the table.
+
+        Args:
+            entities: Growth of the entities of each kind (see ENTITY_KINDS)
+        """
+        self.entities = entities
+
+    @classmethod
+    def from_cube(cls, cube: TradeCube) -> "GrowthTable":
+        """
+        Compute the table from a trade cube.
+
+        Companies and products are keyed by their ID, regions by name and
+        lanes by (source country, destination country).
+
+        Args:
+            cube: Trade cube
+
+        Returns:
+            The table
+        """
+        if not len(cube):
+            return cls({})
+        first_month = int(cube.month[0])
+        months = int(cube.month[-1]) - first_month + 1
+        offsets = cube.month - first_month
+
+        # Entity code of each row and the entity labels, per keying dimension
+        source_regions = [country_region(country) for country in cube.dictionaries["source_country"]]
+        region_names = sorted({region for region in source_regions if region})
+        region_index = {name: code for code, name in enumerate(region_names)}
+        # Countries in no region get -1 and are left out of the region kind
+        region_codes = np.array([region_index.get(region, -1) for region in source_regions], dtype=np.int64)
+        country_count = max(len(cube.dictionaries["destination_country"]), 1)
+        lane_keys, lane_codes = np.unique(
+            cube.codes["source_country"].astype(np.int64) * country_count + cube.codes["destination_country"],
+            return_inverse=True,
+        )
+        keyed: Dict[str, Tuple[np.ndarray, List[Any]]] = {
+            "company": (cube.codes["company"], list(cube.dictionaries["company"])),
+            "product": (cube.codes["product"], list(cube.dictionaries["product"])),
+            "region": (region_codes[cube.codes["source_country"]], region_names),
+            "lane": (lane_codes, [
+                (cube.dictionaries["source_country"][source], cube.dictionaries["destination_country"][destination])
+                for source, destination in zip(*np.divmod(lane_keys, country_count))
+            ]),
+        }
+
+        entities = {}
+        for kind, (dim, flow_type) in ENTITY_KINDS.items():
+            codes, labels = keyed[dim]
+            mask = codes >= 0
+            if flow_type is not None:
+                mask &= np.isin(cube.codes["flow_type"], cube.encode("flow_type", [flow_type]))
+            cells = codes[mask].astype(np.int64) * months + offsets[mask]
+            monthly = np.bincount(
+                cells, weights=cube.measures["value"][mask], minlength=len(labels) * months
+            ).reshape(len(labels), months)
+            entities[kind] = _entity_growth(monthly, first_month, labels)
+        return cls(entities)
+
+    def window_growth(self, kind: str, entity: Hashable, months: int) -> Optional[float]:
+        """
+        Get an entity's growth over the latest window of months against the window before.
+
+        Args:
+            kind: Entity kind
+            entity: Entity key
+            months: Window length, one of WINDOW_MONTHS
+
+        Returns:
+            Growth ratio, or None without a previous value
+        """
+        table = self.entities.get(kind)
+        row = table.index.get(entity) if table else None
+        if row is None or months not in table.windows:
+            return None
+        growth = table.windows[months][1][row]
+        return None if np.isnan(growth) else float(growth)
+
+    def yearly_history(self, kind: str, entity: Hashable) -> List[Dict[str, Any]]:
+        """
+        Get an entity's yearly values and year-over-year growth.
+
+        Args:
+            kind: Entity kind
+            entity: Entity key
+
+        Returns:
+            Years with trade, latest first, with year, volumeUsd and growthRatio
+        """
+        table = self.entities.get(kind)
+        row = table.index.get(entity) if table else None
+        if row is None:
+            return []
+        history = []
+        for year, volume, growth in zip(table.years.tolist(), table.yearly[row].tolist(),
+                                        table.yearly_growth[row].tolist()):
+            if volume:
+                history.append({
+                    "year": year,
+                    "volumeUsd": volume,
+                    "growthRatio": None if np.isnan(growth) else growth,
+                })
+        return history[::-1]
+
+
+_table: Optional[GrowthTable] = None
+_table_cube: Optional[TradeCube] = None
+_table_lock = threading.Lock()
+
+
+def get_growth_table(cube: TradeCube) -> GrowthTable:
+    """
+    Get the growth table of a trade cube, computing it the first time.
+
+    Args:
+        cube: Trade cube
+
+    Returns:
+        The growth table
+    """
+    global _table, _table_cube
+    with _table_lock:
+        if _table_cube is cube:
+            return _table
+    table = GrowthTable.from_cube(cube)
+    with _table_lock:
+        _table, _table_cube = table, cube
+    return table
@@ -3,14 +3,44 @@ Matching service.
 
 This module provides services for the prospect matching functionality.
 """
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
+import base64
+import binascii
+import hashlib
+import heapq
+import json
 import uuid
 import logging
-from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+
+# Import all related models so the Company relationships can be configured
+from app.models.company import Company
+from app.models.contact import Contact
+from app.models.country import Country
+from app.models.license import License
+from app.models.product import Product
+from app.models.transaction import Transaction
+from app.core import data_version, features
+from app.core.cache import VersionedCache
+from app.services import entity_resolution
+from app.services.growth_table import get_growth_table
+from app.services.perplexity_client import RESEARCH_CACHE_TTL_HOURS
+from app.services.trade_cube import get_trade_cube
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Cache of find_prospects pages, keyed by request fingerprint and cursor. A hit skips the
+# research call, so pages expire with the research results they were built from.
+_prospect_cache = VersionedCache(maxsize=512, ttl_seconds=RESEARCH_CACHE_TTL_HOURS * 3600)
+
+# Unranked candidate sets of recent searches, kept briefly for paging
+_candidate_cache = VersionedCache(maxsize=128, ttl_seconds=300)
+
+# Data domains find_prospects results are derived from
+PROSPECT_DATA_DOMAINS = (data_version.TRADE, data_version.COMPANY, data_version.RESEARCH)
+
 # Mock data for development
 MOCK_PROSPECTS = [
     {
@@ -137,6 +167,14 @@ MOCK_PROSPECT_DETAILS = {
     }
 }
 
+# Mock data in canonical numeric form, parsed once at load time; display strings
+# are formatted again when responses are serialized
+_PROSPECT_RECORDS = [features.load_prospect(prospect) for prospect in MOCK_PROSPECTS]
+_PROSPECT_RECORDS_BY_ID = {record["id"]: record for record in _PROSPECT_RECORDS}
+_PROSPECT_DETAIL_RECORDS = {
+    prospect_id: features.load_prospect(details) for prospect_id, details in MOCK_PROSPECT_DETAILS.items()
+}
+
 MOCK_GUIDANCE = {
     "talkingPoints": [
         "MedCore's expansion into cardiovascular treatments aligns with our API portfolio",
@@ -174,31 +212,270 @@ MOCK_GUIDANCE = {
 }
 
 
-def find_prospects(
+def _serialize_contact(contact: Contact) -> Dict[str, Any]:
+    """
+    Convert a Contact row into the contact payload used by the API.
+    
+    Args:
+        contact: Contact model instance
+        
+    Returns:
+        Contact dictionary
+    """
+    return features.serialize_contact({
+        "id": str(contact.id),
+        "name": contact.name,
+        "role": contact.role,
+        "company_id": str(contact.company_id),
+        "linkedin_url": contact.linkedin_url,
+        "email": contact.email,
+        "phone": contact.phone,
+        "department": contact.department,
+        "seniority": contact.seniority,
+        "relationship_score": contact.relationship_score,
+        "last_interaction_at": contact.last_interaction_at,
+        "notes": contact.notes,
+    })
+
+
+def _compliance_status(licenses: List[License]) -> Dict[str, Any]:
+    """
+    Summarize a company's licenses into a compliance status.
+    
+    Args:
+        licenses: Licenses held by the company
+        
+    Returns:
+        Compliance status dictionary
+    """
+    if not licenses:
+        return {"rating": "Unknown", "certifications": [], "lastAudit": "N/A", "issues": []}
+    
+    active = [l for l in licenses if l.status == "active"]
+    ratio = len(active) / len(licenses)
+    rating = "High" if ratio >= 0.8 else "Medium" if ratio >= 0.5 else "Low"
+    last_update = max(l.updated_at for l in licenses)
+    
+    return {
+        "rating": rating,
+        "certifications": sorted({l.authority for l in active if l.authority}),
+        "lastAudit": last_update.strftime("%B %Y"),
+        "issues": [
+            f"{l.license_number or 'License'} ({l.region}) is {l.status}"
+            for l in licenses if l.status != "active"
+        ],
+    }
+
+
+def _query_trading_history(
     db: Session, 
+    company_ids: List[uuid.UUID]
+) -> Dict[uuid.UUID, List[Dict[str, Any]]]:
+    """
+    Query the yearly volume and growth of companies from the transactions.
+    
+    Growth against the previous year is computed in the same statement by a
+    window function. Used when there is no trade cube to read the growth
+    table of.
+    
+    Args:
+        db: Database session
+        company_ids: IDs of the companies
+        
+    Returns:
+        Years with trade by company ID, latest first, with year, volumeUsd and growthRatio
+    """
+    yearly = (
+        db.query(
+            Transaction.company_id.label("company_id"),
+            Transaction.year.label("year"),
+            func.sum(Transaction.value).label("volume"),
+        )
+        .filter(Transaction.company_id.in_(company_ids))
+        .group_by(Transaction.company_id, Transaction.year)
+        .subquery()
+    )
+    previous_volume = func.lag(yearly.c.volume).over(
+        partition_by=yearly.c.company_id, order_by=yearly.c.year
+    )
+    trading_rows = db.query(
+        yearly.c.company_id, yearly.c.year, yearly.c.volume, previous_volume
+    ).all()
+    
+    trading_history: Dict[uuid.UUID, List[Dict[str, Any]]] = {}
+    for company_id, year, volume, previous in trading_rows:
+        growth = (volume - previous) / previous if volume is not None and previous else None
+        trading_history.setdefault(company_id, []).append({
+            "year": year,
+            "volumeUsd": volume,
+            "growthRatio": growth,
+        })
+    for history in trading_history.values():
+        history.sort(key=lambda h: h["year"], reverse=True)
+    return trading_history
+
+
+def load_company_details(
+    db: Session, 
+    company_ids: List[uuid.UUID]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Load prospect details for database-backed companies.
+    
+    Uses a fixed number of queries regardless of how many companies are
+    requested: one for the companies, one each for their licenses and
+    contacts (via selectinload), and one for distinct destination countries.
+    Yearly volume and growth are read from the growth table of the trade
+    cube, or without a cube from one grouped aggregate over transactions.
+    
+    Args:
+        db: Database session
+        company_ids: IDs of the companies to load
+        
+    Returns:
+        Dict mapping company ID (as a string) to prospect details
+    """
+    if not company_ids:
+        return {}
+    
+    companies = (
+        db.query(Company)
+        .options(selectinload(Company.licenses), selectinload(Company.contacts))
+        .filter(Company.id.in_(company_ids))
+        .all()
+    )
+    if not companies:
+        return {}
+    found_ids = [company.id for company in companies]
+    
+    cube = get_trade_cube()
+    if cube is not None:
+        # Yearly volume and growth of every company are precomputed from the trade cube
+        growth_table = get_growth_table(cube)
+        trading_history = {
+            company_id: growth_table.yearly_history("company", str(company_id)) for company_id in found_ids
+        }
+    else:
+        trading_history = _query_trading_history(db, found_ids)
+    
+    market_rows = (
+        db.query(Transaction.company_id, Country.name)
+        .join(Country, Transaction.destination_country_id == Country.id)
+        .filter(Transaction.company_id.in_(found_ids))
+        .distinct()
+        .all()
+    )
+    market_presence: Dict[uuid.UUID, List[str]] = {}
+    for company_id, country in market_rows:
+        market_presence.setdefault(company_id, []).append(country)
+    
+    details = {}
+    for company in companies:
+        history = trading_history.get(company.id, [])
+        if company.employees_min is not None:
+            employees = {"employeesMin": company.employees_min, "employeesMax": company.employees_max}
+        else:
+            # Companies without a parsed employee range show their size as before
+            employees = {"employees": company.size}
+        details[str(company.id)] = features.serialize_prospect({
+            "id": str(company.id),
+            "name": company.name,
+            "location": company.country,
+            "segment": company.sector,
+            **employees,
+            "revenueUsd": company.revenue_usd,
+            "purchasingVolumeUsd": company.purchasing_volume_usd,
+            "lastContactAt": company.last_contact_at,
+            "website": company.website,
+            "description": company.description,
+            "tradingHistory": history,
+            "complianceStatus": _compliance_status(company.licenses),
+            "marketPresence": sorted(market_presence.get(company.id, [])),
+            "contacts": [_serialize_contact(contact) for contact in company.contacts],
+            "competitors": [],
+            "source": "database",
+        })
+    
+    return details
+
+
+def _parse_company_id(prospect_id: str) -> Optional[uuid.UUID]:
+    """
+    Parse a prospect ID as a database company ID.
+    
+    Args:
+        prospect_id: ID of the prospect
+        
+    Returns:
+        The company UUID, or None if the ID does not refer to a database company
+    """
+    try:
+        return uuid.UUID(prospect_id)
+    except (ValueError, AttributeError, TypeError):
+        return None
+
+
+def prospect_query_fingerprint(
     company_name: str, 
     products: List[str], 
     licensed_markets: List[str], 
-    limit: int = 10,
+    limit: Optional[int] = None,
     use_deep_research: bool = False,
     company_website: Optional[str] = None
-) -> List[Dict[str, Any]]:
+) -> str:
     """
-    Find potential buyer prospects.
+    Build a canonical fingerprint of a find_prospects request.
+    
+    Requests that differ only in casing, whitespace, or the order of products
+    and markets produce the same fingerprint.
     
     Args:
-        db: Database session
         company_name: Name of the company
         products: List of product names or IDs
         licensed_markets: List of licensed markets
         limit: Maximum number of prospects to return
         use_deep_research: Whether to use Perplexity Deep Research
-        company_website: Website URL of the company (required if use_deep_research is True)
+        company_website: Website URL of the company
         
     Returns:
-        List of potential buyer prospects with details
+        Hex digest identifying the request
     """
-    results = []
+    def canonical(values: List[str]) -> List[str]:
+        return sorted({value.strip().lower() for value in values})
+    
+    payload = [
+        company_name.strip().lower(),
+        canonical(products),
+        canonical(licensed_markets),
+        limit,
+        bool(use_deep_research),
+        entity_resolution.normalize_domain(company_website),
+    ]
+    return hashlib.sha1(json.dumps(payload).encode()).hexdigest()
+
+
+def _collect_candidates(
+    db: Session, 
+    company_name: str, 
+    products: List[str], 
+    use_deep_research: bool,
+    company_website: Optional[str]
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Collect the unranked candidate prospects for a search.
+    
+    Args:
+        db: Database session
+        company_name: Name of the company
+        products: List of product names or IDs
+        use_deep_research: Whether to use Perplexity Deep Research
+        company_website: Website URL of the company
+        
+    Returns:
+        Tuple of (candidate prospects, whether deep research failed)
+    """
+    research_results = []
+    research_failed = False
     
     # If deep research is requested and we have a company website
     if use_deep_research and company_website:
@@ -215,33 +492,278 @@ def find_prospects(
             
             # Debug log the research results
             logger.info(f"Research results: {research_results}")
-            
-            # Add research results to the list
-            results.extend(research_results)
-            
             logger.info(f"Found {len(research_results)} prospects through deep research")
-            logger.info(f"Results after adding research: {len(results)} prospects")
         except Exception as e:
             # Log the error but continue with the regular matching
             logger.error(f"Deep research failed: {str(e)}")
+            research_results = []
+            research_failed = True
     
     # Continue with the existing implementation
     logger.info("Adding database/mock prospects")
-    for prospect in MOCK_PROSPECTS:
-        # In a real implementation, we would check if the prospect operates in any of the licensed markets
-        # For now, just return all prospects
-        results.append(prospect)
+    # In a real implementation, we would check if the prospect operates in any of the licensed markets
+    # For now, just use all prospects
+    known_prospects = list(_PROSPECT_RECORDS)
+    
+    # Merge research prospects that refer to companies we already know
+    candidates = entity_resolution.merge_prospects(known_prospects, research_results)
+    
+    logger.info(f"Results after merging research and known prospects: {len(candidates)} prospects")
+    return candidates, research_failed
+
+
+def _rank_key(prospect: Dict[str, Any]) -> Tuple[float, str]:
+    """
+    Sort key ranking prospects by opportunity score (descending), then ID.
+    
+    Args:
+        prospect: Prospect dictionary
+        
+    Returns:
+        Key under which smaller means ranked higher
+    """
+    return (-(prospect.get("opportunityScore") or 0), str(prospect["id"]))
+
+
+def encode_cursor(prospect: Dict[str, Any]) -> str:
+    """
+    Encode the position after a prospect as a pagination cursor.
+    
+    Args:
+        prospect: Last prospect of a page
+        
+    Returns:
+        Opaque cursor string
+    """
+    score, prospect_id = _rank_key(prospect)
+    payload = json.dumps([-score, prospect_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """
+    Decode a pagination cursor into its rank key.
+    
+    Args:
+        cursor: Cursor returned with a previous page
+        
+    Returns:
+        Rank key of the last prospect of the previous page
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        score, prospect_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (-float(score), str(prospect_id))
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def find_prospects_page(
+    db: Session, 
+    company_name: str, 
+    products: List[str], 
+    licensed_markets: List[str], 
+    limit: int = 10,
+    use_deep_research: bool = False,
+    company_website: Optional[str] = None,
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Find one page of potential buyer prospects.
+    
+    Prospects are ranked by (opportunity score, ID) and paginated with a
+    keyset cursor. The candidate set of a search is kept briefly, so later
+    pages only select the next top-k candidates from it.
+    
+    Args:
+        db: Database session
+        company_name: Name of the company
+        products: List of product names or IDs
+        licensed_markets: List of licensed markets
+        limit: Maximum number of prospects to return
+        use_deep_research: Whether to use Perplexity Deep Research
+        company_website: Website URL of the company (required if use_deep_research is True)
+        cursor: Cursor returned with the previous page, if any
+        
+    Returns:
+        Dict with the page of prospects under "items" and the cursor for the
+        following page under "next_cursor" (None on the last page)
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    after = decode_cursor(cursor) if cursor else None
+    
+    # Read the version before computing so changes made meanwhile invalidate the entry
+    fingerprint = prospect_query_fingerprint(
+        company_name, products, licensed_markets, limit, use_deep_research, company_website
+    )
+    version = data_version.get_version(*PROSPECT_DATA_DOMAINS)
+    cached = _prospect_cache.get((fingerprint, cursor), version)
+    if cached is not None:
+        logger.info(f"Prospect cache hit for {fingerprint[:8]}")
+        return {
+            "items": [features.serialize_prospect(p) for p in cached["items"]],
+            "next_cursor": cached["next_cursor"],
+        }
+    
+    # Candidate sets don't depend on the page size, so all page sizes share them
+    candidates_key = prospect_query_fingerprint(
+        company_name, products, licensed_markets, None, use_deep_research, company_website
+    )
+    candidates = _candidate_cache.get(candidates_key, version)
+    research_failed = False
+    if candidates is None:
+        candidates, research_failed = _collect_candidates(
+            db, company_name, products, use_deep_research, company_website
+        )
+        # Don't let a transient research failure stick in the cache
+        if not research_failed:
+            _candidate_cache.set(candidates_key, candidates, version)
+    
+    # Select the top limit + 1 candidates after the cursor; the extra one tells
+    # whether another page follows
+    remaining = candidates if after is None else (p for p in candidates if _rank_key(p) > after)
+    top = heapq.nsmallest(limit + 1, remaining, key=_rank_key)
+    items = top[:limit]
+    next_cursor = encode_cursor(items[-1]) if items and len(top) > limit else None
+    logger.info(f"Final results after limiting: {len(items)} prospects")
+    
+    page = {"items": items, "next_cursor": next_cursor}
+    if not research_failed:
+        _prospect_cache.set((fingerprint, cursor), page, version)
+    return {"items": [features.serialize_prospect(p) for p in items], "next_cursor": next_cursor}
+
+
+def find_prospects(
+    db: Session, 
+    company_name: str, 
+    products: List[str], 
+    licensed_markets: List[str], 
+    limit: int = 10,
+    use_deep_research: bool = False,
+    company_website: Optional[str] = None,
+    cursor: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Find potential buyer prospects.
+    
+    Args:
+        db: Database session
+        company_name: Name of the company
+        products: List of product names or IDs
+        licensed_markets: List of licensed markets
+        limit: Maximum number of prospects to return
+        use_deep_research: Whether to use Perplexity Deep Research
+        company_website: Website URL of the company (required if use_deep_research is True)
+        cursor: Cursor returned with the previous page, if any
+        
+    Returns:
+        List of potential buyer prospects with details
+    """
+    return find_prospects_page(
+        db, company_name, products, licensed_markets, limit,
+        use_deep_research, company_website, cursor
+    )["items"]
+
+
+def _research_prospect_details(prospect: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Add the detail fields to a research-based prospect.
     
-    logger.info(f"Results after adding mock: {len(results)} prospects")
+    Args:
+        prospect: Research-based prospect
+        
+    Returns:
+        Copy of the prospect with detail fields added
+    """
+    details = dict(prospect)
+    details["description"] = f"{prospect['name']} is a potential buyer identified through AI-powered research. They operate in the {prospect['segment']} segment and are located in {prospect['location']}."
+    details["tradingHistory"] = []
+    details["complianceStatus"] = {
+        "rating": "Unknown",
+        "certifications": [],
+        "lastAudit": "N/A",
+        "issues": []
+    }
+    details["marketPresence"] = [prospect["location"]]
+    details["competitors"] = []
+    return details
+
+
+def _select_fields(details: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """
+    Restrict prospect details to the requested fields.
     
-    # Sort by opportunity score (descending)
-    results.sort(key=lambda x: x["opportunityScore"], reverse=True)
+    Args:
+        details: Prospect details
+        fields: Fields to keep (the ID is always kept), or None for all fields
+        
+    Returns:
+        The selected fields of the prospect
+    """
+    if fields is None:
+        return details
+    return {key: value for key, value in details.items() if key == "id" or key in fields}
+
+
+def get_prospect_details_batch(
+    db: Session, 
+    prospect_ids: List[str],
+    fields: Optional[List[str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Get detailed information about many prospects at once.
+    
+    Database-backed prospects are loaded with one bulk query set and
+    research-based prospects with one store read, instead of one lookup per
+    prospect.
+    
+    Args:
+        db: Database session
+        prospect_ids: IDs of the prospects
+        fields: Optional list of fields to return for each prospect, e.g. to
+            skip the heavy tradingHistory and description payloads
+        
+    Returns:
+        Dict mapping each found prospect ID to its details; unknown IDs are omitted
+    """
+    company_ids = {}
+    research_ids = []
+    mock_ids = []
+    for prospect_id in dict.fromkeys(prospect_ids):
+        company_id = _parse_company_id(prospect_id)
+        if company_id is not None:
+            company_ids[str(company_id)] = prospect_id
+        elif prospect_id.startswith("research-"):
+            research_ids.append(prospect_id)
+        else:
+            mock_ids.append(prospect_id)
+    
+    results = {}
+    
+    if company_ids:
+        loaded = load_company_details(db, [uuid.UUID(company_id) for company_id in company_ids])
+        for company_id, details in loaded.items():
+            results[company_ids[company_id]] = details
     
-    # Limit the results
-    limited_results = results[:limit]
-    logger.info(f"Final results after limiting: {len(limited_results)} prospects")
+    if research_ids:
+        # Import here to avoid circular imports
+        from app.services import buyer_research
+        
+        for prospect_id, prospect in buyer_research.get_research_prospects(research_ids).items():
+            results[prospect_id] = _research_prospect_details(prospect)
+    
+    for prospect_id in mock_ids:
+        record = _PROSPECT_DETAIL_RECORDS.get(prospect_id) or _PROSPECT_RECORDS_BY_ID.get(prospect_id)
+        if record:
+            results[prospect_id] = features.serialize_prospect(record)
     
-    return limited_results
+    logger.info(f"Found details for {len(results)} of {len(prospect_ids)} prospects")
+    return {prospect_id: _select_fields(details, fields) for prospect_id, details in results.items()}
 
 
 def get_prospect_details(
@@ -260,57 +782,35 @@ def get_prospect_details(
     """
     logger.info(f"Getting details for prospect: {prospect_id}")
     
-    # In a real implementation, this would query the database
-    # For now, return mock data
+    # Database-backed prospects are identified by their company UUID
+    company_id = _parse_company_id(prospect_id)
+    if company_id is not None:
+        details = load_company_details(db, [company_id])
+        if str(company_id) in details:
+            return details[str(company_id)]
+        logger.warning(f"Company not found in database: {prospect_id}")
+        return {}
     
-    # Check if this is a research-based prospect
+    # Research-based prospects are looked up in the store of recent research results
     if prospect_id.startswith("research-"):
-        logger.info("This is a research-based prospect")
+        # Import here to avoid circular imports
+        from app.services import buyer_research
         
-        # For research-based prospects, we need to get the data from the research service
-        try:
-            # Import here to avoid circular imports
-            from app.services import buyer_research
-            
-            # Get research-based prospects
-            research_results = buyer_research.research_potential_buyers(
-                db, "Example Pharma", "https://example.com", ["Product A", "Product B"]
-            )
-            
-            # Find the prospect with the matching ID
-            for prospect in research_results:
-                if prospect["id"] == prospect_id:
-                    logger.info(f"Found research-based prospect: {prospect['name']}")
-                    
-                    # Add additional details for research-based prospects
-                    prospect["description"] = f"{prospect['name']} is a potential buyer identified through AI-powered research. They operate in the {prospect['segment']} segment and are located in {prospect['location']}."
-                    prospect["tradingHistory"] = []
-                    prospect["complianceStatus"] = {
-                        "rating": "Unknown",
-                        "certifications": [],
-                        "lastAudit": "N/A",
-                        "issues": []
-                    }
-                    prospect["marketPresence"] = [prospect["location"]]
-                    prospect["competitors"] = []
-                    
-                    return prospect
-            
-            logger.warning(f"Research-based prospect not found: {prospect_id}")
-        except Exception as e:
-            logger.error(f"Error getting research-based prospect: {str(e)}")
+        stored = buyer_research.get_research_prospects([prospect_id])
+        if prospect_id in stored:
+            return _research_prospect_details(stored[prospect_id])
+        logger.warning(f"Research-based prospect not found: {prospect_id}")
     
     # Check if we have detailed information for this prospect
-    if prospect_id in MOCK_PROSPECT_DETAILS:
+    if prospect_id in _PROSPECT_DETAIL_RECORDS:
         logger.info(f"Found prospect in MOCK_PROSPECT_DETAILS: {prospect_id}")
-        return MOCK_PROSPECT_DETAILS[prospect_id]
+        return features.serialize_prospect(_PROSPECT_DETAIL_RECORDS[prospect_id])
     
     # If not, find the prospect in the basic list
-    for prospect in MOCK_PROSPECTS:
-        if prospect["id"] == prospect_id:
-            # Return basic information
-            logger.info(f"Found prospect in MOCK_PROSPECTS: {prospect_id}")
-            return prospect
+    if prospect_id in _PROSPECT_RECORDS_BY_ID:
+        # Return basic information
+        logger.info(f"Found prospect in MOCK_PROSPECTS: {prospect_id}")
+        return features.serialize_prospect(_PROSPECT_RECORDS_BY_ID[prospect_id])
     
     # If prospect not found, return empty dict
     logger.warning(f"Prospect not found: {prospect_id}")
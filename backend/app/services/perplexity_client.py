@@ -12,6 +12,7 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 
 from app.core.config import settings
+from app.core import data_version
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -139,10 +140,13 @@ Small to mid-size pharmaceutical manufacturers looking for reliable API supplier
 # Simple in-memory cache (replace with Redis in production)
 _cache = {}
 
+# Hours research results are cached for; caches of results derived from them must not keep them longer
+RESEARCH_CACHE_TTL_HOURS = 24
+
 def run_deep_research_with_cache(
     prompt: str, 
     max_tokens: Optional[int] = None, 
-    cache_ttl_hours: int = 24
+    cache_ttl_hours: int = RESEARCH_CACHE_TTL_HOURS
 ) -> Dict[str, Any]:
     """
     Execute a deep research query using the Perplexity API with caching.
@@ -170,6 +174,10 @@ def run_deep_research_with_cache(
     logger.info(f"Cache miss for key: {cache_key[:8]}...")
     result = run_deep_research(prompt, max_tokens)
     
+    # Replacing an expired entry changes the research data cached results were built from
+    if cache_key in _cache:
+        data_version.bump(data_version.RESEARCH)
+    
     # Update cache
     _cache[cache_key] = (result, now)
     
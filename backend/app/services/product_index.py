@@ -0,0 +1,375 @@
+"""
+Product index service.
+
+This module keeps an in-memory search index of the product catalogue, so
+that product search and autocomplete no longer scan every product's name,
+code and synonyms on each keystroke. Every name, synonym and ATC code of a
+product is a field of the index:
+
+- Exact matches look the normalized query up in a dictionary of fields.
+- Prefix matches look it up in the sorted list of field suffixes starting at
+  a word boundary. The suffixes sharing a prefix form one contiguous range,
+  like a subtree of a prefix trie, and their postings are stored contiguously
+  in the same order, so all products matching a prefix are one array slice.
+- Infix matches, which are only needed when the first two don't fill the
+  results, search the fields joined into one string.
+- Fuzzy matches, for misspelled queries that match nothing else, rank
+  fields by trigram similarity (see app.core.trigrams).
+
+Every product matching a query has a field containing it, and so contains
+any shorter query it starts with. The fields containing a query (see
+candidates) can be passed to match for a longer query, which then only
+checks those fields instead of the whole index.
+
+Product codes are also indexed by ATC group (see atc_index), so that
+searches can be restricted to a group at any level.
+
+The index is built once per catalogue version (see search.get_product_index).
+"""
+import re
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, islice
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.trigrams import DEFAULT_THRESHOLD, TrigramIndex
+from app.services.atc_index import AtcIndex
+
+# Match types, best first
+EXACT = 0
+PREFIX = 1
+INFIX = 2
+FUZZY = 3
+
+_WORD_START = re.compile(r"(?<![0-9a-z])[0-9a-z]")
+
+# Separates the fields in the joined infix search string; removed from fields and queries
+_SEPARATOR = "\x00"
+
+
+def normalize(text: str) -> str:
+    """Lowercase text and collapse its whitespace, as fields and queries are compared."""
+    return " ".join(text.replace(_SEPARATOR, " ").lower().split())
+
+
+def product_fields(product: Dict[str, Any]) -> List[str]:
+    """Normalized name, synonyms and code of a product, without duplicates."""
+    values = [product.get("api_name"), *(product.get("synonyms") or []), product.get("code")]
+    fields = (normalize(value) for value in values if value)
+    return list(dict.fromkeys(field for field in fields if field))
+
+
+def _starts_word(field: str, query: str) -> bool:
+    """Whether a word of a field starts with the query."""
+    start = field.find(query)
+    while start >= 0:
+        if _WORD_START.match(field, start):
+            return True
+        start = field.find(query, start + 1)
+    return False
+
+
+def _postings(keys: np.ndarray, positions: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Group (key, position) pairs into postings lists.
+
+    Args:
+        keys: Key of each pair, in range(size)
+        positions: Product position of each pair
+        size: Number of keys
+
+    Returns:
+        Tuple of (offsets, postings): the ascending, distinct positions of
+        key k are postings[offsets[k]:offsets[k + 1]]
+    """
+    # Sort and deduplicate the pairs as single integers, which is much faster than np.lexsort or np.unique
+    span = int(positions.max()) + 1 if len(positions) else 1
+    pairs = keys * span + positions
+    pairs.sort()
+    distinct = np.ones(len(pairs), dtype=bool)
+    distinct[1:] = pairs[1:] != pairs[:-1]
+    keys, positions = np.divmod(pairs[distinct], span)
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=offsets[1:])
+    return offsets, positions.astype(np.int32)
+
+
+class ProductIndex:
+    """Exact, prefix, infix and fuzzy index over the names, synonyms and codes of a product catalogue."""
+
+    def __init__(self, products: Sequence[Dict[str, Any]]):
+        """
+        Build the index.
+
+        Args:
+            products: Catalogue of products with api_name, synonyms and code;
+                results within a match type keep the catalogue order
+        """
+        self.products = list(products)
+
+        # Distinct fields, numbered in the order of their first product
+        field_ids: Dict[str, int] = {}
+        pair_fields: List[int] = []
+        pair_positions: List[int] = []
+        for position, product in enumerate(self.products):
+            for field in product_fields(product):
+                pair_fields.append(field_ids.setdefault(field, len(field_ids)))
+                pair_positions.append(position)
+        fields = list(field_ids)
+        self._exact = field_ids
+        self._field_offsets, self._field_postings = _postings(
+            np.array(pair_fields, dtype=np.int64), np.array(pair_positions, dtype=np.int64), len(fields)
+        )
+
+        # Word-start suffixes of every field, numbered in sorted order
+        suffix_ids: Dict[str, int] = {}
+        suffix_keys: List[int] = []
+        suffix_fields: List[int] = []
+        for field_id, field in enumerate(fields):
+            # Most fields are a single word, whose only word start is the first character
+            starts = [0] if field.isascii() and field.isalnum() else [m.start() for m in _WORD_START.finditer(field)]
+            for start in starts:
+                suffix_keys.append(suffix_ids.setdefault(field[start:], len(suffix_ids)))
+                suffix_fields.append(field_id)
+        self._suffixes = sorted(suffix_ids)
+        rank = np.empty(len(suffix_ids), dtype=np.int64)
+        rank[[suffix_ids[suffix] for suffix in self._suffixes]] = np.arange(len(suffix_ids))
+
+        # Each suffix gets the postings of the fields it occurs in
+        suffix_fields = np.array(suffix_fields, dtype=np.int64)
+        starts = self._field_offsets[suffix_fields]
+        lengths = self._field_offsets[suffix_fields + 1] - starts
+        expanded = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        self._suffix_offsets, self._suffix_postings = _postings(
+            np.repeat(rank[np.array(suffix_keys, dtype=np.int64)], lengths),
+            self._field_postings[expanded].astype(np.int64), len(self._suffixes)
+        )
+
+        # Fields joined for substring search
+        self._field_names = fields
+        self._fields = _SEPARATOR.join(fields)
+        # A list, as bisect on it is much faster than np.searchsorted for single values
+        self._field_starts = list(accumulate(len(field) + 1 for field in fields[:-1]))
+        self._field_starts.insert(0, 0)
+        self._trigrams = TrigramIndex(fields)
+        self.atc = AtcIndex(self.products)
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def _field_positions(self, field: int) -> np.ndarray:
+        """Positions of the products with a field, ascending."""
+        return self._field_postings[self._field_offsets[field]:self._field_offsets[field + 1]]
+
+    def _prefix_positions(self, query: str, count: int, allowed: Optional[np.ndarray]) -> np.ndarray:
+        """First count allowed positions of the products with a field suffix starting with the query, ascending."""
+        first = bisect_left(self._suffixes, query)
+        last = bisect_left(self._suffixes, query[:-1] + chr(ord(query[-1]) + 1), first)
+        postings = self._suffix_postings[self._suffix_offsets[first]:self._suffix_offsets[last]]
+        if allowed is not None:
+            postings = postings[allowed[postings]]
+        # A product can occur under several of the suffixes, so widen the partition until count are distinct
+        size = count
+        while size < len(postings):
+            smallest = np.unique(np.partition(postings, size - 1)[:size])
+            if len(smallest) >= count:
+                return smallest[:count]
+            size *= 2
+        return np.unique(postings)[:count]
+
+    def _candidate_prefix_positions(
+        self, query: str, fields: List[int], count: int, allowed: Optional[np.ndarray]
+    ) -> np.ndarray:
+        """First count allowed positions of the products with one of the fields with a word starting with the query, ascending."""
+        prefix_fields = [field for field in fields if _starts_word(self._field_names[field], query)]
+        if not prefix_fields:
+            return self._field_postings[:0]
+        postings = np.concatenate([self._field_positions(field) for field in prefix_fields])
+        if allowed is not None:
+            postings = postings[allowed[postings]]
+        return np.unique(postings)[:count]
+
+    def _containing_fields(self, query: str) -> Iterator[int]:
+        """Fields containing the query, in order."""
+        start = self._fields.find(query)
+        while start >= 0:
+            field = bisect_right(self._field_starts, start) - 1
+            yield field
+            # Continue after this field; one match per field is enough
+            next_field = field + 1
+            if next_field >= len(self._field_starts):
+                return
+            start = self._fields.find(query, self._field_starts[next_field])
+
+    def _infix_positions(
+        self, query: str, limit: int, skip: set, allowed: Optional[np.ndarray], fields: Optional[List[int]]
+    ) -> List[int]:
+        """Positions of up to limit allowed products not in skip with a field containing the query, or with one of the fields if given."""
+        positions: List[int] = []
+        found = set(skip)
+        for field in self._containing_fields(query) if fields is None else fields:
+            for position in self._field_positions(field).tolist():
+                if position not in found and (allowed is None or allowed[position]):
+                    found.add(position)
+                    positions.append(position)
+            if len(positions) >= limit:
+                break
+        return positions[:limit]
+
+    def _fuzzy_positions(self, query: str, threshold: float, limit: int, allowed: Optional[np.ndarray]) -> List[int]:
+        """Positions of up to limit allowed products, by the best trigram similarity of their fields."""
+        positions: List[int] = []
+        found = set()
+        for field, _ in self._trigrams.search(query, threshold, limit=None):
+            for position in self._field_positions(field).tolist():
+                if position not in found and (allowed is None or allowed[position]):
+                    found.add(position)
+                    positions.append(position)
+            if len(positions) >= limit:
+                break
+        return positions[:limit]
+
+    def candidates(self, query: str, max_count: int, within: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        Get the fields containing a query, to pass to match for longer queries containing it.
+
+        Args:
+            query: Search text, matched case-insensitively
+            max_count: Maximum number of fields to return
+            within: Optional fields containing a query this one contains
+                (see candidates); only they are checked
+
+        Returns:
+            Ascending field IDs, or None if the query is empty or more than
+            max_count fields contain it. Without within, None is also
+            returned right away when the query starts more than max_count
+            distinct field suffixes at a word boundary.
+        """
+        query = normalize(query)
+        if not query:
+            return None
+        if within is None:
+            first = bisect_left(self._suffixes, query)
+            if bisect_left(self._suffixes, query[:-1] + chr(ord(query[-1]) + 1), first) - first > max_count:
+                return None
+        if within is not None:
+            fields = [field for field in within.tolist() if query in self._field_names[field]]
+        else:
+            fields = list(islice(self._containing_fields(query), max_count + 1))
+        return np.array(fields, dtype=np.int64) if len(fields) <= max_count else None
+
+    def match(
+        self,
+        query: str,
+        limit: int = 10,
+        threshold: float = DEFAULT_THRESHOLD,
+        allowed: Optional[np.ndarray] = None,
+        candidates: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, int]]:
+        """
+        Search the catalogue, returning catalogue positions and match types.
+
+        Products are ranked by their best match type: a field equal to the
+        query (EXACT), then a field with a word starting with it (PREFIX),
+        then a field containing it anywhere (INFIX). Within a match type,
+        catalogue order is kept. Only when none of these match, the query is
+        taken as misspelled and products are ranked by the best trigram
+        similarity of their fields, if at least threshold (FUZZY).
+
+        Args:
+            query: Search text, matched case-insensitively
+            limit: Maximum number of results to return
+            threshold: Minimum trigram similarity of a fuzzy match
+            allowed: Optional mask of the catalogue positions that may be
+                returned (e.g. the products of an ATC group)
+            candidates: Optional fields containing a query this one contains
+                (see candidates); only they are searched for term matches
+
+        Returns:
+            (catalogue position, match type) pairs, best first
+        """
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+        fields = None
+        if candidates is not None:
+            fields = [field for field in candidates.tolist() if query in self._field_names[field]]
+
+        field = self._exact.get(query)
+        exact = self._field_positions(field) if field is not None else self._field_postings[:0]
+        if allowed is not None:
+            exact = exact[allowed[exact]]
+        results = [(position, EXACT) for position in exact[:limit].tolist()]
+        seen = {position for position, _ in results}
+        if len(results) < limit:
+            # Products already matched exactly are among the first len(seen) + limit
+            count = len(seen) + limit
+            if fields is None:
+                prefix = self._prefix_positions(query, count, allowed)
+            else:
+                prefix = self._candidate_prefix_positions(query, fields, count, allowed)
+            for position in prefix.tolist():
+                if position not in seen:
+                    seen.add(position)
+                    results.append((position, PREFIX))
+                    if len(results) == limit:
+                        break
+        if len(results) < limit:
+            infix = self._infix_positions(query, limit - len(results), seen, allowed, fields)
+            results.extend((position, INFIX) for position in infix)
+            seen.update(infix)
+        if not results:
+            results = [(position, FUZZY) for position in self._fuzzy_positions(query, threshold, limit, allowed)]
+        return results
+
+    def resolve(self, query: str, threshold: float = DEFAULT_THRESHOLD) -> Optional[Tuple[int, int, float]]:
+        """
+        Find the product a name, synonym or code refers to.
+
+        Args:
+            query: Product name, synonym or ATC code, matched case-insensitively
+            threshold: Minimum trigram similarity of a fuzzy match
+
+        Returns:
+            Tuple of (catalogue position, match type, confidence), or None if
+            nothing is similar enough. A field equal to the query is an EXACT
+            match with confidence 1; otherwise the field with the best trigram
+            similarity is a FUZZY match with the similarity as confidence.
+            Among equally good fields, the first product is taken.
+        """
+        query = normalize(query)
+        if not query:
+            return None
+        field = self._exact.get(query)
+        if field is not None:
+            return int(self._field_positions(field)[0]), EXACT, 1.0
+        best = self._trigrams.search(query, threshold, limit=1)
+        if not best:
+            return None
+        field, score = best[0]
+        return int(self._field_positions(field)[0]), FUZZY, score
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        threshold: float = DEFAULT_THRESHOLD,
+        allowed: Optional[np.ndarray] = None,
+        candidates: Optional[np.ndarray] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search the catalogue (see match for the ranking).
+
+        Args:
+            query: Search text, matched case-insensitively
+            limit: Maximum number of results to return
+            threshold: Minimum trigram similarity of a fuzzy match
+            allowed: Optional mask of the catalogue positions that may be returned
+            candidates: Optional fields containing a query this one contains
+
+        Returns:
+            Matching products, best first
+        """
+        matches = self.match(query, limit, threshold, allowed, candidates)
+        return [self.products[position] for position, _ in matches]
@@ -0,0 +1,215 @@
+"""
+Product sketches service.
+
+This module maintains the top products of the dashboard online. Export value
+is counted into one Space-Saving heavy-hitters sketch per (region, product
+type, month); ingest adds each new transaction to its sketch, and a query for
+the top products of any region, product type and time period merges the
+sketches of its months. The answer comes with a bound on how much each
+product's value may be overestimated.
+
+The sketches are seeded from the trade cube the first time they are needed,
+then kept up to date by the ingest service as it refreshes the cube.
+"""
+import logging
+import threading
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.cache import VersionedCache
+from app.core.heavy_hitters import HeavyHitter, SpaceSaving, merge_estimates, merge_top
+from app.services.geography import country_region
+from app.services.trade_cube import TradeCube, month_index
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Products tracked per (region, product type, month) sketch
+SKETCH_CAPACITY = 256
+
+SketchKey = Tuple[Optional[str], str, int]
+
+
+class ProductSketches:
+    """Heavy-hitters sketches of export value by product, per region, product type and month."""
+
+    def __init__(self, capacity: int = SKETCH_CAPACITY):
+        """
+        Initialize an empty set of sketches.
+
+        Args:
+            capacity: Products tracked per sketch
+        """
+        self.capacity = capacity
+        self.sketches: Dict[SketchKey, SpaceSaving] = {}
+        self.latest_month: Optional[int] = None
+        self._lock = threading.Lock()
+        # Merged results by query, valid until the next update
+        self._generation = 0
+        self._top_cache = VersionedCache(maxsize=256)
+
+    @classmethod
+    def from_cube(cls, cube: TradeCube, capacity: int = SKETCH_CAPACITY) -> "ProductSketches":
+        """
+        Seed the sketches from the export rows of a trade cube.
+
+        Args:
+            cube: Trade cube
+            capacity: Products tracked per sketch
+
+        Returns:
+            The sketches
+        """
+        store = cls(capacity)
+        rows = cube.rows(date.min, date.max, flow_type=["export"])
+        if not len(rows):
+            return store
+
+        regions = [country_region(country) for country in cube.dictionaries["source_country"]]
+        product_types = [product_type.lower() for product_type in cube.dictionaries["product_type"]]
+        product_count = max(len(cube.dictionaries["product"]), 1)
+        country_count = max(len(regions), 1)
+        type_count = max(len(product_types), 1)
+
+        # Sum export value per (month, source country, product type, product)
+        keys = cube.month[rows].astype(np.int64)
+        keys = keys * country_count + cube.codes["source_country"][rows]
+        keys = keys * type_count + cube.codes["product_type"][rows]
+        keys = keys * product_count + cube.codes["product"][rows]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=cube.measures["value"][rows])
+        groups, products = np.divmod(unique, product_count)
+
+        totals: Dict[SketchKey, Dict[str, float]] = {}
+        for group, product, value in zip(groups.tolist(), products.tolist(), sums.tolist()):
+            rest, product_type = divmod(group, type_count)
+            month, country = divmod(rest, country_count)
+            product_totals = totals.setdefault((regions[country], product_types[product_type], month), {})
+            product_id = cube.dictionaries["product"][product]
+            product_totals[product_id] = product_totals.get(product_id, 0.0) + value
+
+        for key, product_totals in totals.items():
+            sketch = store.sketches[key] = SpaceSaving(capacity)
+            sketch.load(product_totals.items())
+        store.latest_month = int(cube.month[-1])
+        return store
+
+    def update(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """
+        Count new transactions into their sketches.
+
+        Args:
+            rows: Transactions with period, source_country, product_type,
+                product_id, flow_type and value; only exports are counted
+        """
+        with self._lock:
+            for row in rows:
+                if row.get("flow_type") != "export":
+                    continue
+                month = month_index(row["period"])
+                product_type = (row.get("product_type") or "Unknown").lower()
+                key = (country_region(row.get("source_country")), product_type, month)
+                sketch = self.sketches.get(key)
+                if sketch is None:
+                    sketch = self.sketches[key] = SpaceSaving(self.capacity)
+                sketch.update(str(row["product_id"]), row.get("value") or 0.0)
+                self.latest_month = max(self.latest_month or month, month)
+            self._generation += 1
+
+    def _select(self, regions: Optional[List[str]], product_types: Optional[List[str]], first: int, last: int):
+        """Sketches of the given regions and product types in a month range (inclusive)."""
+        regions = None if regions is None else set(regions)
+        product_types = None if product_types is None else {product_type.lower() for product_type in product_types}
+        return [
+            sketch for (region, product_type, month), sketch in self.sketches.items()
+            if first <= month <= last
+            and (regions is None or region in regions)
+            and (product_types is None or product_type in product_types)
+        ]
+
+    def top(
+        self,
+        limit: int,
+        months: int,
+        regions: Optional[List[str]] = None,
+        product_types: Optional[List[str]] = None
+    ) -> List[Tuple[HeavyHitter, HeavyHitter]]:
+        """
+        Get the top products of a period, with their estimates in the period before.
+
+        Args:
+            limit: Number of products to return
+            months: Length of the period in months, ending with the latest month
+            regions: Region names to include (None for all, including countries in no region)
+            product_types: Product types to include (None for all)
+
+        Returns:
+            Pairs of (estimate in the period, estimate in the period before), by descending value
+        """
+        key = (
+            limit, months,
+            None if regions is None else frozenset(regions),
+            None if product_types is None else frozenset(product_type.lower() for product_type in product_types),
+        )
+        with self._lock:
+            result = self._top_cache.get(key, self._generation)
+            if result is not None:
+                return result
+            if self.latest_month is None:
+                return []
+            first = self.latest_month - months + 1
+            current = merge_top(self._select(regions, product_types, first, self.latest_month), limit)
+            previous = merge_estimates(
+                self._select(regions, product_types, first - months, first - 1), [hit.item for hit in current]
+            )
+            result = [(hit, previous[hit.item]) for hit in current]
+            self._top_cache.set(key, result, self._generation)
+        return result
+
+
+_sketches: Optional[ProductSketches] = None
+_sketches_cube: Optional[TradeCube] = None
+_sketches_lock = threading.Lock()
+
+
+def get_product_sketches(cube: TradeCube) -> ProductSketches:
+    """
+    Get the product sketches of a trade cube, seeding them from the cube the first time.
+
+    Args:
+        cube: Current trade cube
+
+    Returns:
+        The sketches
+    """
+    global _sketches, _sketches_cube
+    with _sketches_lock:
+        if _sketches_cube is not cube:
+            # The cube was replaced other than by ingest (e.g. loaded from disk)
+            _sketches, _sketches_cube = ProductSketches.from_cube(cube), cube
+            logger.info(f"Seeded {len(_sketches.sketches)} product sketches from the trade cube")
+        return _sketches
+
+
+def record_transactions(previous_cube: Optional[TradeCube], cube: TradeCube, rows: List[Dict[str, Any]]) -> None:
+    """
+    Count ingested transactions into the product sketches.
+
+    Sketches kept for the cube before the ingest are updated in place and
+    carried over to the refreshed cube; otherwise they are seeded from the
+    refreshed cube, which already holds the transactions.
+
+    Args:
+        previous_cube: Trade cube before the ingest
+        cube: Trade cube refreshed with the transactions
+        rows: Ingested transactions (see ProductSketches.update)
+    """
+    global _sketches, _sketches_cube
+    with _sketches_lock:
+        if _sketches is None or previous_cube is None or _sketches_cube is not previous_cube:
+            _sketches, _sketches_cube = ProductSketches.from_cube(cube), cube
+            return
+        _sketches.update(rows)
+        _sketches_cube = cube
@@ -3,8 +3,46 @@ Search service.
 
 This module provides services for searching products and companies.
 """
-from typing import Dict, List, Any, Optional
-from sqlalchemy.orm import Session
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import case, event, func, or_, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core import data_version
+from app.core.cache import PrefixCache, VersionedCache
+from app.core.config import settings
+from app.core.trigrams import DEFAULT_THRESHOLD
+from app.db.search_indexes import contains_pattern, full_text_match
+from app.models.company import Company
+from app.models.product import Product
+from app.services.atc_index import atc_level, normalize_code
+from app.services.company_index import CompanyIndex
+from app.services.product_index import EXACT, ProductIndex, normalize
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Product search index, rebuilt when the product catalogue changes
+_product_index_cache = VersionedCache(maxsize=1)
+
+# Company index (BM25 and similar names) and the company data version it reflects, built on first use,
+# then updated as companies are committed and rebuilt when the company data changes otherwise
+_company_search_index: Optional[CompanyIndex] = None
+_company_search_version: Optional[Tuple[int, ...]] = None
+_company_search_lock = threading.Lock()
+
+# Seconds the candidates of a search are kept for longer queries typed after it
+TYPEAHEAD_TTL_SECONDS = 60
+
+# Maximum number of candidates kept per search; queries matching more are not cached
+MAX_TYPEAHEAD_CANDIDATES = 500
+
+# Candidates of recent product and company searches, by query
+_product_typeahead_cache = PrefixCache(maxsize=4096, ttl_seconds=TYPEAHEAD_TTL_SECONDS)
+_company_typeahead_cache = PrefixCache(maxsize=4096, ttl_seconds=TYPEAHEAD_TTL_SECONDS)
 
 # Mock data for development
 MOCK_PRODUCTS = [
@@ -21,16 +59,16 @@ MOCK_PRODUCTS = [
 ]
 
 MOCK_COMPANIES = [
-    {"id": "1", "name": "Teva Pharmaceutical", "country": "Israel", "sector": "Generic Medications", "size": "Large"},
-    {"id": "2", "name": "Novartis", "country": "Switzerland", "sector": "Specialty Drugs", "size": "Large"},
-    {"id": "3", "name": "Pfizer", "country": "United States", "sector": "Vaccines", "size": "Large"},
-    {"id": "4", "name": "Roche", "country": "Switzerland", "sector": "Diagnostics", "size": "Large"},
-    {"id": "5", "name": "Johnson & Johnson", "country": "United States", "sector": "Consumer Health", "size": "Large"},
-    {"id": "6", "name": "MedCore Pharmaceuticals", "country": "Germany", "sector": "Generic Medications", "size": "Medium"},
-    {"id": "7", "name": "BioPharma Solutions", "country": "Brazil", "sector": "Specialty Drugs", "size": "Medium"},
-    {"id": "8", "name": "Global Health Networks", "country": "India", "sector": "Distribution", "size": "Medium"},
-    {"id": "9", "name": "PharmaVision Corp", "country": "Canada", "sector": "Research & Development", "size": "Small"},
-    {"id": "10", "name": "MediTech Innovations", "country": "Japan", "sector": "Medical Devices", "size": "Small"}
+    {"id": "1", "name": "Teva Pharmaceutical", "country": "Israel", "sector": "Generic Medications", "size": "Large", "description": "Generic and specialty medicines manufacturer with a broad portfolio of oral solids and injectables"},
+    {"id": "2", "name": "Novartis", "country": "Switzerland", "sector": "Specialty Drugs", "size": "Large", "description": "Innovative medicines company focused on cardiovascular, oncology and immunology therapies"},
+    {"id": "3", "name": "Pfizer", "country": "United States", "sector": "Vaccines", "size": "Large", "description": "Research-based biopharmaceutical company producing vaccines and medicines"},
+    {"id": "4", "name": "Roche", "country": "Switzerland", "sector": "Diagnostics", "size": "Large", "description": "Pharmaceuticals and in vitro diagnostics for oncology and infectious diseases"},
+    {"id": "5", "name": "Johnson & Johnson", "country": "United States", "sector": "Consumer Health", "size": "Large", "description": "Consumer health products, medical devices and pharmaceuticals"},
+    {"id": "6", "name": "MedCore Pharmaceuticals", "country": "Germany", "sector": "Generic Medications", "size": "Medium", "description": "Contract manufacturer of generic analgesics and antibiotics"},
+    {"id": "7", "name": "BioPharma Solutions", "country": "Brazil", "sector": "Specialty Drugs", "size": "Medium", "description": "Biologics and specialty drug development for Latin American markets"},
+    {"id": "8", "name": "Global Health Networks", "country": "India", "sector": "Distribution", "size": "Medium", "description": "Wholesale distribution of generic medications across South Asia"},
+    {"id": "9", "name": "PharmaVision Corp", "country": "Canada", "sector": "Research & Development", "size": "Small", "description": "Drug discovery research services and clinical trial support"},
+    {"id": "10", "name": "MediTech Innovations", "country": "Japan", "sector": "Medical Devices", "size": "Small", "description": "Diagnostic imaging and surgical medical devices"}
 ]
 
 MOCK_REGIONS = [
@@ -43,78 +81,478 @@ MOCK_REGIONS = [
 ]
 
 
+def _load_product_catalogue(db: Session) -> List[Dict[str, Any]]:
+    """Load the products to index, from mock data or the product table."""
+    if settings.USE_MOCK_DATA:
+        return MOCK_PRODUCTS
+    rows = db.query(
+        Product.id, Product.api_name, Product.synonyms, Product.code, Product.form, Product.therapeutic_category
+    ).order_by(Product.api_name).all()
+    return [
+        {
+            "id": str(product_id),
+            "api_name": api_name,
+            "synonyms": synonyms or [],
+            "code": code,
+            "form": form,
+            "therapeutic_category": therapeutic_category,
+        }
+        for product_id, api_name, synonyms, code, form, therapeutic_category in rows
+    ]
+
+
+def get_product_index(db: Session) -> ProductIndex:
+    """
+    Get the product search index, building it if the catalogue changed.
+    
+    Args:
+        db: Database session
+        
+    Returns:
+        The product index
+    """
+    version = data_version.get_version(data_version.PRODUCT)
+    index = _product_index_cache.get("products", version)
+    if index is None:
+        index = ProductIndex(_load_product_catalogue(db))
+        _product_index_cache.set("products", index, version)
+        logger.info(f"Built the product search index over {len(index)} products")
+    return index
+
+
+def _use_database() -> bool:
+    """Whether searches run in the database rather than against the in-memory indexes."""
+    return settings.use_database_search
+
+
+def _set_similarity_threshold(db: Session, threshold: float) -> None:
+    """Set the similarity threshold of the pg_trgm % operator for the current transaction."""
+    db.execute(text("SELECT set_config('pg_trgm.similarity_threshold', :threshold, true)"),
+               {"threshold": str(threshold)})
+
+
+def _search_products_in_database(
+    db: Session,
+    query: str,
+    limit: int,
+    threshold: float,
+    atc: Optional[str]
+) -> List[Dict[str, Any]]:
+    """
+    Search the product table.
+    
+    Products whose search vector matches the query in full-text search
+    come first, ranked by ts_rank with an exact name first. Queries without
+    whole-word matches, such as partial words and ATC codes, fall back to
+    substring matches ranked by match type like ProductIndex.match (prefix
+    matches are on the start of the name only), and then to similar names.
+    The full-text condition is served by the search vector's GIN index and
+    the ILIKE and % conditions by the pg_trgm GIN indexes (see
+    app.db.search_indexes).
+    """
+    query = " ".join(query.split())
+    if not query:
+        return []
+    synonyms = func.search_text(Product.synonyms)
+    contains = contains_pattern(query)
+    products = db.query(
+        Product.id, Product.api_name, Product.synonyms, Product.code, Product.form, Product.therapeutic_category
+    )
+    if atc:
+        products = products.filter(Product.code.ilike(contains_pattern(normalize_code(atc))[1:], escape="\\"))
+    exact = func.lower(Product.api_name) == query.lower()
+    matches, rank = full_text_match("product", query)
+    rows = products.filter(matches).order_by(exact.desc(), rank.desc(), Product.api_name).limit(limit).all()
+    
+    if not rows:
+        match_type = case(
+            (exact, 0),
+            (Product.api_name.ilike(contains[1:], escape="\\"), 1),
+            else_=2,
+        )
+        rows = products.filter(or_(
+            Product.api_name.ilike(contains, escape="\\"),
+            synonyms.ilike(contains, escape="\\"),
+            Product.code.ilike(contains, escape="\\"),
+        )).order_by(match_type, Product.api_name).limit(limit).all()
+    
+    if not rows:
+        # Nothing contains the query, so take it as misspelled
+        _set_similarity_threshold(db, threshold)
+        score = func.greatest(func.similarity(Product.api_name, query), func.similarity(synonyms, query))
+        rows = products.filter(
+            or_(Product.api_name.op("%")(query), synonyms.op("%")(query))
+        ).order_by(score.desc(), Product.api_name).limit(limit).all()
+    
+    return [
+        {
+            "id": str(product_id),
+            "api_name": api_name,
+            "synonyms": synonyms or [],
+            "code": code,
+            "form": form,
+            "therapeutic_category": therapeutic_category,
+        }
+        for product_id, api_name, synonyms, code, form, therapeutic_category in rows
+    ]
+
+
 def search_products(
     db: Session, 
     query: str, 
-    limit: int = 10
+    limit: int = 10,
+    threshold: float = DEFAULT_THRESHOLD,
+    atc: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
     Search for pharmaceutical products.
     
+    Products whose name, code or a synonym equals the query come first,
+    then those with one starting with it at a word boundary, then those
+    containing it anywhere. Queries that match nothing are taken as
+    misspelled and matched by trigram similarity (see ProductIndex.match).
+    While the user types, only the fields found for a recent search of a
+    prefix of the query are searched.
+    
     Args:
         db: Database session
         query: Search query string
         limit: Maximum number of results to return
+        threshold: Minimum trigram similarity of a fuzzy match
+        atc: Optional ATC group (e.g. N02 or C10AA) the products' codes must be under
         
     Returns:
         List of matching products
     """
-    # In a real implementation, this would query the database
-    # For now, return mock data filtered by the query
+    if _use_database():
+        return _search_products_in_database(db, query, limit, threshold, atc)
+    index = get_product_index(db)
+    allowed = index.atc.mask(atc) if atc else None
+    return index.search(query, limit, threshold, allowed, _product_candidates(index, query))
+
+
+def _product_candidates(index: ProductIndex, query: str) -> Optional[np.ndarray]:
+    """
+    Get the index fields containing a product query, narrowed down from
+    those of its longest recently searched prefix (see ProductIndex.candidates).
+    """
+    query = normalize(query)
+    if not query:
+        return None
+    # Field IDs are only valid for the index they were found in
+    version = (data_version.get_version(data_version.PRODUCT), id(index))
+    cached = _product_typeahead_cache.get(query, version)
+    if cached is not None and cached[0] == query:
+        return cached[1]
+    candidates = index.candidates(query, MAX_TYPEAHEAD_CANDIDATES, cached[1] if cached else None)
+    if candidates is not None:
+        _product_typeahead_cache.set(query, candidates, version)
+    return candidates
+
+
+def resolve_products(
+    db: Session,
+    names: List[str],
+    threshold: float = DEFAULT_THRESHOLD
+) -> List[Dict[str, Any]]:
+    """
+    Resolve product names, synonyms or codes to catalogue products in one pass.
     
-    query = query.lower()
-    results = []
+    Each entry is looked up exactly in the product index, and otherwise
+    matched by trigram similarity (see ProductIndex.resolve). Entries that
+    are equal after normalization are resolved once. The in-memory index is
+    used with either search backend.
     
-    for product in MOCK_PRODUCTS:
-        # Check if query matches product name or code
-        if query in product["api_name"].lower() or query in product["code"].lower():
-            results.append(product)
-            continue
-            
-        # Check if query matches any synonym
-        if any(query in synonym.lower() for synonym in product["synonyms"]):
-            results.append(product)
+    Args:
+        db: Database session
+        names: Product names, synonyms or ATC codes
+        threshold: Minimum trigram similarity of a fuzzy match
+        
+    Returns:
+        One dictionary per entry, in order, with the query, the product's id
+        and api_name (None if unresolved), the match type ("exact", "fuzzy"
+        or None) and the confidence, from 0 to 1
+    """
+    index = get_product_index(db)
+    resolved: Dict[str, Optional[Tuple[int, int, float]]] = {}
+    results = []
+    for name in names:
+        key = normalize(name)
+        if key not in resolved:
+            resolved[key] = index.resolve(key, threshold)
+        match = resolved[key]
+        if match is None:
+            results.append({"query": name, "id": None, "api_name": None, "match": None, "confidence": 0.0})
             continue
+        position, match_type, confidence = match
+        product = index.products[position]
+        results.append({
+            "query": name,
+            "id": product["id"],
+            "api_name": product["api_name"],
+            "match": "exact" if match_type == EXACT else "fuzzy",
+            "confidence": round(confidence, 4),
+        })
+    return results
+
+
+def browse_atc(db: Session, code: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
+    """
+    Browse the ATC classification of the product catalogue.
+    
+    The group's products and subgroups are ranges of the sorted ATC index,
+    found by binary search (see app.services.atc_index).
+    
+    Args:
+        db: Database session
+        code: ATC group or code prefix (e.g. N02 or C10AA); None for the whole catalogue
+        limit: Maximum number of products to return
+        
+    Returns:
+        Dictionary with the group's code, level and product count, its
+        subgroups one level down with their counts, and its products in code order
+    """
+    index = get_product_index(db)
+    code = normalize_code(code or "")
+    return {
+        "code": code,
+        "level": atc_level(code) if code else 0,
+        "count": index.atc.count(code),
+        "children": index.atc.children(code),
+        "products": [index.products[position] for position in index.atc.positions(code, limit).tolist()],
+    }
+
+
+def _company_document(company: Company) -> Dict[str, Any]:
+    """Searchable fields of a company row."""
+    return {
+        "id": str(company.id),
+        "name": company.name,
+        "country": company.country,
+        "sector": company.sector,
+        "size": company.size,
+        "description": company.description,
+    }
+
+
+def _load_companies(db: Session) -> List[Dict[str, Any]]:
+    """Load the companies to search, from mock data or the company table."""
+    if settings.USE_MOCK_DATA:
+        return MOCK_COMPANIES
+    rows = db.query(
+        Company.id, Company.name, Company.country, Company.sector, Company.size, Company.description
+    ).order_by(Company.name)
+    return [
+        {
+            "id": str(company_id),
+            "name": name,
+            "country": country,
+            "sector": sector,
+            "size": size,
+            "description": description,
+        }
+        for company_id, name, country, sector, size, description in rows
+    ]
+
+
+def get_company_search_index(db: Session) -> CompanyIndex:
+    """
+    Get the BM25 company index, building it on first use.
+    
+    Company changes committed by tracked sessions are applied to the index
+    incrementally (see track_company_changes); it is only rebuilt when the
+    company data version changes otherwise, e.g. after a bulk load.
     
-    # Limit the results
-    return results[:limit]
+    Args:
+        db: Database session
+        
+    Returns:
+        The company index
+    """
+    global _company_search_index, _company_search_version
+    version = data_version.get_version(data_version.COMPANY)
+    with _company_search_lock:
+        if _company_search_index is None or _company_search_version != version:
+            _company_search_index = CompanyIndex(_load_companies(db))
+            _company_search_version = version
+            logger.info(f"Built the company search index over {len(_company_search_index)} companies")
+        return _company_search_index
+
+
+def track_company_changes(session_factory: sessionmaker) -> None:
+    """
+    Apply the company changes that sessions from the factory commit to the company index.
+    
+    Changed companies are collected on flush and only applied once the
+    transaction commits; a rollback discards them. Changes committed
+    before the index is built are picked up when it loads the companies.
+    
+    The factory's sessions must also bump data versions (see
+    data_version.track_session_changes), and do so first. The bump of a
+    commit is then accounted for once its changes are applied, and any
+    other change of the company data version makes the index rebuild.
+    
+    Args:
+        session_factory: Session factory whose sessions should be tracked
+    """
+    def after_flush(session: Session, flush_context: Any) -> None:
+        changes = session.info.setdefault("company_changes", {})
+        for company in list(session.new) + list(session.dirty):
+            if isinstance(company, Company):
+                changes[str(company.id)] = _company_document(company)
+        for company in session.deleted:
+            if isinstance(company, Company):
+                changes[str(company.id)] = None
+        if any(
+            data_version.TABLE_DOMAINS.get(getattr(obj, "__tablename__", None)) == data_version.COMPANY
+            for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        ):
+            session.info["company_bumped"] = True
+    
+    def after_commit(session: Session) -> None:
+        global _company_search_version
+        changes = session.info.pop("company_changes", None)
+        bumps = 1 if session.info.pop("company_bumped", False) else 0
+        with _company_search_lock:
+            index = _company_search_index
+            if index is None:
+                return
+            if changes:
+                index.remove(company_id for company_id, company in changes.items() if company is None)
+                index.upsert(company for company in changes.values() if company is not None)
+            # Only this commit's bump is accounted for; if the version moved further, the index stays stale
+            version = data_version.get_version(data_version.COMPANY)
+            if _company_search_version is not None and version[0] - _company_search_version[0] == bumps:
+                _company_search_version = version
+    
+    def after_rollback(session: Session) -> None:
+        session.info.pop("company_changes", None)
+        session.info.pop("company_bumped", None)
+    
+    event.listen(session_factory, "after_flush", after_flush)
+    event.listen(session_factory, "after_commit", after_commit)
+    event.listen(session_factory, "after_rollback", after_rollback)
+
+
+def _search_companies_in_database(
+    db: Session,
+    query: str,
+    country: Optional[str],
+    limit: int,
+    threshold: float
+) -> List[Dict[str, Any]]:
+    """
+    Search the company table: full-text matches ranked by ts_rank, or else
+    substring matches of partial words, or else similar names by similarity.
+    """
+    query = " ".join(query.split())
+    if not query:
+        return []
+    companies = db.query(
+        Company.id, Company.name, Company.country, Company.sector, Company.size, Company.description
+    )
+    if country:
+        companies = companies.filter(func.lower(Company.country) == country.lower())
+    matches, rank = full_text_match("company", query)
+    rows = companies.filter(matches).order_by(rank.desc(), Company.name).limit(limit).all()
+    
+    if not rows:
+        contains = contains_pattern(query)
+        rows = companies.filter(
+            or_(
+                Company.name.ilike(contains, escape="\\"),
+                Company.sector.ilike(contains, escape="\\"),
+                Company.description.ilike(contains, escape="\\"),
+            )
+        ).order_by(Company.name).limit(limit).all()
+    
+    if not rows:
+        # Nothing contains the query, so take it as misspelled
+        _set_similarity_threshold(db, threshold)
+        rows = companies.filter(Company.name.op("%")(query)).order_by(
+            func.similarity(Company.name, query).desc(), Company.name
+        ).limit(limit).all()
+    
+    return [
+        {
+            "id": str(company_id),
+            "name": name,
+            "country": company_country,
+            "sector": sector,
+            "size": size,
+            "description": description,
+        }
+        for company_id, name, company_country, sector, size, description in rows
+    ]
 
 
 def search_companies(
     db: Session, 
     query: str, 
     country: Optional[str] = None, 
-    limit: int = 10
+    limit: int = 10,
+    threshold: float = DEFAULT_THRESHOLD
 ) -> List[Dict[str, Any]]:
     """
     Search for pharmaceutical companies.
     
+    Companies are ranked by the BM25 score of their name, sector and
+    description for the query, the last word of which also matches as a
+    prefix (see CompanyIndex). Only when no company matches, the query is
+    taken as misspelled and companies whose name has a trigram similarity
+    of at least threshold to it are returned, most similar first. While the
+    user types, only the companies found for a recent search that the query
+    narrows down are scored.
+    
     Args:
         db: Database session
         query: Search query string
         country: Optional country filter
         limit: Maximum number of results to return
+        threshold: Minimum trigram similarity of a fuzzy match
         
     Returns:
         List of matching companies
     """
-    # In a real implementation, this would query the database
-    # For now, return mock data filtered by the query and country
+    if _use_database():
+        return _search_companies_in_database(db, query, country, limit, threshold)
     
-    query = query.lower()
-    results = []
+    index = get_company_search_index(db)
+    # Companies matching an earlier query that this one narrows down are the only candidates
+    key = " ".join(query.lower().split())
+    version = index.version
+    scope = (country or "").lower()
+    cached = None
+    if key:
+        cached = _company_typeahead_cache.get(
+            key, (id(index), version), scope, lambda prefix: index.narrows(prefix, key)
+        )
+    # Candidates and results are positions, so they are resolved while the index cannot change
+    results, positions, version = index.search_companies(
+        query, country, limit, cached[1] if cached else None, version
+    )
+    if key and len(positions) <= MAX_TYPEAHEAD_CANDIDATES and (cached is None or cached[0] != key):
+        _company_typeahead_cache.set(key, positions, (id(index), version), scope)
+    if not results:
+        results = index.similar_companies(query, country, limit, threshold)
     
-    for company in MOCK_COMPANIES:
-        # Apply country filter if specified
-        if country and company["country"].lower() != country.lower():
-            continue
-            
-        # Check if query matches company name or sector
-        if query in company["name"].lower() or query in company["sector"].lower():
-            results.append(company)
+    return results
+
+
+def get_typeahead_stats() -> Dict[str, Any]:
+    """
+    Get the hit statistics of the typeahead candidate caches.
     
-    # Limit the results
-    return results[:limit]
+    A hit is a search that found the candidates of itself or of a prefix it
+    narrows down; searches in the database backend don't use the caches.
+    
+    Returns:
+        Dictionary with hits, misses, hit rate and number of entries for products and companies
+    """
+    return {
+        "products": _product_typeahead_cache.stats(),
+        "companies": _company_typeahead_cache.stats(),
+    }
 
 
 def get_regions(db: Session) -> List[str]:
@@ -0,0 +1,513 @@
+"""
+Trade cube service.
+
+This module keeps an in-process, columnar copy of the trade transactions for
+the dashboard. Transactions are aggregated to one row per (month, source
+country, destination country, product type, company, product, flow type) and
+every dimension is dictionary-encoded into integer codes, so that any
+combination of dashboard filters is answered with vectorized NumPy masks and
+bincount group-bys instead of a database round trip.
+
+Rows are kept sorted by month, which turns the time filter into a slice and
+lets a refresh replace the trailing months without rebuilding the rest. The
+arrays are saved as .npy files and memory-mapped when loaded, so every worker
+process shares the same pages. Each save is a new generation of files; worker
+processes check which generation is current on access and remap when another
+process has saved a newer one.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import date
+from typing import Dict, Iterable, List, Any, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core import data_version
+from app.core.config import settings
+from app.models.company import Company
+from app.models.product import Product
+from app.models.transaction import Transaction
+from app.services.geography import get_geography
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Dictionary-encoded dimensions, in record order after the period
+DIMENSIONS = ("source_country", "destination_country", "product_type", "company", "product", "flow_type")
+
+# Numeric measures, in record order after the dimensions
+MEASURES = ("value", "qty")
+
+# File in the cube directory naming the current cube generation
+_CURRENT_FILE = "CURRENT"
+
+
+def month_index(period: date) -> int:
+    """
+    Get the month index (months since year 0) of a period.
+
+    Args:
+        period: Any date in the month
+
+    Returns:
+        Month index
+    """
+    return period.year * 12 + period.month - 1
+
+
+def month_start(index: int) -> date:
+    """
+    Get the first day of the month with the given month index.
+
+    Args:
+        index: Month index
+
+    Returns:
+        First day of the month
+    """
+    return date(index // 12, index % 12 + 1, 1)
+
+
+class TradeCube:
+    """Dictionary-encoded trade aggregates held in NumPy arrays."""
+
+    def __init__(
+        self,
+        month: np.ndarray,
+        codes: Dict[str, np.ndarray],
+        measures: Dict[str, np.ndarray],
+        dictionaries: Dict[str, List[str]],
+        labels: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None
+    ):
+        """
+        Initialize the cube.
+
+        Args:
+            month: Month index of each row, sorted ascending
+            codes: Dimension codes of each row, by dimension
+            measures: Measure values of each row, by measure
+            dictionaries: Decoded values of each dimension, indexed by code
+            labels: Display attributes of companies and products, by ID
+        """
+        self.month = month
+        self.codes = codes
+        self.measures = measures
+        self.dictionaries = dictionaries
+        self.labels = labels or {"company": {}, "product": {}}
+        self._lookup = {
+            dim: {value.lower(): code for code, value in enumerate(values)}
+            for dim, values in dictionaries.items()
+        }
+
+    @classmethod
+    def from_records(
+        cls,
+        records: Iterable[Sequence[Any]],
+        labels: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None
+    ) -> "TradeCube":
+        """
+        Build a cube from aggregated trade records.
+
+        Args:
+            records: Tuples of (period, *DIMENSIONS, *MEASURES)
+            labels: Display attributes of companies and products, by ID
+
+        Returns:
+            The cube
+        """
+        empty = cls(
+            np.empty(0, dtype=np.int32),
+            {dim: np.empty(0, dtype=np.int32) for dim in DIMENSIONS},
+            {measure: np.empty(0, dtype=np.float64) for measure in MEASURES},
+            {dim: [] for dim in DIMENSIONS},
+        )
+        return empty.append(records, labels=labels)
+
+    def __len__(self) -> int:
+        return len(self.month)
+
+    @property
+    def latest_period(self) -> Optional[date]:
+        """First day of the latest month in the cube, or None if it is empty."""
+        if not len(self.month):
+            return None
+        return month_start(int(self.month[-1]))
+
+    def append(
+        self,
+        records: Iterable[Sequence[Any]],
+        since: Optional[date] = None,
+        labels: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None
+    ) -> "TradeCube":
+        """
+        Build a new cube with the months from since onwards replaced by records.
+
+        Existing dimension codes are kept, new values are appended to the
+        dictionaries. The cube itself is not modified, so readers holding it
+        are unaffected.
+
+        Args:
+            records: Tuples of (period, *DIMENSIONS, *MEASURES) for months >= since
+            since: First month that is replaced (default: only append)
+            labels: Display attributes of new companies and products, by ID
+
+        Returns:
+            The new cube
+        """
+        records = sorted(records, key=lambda record: record[0])
+        keep = len(self.month)
+        if since is not None:
+            keep = int(np.searchsorted(self.month, month_index(since), side="left"))
+
+        dictionaries = {dim: list(values) for dim, values in self.dictionaries.items()}
+        lookup = {dim: {value: code for code, value in enumerate(values)} for dim, values in dictionaries.items()}
+
+        def encode(dim: str, value: Any) -> int:
+            value = "Unknown" if value is None else str(value)
+            code = lookup[dim].get(value)
+            if code is None:
+                code = lookup[dim][value] = len(dictionaries[dim])
+                dictionaries[dim].append(value)
+            return code
+
+        new_month = np.fromiter((month_index(r[0]) for r in records), dtype=np.int32, count=len(records))
+        codes = {}
+        for offset, dim in enumerate(DIMENSIONS, start=1):
+            new_codes = np.fromiter((encode(dim, r[offset]) for r in records), dtype=np.int32, count=len(records))
+            codes[dim] = np.concatenate([self.codes[dim][:keep], new_codes])
+        measures = {}
+        for offset, measure in enumerate(MEASURES, start=1 + len(DIMENSIONS)):
+            new_values = np.fromiter((r[offset] or 0.0 for r in records), dtype=np.float64, count=len(records))
+            measures[measure] = np.concatenate([self.measures[measure][:keep], new_values])
+
+        merged_labels = {kind: dict(entries) for kind, entries in self.labels.items()}
+        for kind, entries in (labels or {}).items():
+            merged_labels.setdefault(kind, {}).update(entries)
+
+        return TradeCube(
+            np.concatenate([self.month[:keep], new_month]), codes, measures, dictionaries, merged_labels
+        )
+
+    def encode(self, dim: str, values: Iterable[str]) -> np.ndarray:
+        """
+        Get the codes of dimension values, matched case-insensitively.
+
+        Args:
+            dim: Dimension name
+            values: Values to look up; unknown values are ignored
+
+        Returns:
+            Array of codes
+        """
+        lookup = self._lookup[dim]
+        return np.array([lookup[v.lower()] for v in values if v.lower() in lookup], dtype=np.int32)
+
+    def rows(
+        self,
+        start: date,
+        end: date,
+        **filters: Optional[Iterable[str]]
+    ) -> np.ndarray:
+        """
+        Select the rows of a month range that match the dimension filters.
+
+        Args:
+            start: First month of the range
+            end: Month after the last month of the range
+            filters: Allowed values by dimension name; None means no filter
+
+        Returns:
+            Array of row indices
+        """
+        first, last = np.searchsorted(self.month, [month_index(start), month_index(end)], side="left")
+        return self.subset(np.arange(first, last), **filters)
+
+    def subset(self, rows: np.ndarray, **filters: Optional[Iterable[str]]) -> np.ndarray:
+        """
+        Narrow a row selection down to the rows matching the dimension filters.
+
+        Args:
+            rows: Row indices
+            filters: Allowed values by dimension name; None means no filter
+
+        Returns:
+            Array of row indices
+        """
+        mask = None
+        for dim, values in filters.items():
+            if values is None:
+                continue
+            # Lookup table from code to allowed, cheaper than np.isin on large selections
+            allowed = np.zeros(len(self.dictionaries[dim]), dtype=bool)
+            allowed[self.encode(dim, values)] = True
+            matches = allowed[self.codes[dim][rows]]
+            mask = matches if mask is None else mask & matches
+        return rows if mask is None else rows[mask]
+
+    def group_sum(self, dim: str, rows: np.ndarray, measure: str = "value") -> np.ndarray:
+        """
+        Sum a measure by dimension code.
+
+        Args:
+            dim: Dimension to group by
+            rows: Row indices to include
+            measure: Measure to sum
+
+        Returns:
+            Array of sums indexed by code
+        """
+        return np.bincount(
+            self.codes[dim][rows], weights=self.measures[measure][rows], minlength=len(self.dictionaries[dim])
+        )
+
+    def month_sum(self, start: date, months: int, rows: np.ndarray, measure: str = "value") -> np.ndarray:
+        """
+        Sum a measure by month.
+
+        Args:
+            start: First month
+            months: Number of months
+            rows: Row indices to include; all must fall in the month range
+            measure: Measure to sum
+
+        Returns:
+            Array of sums, one per month
+        """
+        offsets = self.month[rows] - month_index(start)
+        return np.bincount(offsets, weights=self.measures[measure][rows], minlength=months)[:months]
+
+    def distinct_count(self, dim: str, rows: np.ndarray) -> int:
+        """
+        Count the distinct values of a dimension.
+
+        Args:
+            dim: Dimension name
+            rows: Row indices to include
+
+        Returns:
+            Number of distinct values
+        """
+        counts = np.bincount(self.codes[dim][rows], minlength=len(self.dictionaries[dim]))
+        return int(np.count_nonzero(counts))
+
+    def save(self, directory: str) -> str:
+        """
+        Save the cube as a new generation in a directory.
+
+        The arrays are written to a fresh subdirectory which then becomes the
+        current generation, so processes loading the cube never see a
+        partially written one. The generation that was current until now is
+        kept for processes still switching from it; older ones are removed.
+
+        Args:
+            directory: Cube directory
+
+        Returns:
+            Name of the new generation
+        """
+        os.makedirs(directory, exist_ok=True)
+        generation = uuid.uuid4().hex
+        staging = os.path.join(directory, f".{generation}")
+        os.makedirs(staging)
+
+        np.save(os.path.join(staging, "month.npy"), self.month)
+        for dim, codes in self.codes.items():
+            np.save(os.path.join(staging, f"{dim}.npy"), codes)
+        for measure, values in self.measures.items():
+            np.save(os.path.join(staging, f"{measure}.npy"), values)
+        with open(os.path.join(staging, "dictionaries.json"), "w") as f:
+            json.dump({"dictionaries": self.dictionaries, "labels": self.labels}, f)
+
+        os.rename(staging, os.path.join(directory, generation))
+        previous = _current_generation(directory)
+        pointer = os.path.join(directory, f".{_CURRENT_FILE}.{generation}")
+        with open(pointer, "w") as f:
+            f.write(generation)
+        os.replace(pointer, os.path.join(directory, _CURRENT_FILE))
+
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name not in (generation, previous) and os.path.isdir(path) and not name.startswith("."):
+                shutil.rmtree(path, ignore_errors=True)
+        return generation
+
+    @classmethod
+    def load(cls, directory: str, generation: Optional[str] = None) -> Optional["TradeCube"]:
+        """
+        Memory-map a cube generation of a directory.
+
+        Args:
+            directory: Cube directory
+            generation: Generation to load; the current one if None
+
+        Returns:
+            The cube, or None if the directory holds no cube
+        """
+        generation = generation or _current_generation(directory)
+        if generation is None:
+            return None
+        path = os.path.join(directory, generation)
+
+        def load_array(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        with open(os.path.join(path, "dictionaries.json")) as f:
+            meta = json.load(f)
+        return cls(
+            load_array("month"),
+            {dim: load_array(dim) for dim in DIMENSIONS},
+            {measure: load_array(measure) for measure in MEASURES},
+            meta["dictionaries"],
+            meta["labels"],
+        )
+
+
+def _current_generation(directory: str) -> Optional[str]:
+    """Name of the current cube generation of a directory, or None if it holds no cube."""
+    try:
+        with open(os.path.join(directory, _CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _current_file_state(directory: str) -> Optional[Tuple[int, int]]:
+    """Inode and modification time of the current generation file, which change whenever it is replaced."""
+    try:
+        stat = os.stat(os.path.join(directory, _CURRENT_FILE))
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+_cube: Optional[TradeCube] = None
+# Generation of the cube, or None if it was set by set_trade_cube without one and is kept regardless of the files
+_generation: Optional[str] = None
+_pinned = False
+# State of the current generation file when it was last checked
+_checked_state: Optional[Tuple[int, int]] = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def _query_records(db: Session, since: Optional[date] = None) -> List[Tuple]:
+    """Aggregate transactions to cube records, optionally from a period onwards."""
+    columns = (
+        Transaction.period,
+        Transaction.source_country_id,
+        Transaction.destination_country_id,
+        Transaction.product_type,
+        Transaction.company_id,
+        Transaction.product_id,
+        Transaction.flow_type,
+    )
+    query = db.query(*columns, func.sum(Transaction.value), func.sum(Transaction.qty))
+    if since is not None:
+        query = query.filter(Transaction.period >= since)
+    rows = query.group_by(*columns).order_by(Transaction.period).all()
+    
+    # Group by the integer country codes in SQL, then decode them to names
+    countries = get_geography(db).country_names
+    return [(row[0], countries.get(row[1]), countries.get(row[2])) + tuple(row[3:]) for row in rows]
+
+
+def _query_labels(db: Session, records: List[Tuple], known: TradeCube) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Load names of the companies and products in records that the cube doesn't know yet."""
+    company_ids = {r[4] for r in records if str(r[4]) not in known.labels.get("company", {})}
+    product_ids = {r[5] for r in records if str(r[5]) not in known.labels.get("product", {})}
+
+    labels: Dict[str, Dict[str, Dict[str, Any]]] = {"company": {}, "product": {}}
+    if company_ids:
+        for company_id, name, country in (
+            db.query(Company.id, Company.name, Company.country).filter(Company.id.in_(company_ids)).all()
+        ):
+            labels["company"][str(company_id)] = {"name": name, "country": country}
+    if product_ids:
+        for product_id, name, category in (
+            db.query(Product.id, Product.api_name, Product.therapeutic_category)
+            .filter(Product.id.in_(product_ids))
+            .all()
+        ):
+            labels["product"][str(product_id)] = {"name": name, "category": category}
+    return labels
+
+
+def get_trade_cube() -> Optional[TradeCube]:
+    """
+    Get the trade cube, loading it from TRADE_CUBE_DIR on first use.
+
+    The current generation file is checked on every call, which is one
+    stat, and the cube is remapped when another process saved a new
+    generation. The trade data version is then bumped, so that results
+    cached by this process are recomputed.
+
+    Returns:
+        The cube, or None if no cube has been built
+    """
+    global _cube, _generation, _checked_state, _loaded
+    if _pinned:
+        return _cube
+    state = _current_file_state(settings.TRADE_CUBE_DIR)
+    remapped = False
+    if not _loaded or state != _checked_state:
+        with _lock:
+            if not _pinned and (not _loaded or state != _checked_state):
+                generation = _current_generation(settings.TRADE_CUBE_DIR)
+                if generation != _generation or not _loaded:
+                    remapped = _loaded
+                    _cube = TradeCube.load(settings.TRADE_CUBE_DIR, generation) if generation else None
+                    _generation = generation
+                    logger.info(f"Trade cube generation {generation} mapped")
+                _checked_state, _loaded = state, True
+    cube = _cube
+    if remapped:
+        data_version.bump(data_version.TRADE)
+    return cube
+
+
+def set_trade_cube(cube: Optional[TradeCube], generation: Optional[str] = None) -> None:
+    """
+    Replace the trade cube used by this process.
+
+    Args:
+        cube: The new cube, or None to disable the cube
+        generation: Saved generation the cube is, so that newer generations
+            saved by other processes replace it; without one, the cube is
+            kept until it is set again
+    """
+    global _cube, _generation, _pinned, _checked_state, _loaded
+    with _lock:
+        # The generation file is checked on the next access, in case another process saved since
+        _cube, _generation, _pinned, _loaded, _checked_state = cube, generation, generation is None, True, None
+
+
+def refresh_trade_cube(db: Session, since: Optional[date] = None) -> TradeCube:
+    """
+    Bring the trade cube up to date with the transaction table.
+
+    Only months from since onwards are re-read; without a since date, or if
+    there is no cube yet, the cube is built from all transactions.
+
+    Args:
+        db: Database session
+        since: First month with new or changed transactions
+
+    Returns:
+        The refreshed cube
+    """
+    current = get_trade_cube()
+    if current is None or since is None:
+        current, since = TradeCube.from_records([]), None
+
+    records = _query_records(db, since)
+    cube = current.append(records, since=since, labels=_query_labels(db, records, current))
+    set_trade_cube(cube, cube.save(settings.TRADE_CUBE_DIR))
+
+    logger.info(f"Trade cube refreshed with {len(records)} records from {since or 'the beginning'}, {len(cube)} rows")
+    return cube
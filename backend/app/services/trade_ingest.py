@@ -0,0 +1,102 @@
+"""
+Trade ingest service.
+
+This module loads batches of trade transactions and keeps everything derived
+from them (monthly aggregates, trade cube, dashboard rankings, product
+sketches, growth table) up to date.
+"""
+import logging
+from typing import Dict, List, Any
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core import data_version
+from app.db.trade_aggregates import refresh_trade_aggregates
+from app.models.product import Product
+from app.models.transaction import Transaction, period_for
+from app.services.dashboard import refresh_rankings
+from app.services.geography import resolve_country_ids
+from app.services.growth_table import get_growth_table
+from app.services.product_sketches import record_transactions
+from app.services.trade_cube import get_trade_cube, refresh_trade_cube
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def _next_month(period):
+    """Get the first day of the month after a period."""
+    return period.replace(year=period.year + 1, month=1) if period.month == 12 else period.replace(month=period.month + 1)
+
+
+def ingest_transactions(
+    db: Session, 
+    rows: List[Dict[str, Any]]
+) -> int:
+    """
+    Load a batch of trade transactions.
+    
+    Each row needs the Transaction columns (year, month, value, qty,
+    flow_type, company_id, product_id) and the source_country and
+    destination_country names, which are converted to country dimension
+    codes. The period date and product type are filled in when missing.
+    
+    Args:
+        db: Database session
+        rows: Transactions to load
+        
+    Returns:
+        Number of transactions loaded
+    """
+    if not rows:
+        return 0
+    
+    # Denormalize the product type so aggregates don't need to join products
+    product_ids = {row["product_id"] for row in rows if not row.get("product_type")}
+    product_types = {}
+    if product_ids:
+        product_types = dict(
+            db.query(Product.id, Product.form).filter(Product.id.in_(product_ids)).all()
+        )
+    
+    country_ids = resolve_country_ids(
+        db, {row[key] for row in rows for key in ("source_country", "destination_country")}
+    )
+    
+    batch = []
+    for row in rows:
+        row = dict(row)
+        row["source_country_id"] = country_ids[row.pop("source_country")]
+        row["destination_country_id"] = country_ids[row.pop("destination_country")]
+        row.setdefault("period", period_for(row["year"], row.get("month")))
+        if not row.get("product_type"):
+            row["product_type"] = product_types.get(row["product_id"])
+        batch.append(row)
+    
+    # New countries were only flushed, so the batch is committed once; its TRADE bump comes below
+    db.execute(insert(Transaction), batch)
+    data_version.discard_session_changes(db, data_version.TRADE)
+    db.commit()
+    
+    periods = [row["period"] for row in batch]
+    refresh_trade_aggregates(db.get_bind(), min(periods), _next_month(max(periods)))
+    previous_cube = get_trade_cube()
+    cube = refresh_trade_cube(db, min(periods))
+    refresh_rankings(
+        cube, {row["source_country"] for row in rows}, {row["product_type"] for row in batch}
+    )
+    record_transactions(
+        previous_cube, cube,
+        [dict(row, source_country=original["source_country"]) for original, row in zip(rows, batch)]
+    )
+    # Compute the growth table now rather than on the first request
+    get_growth_table(cube)
+    
+    # Bulk inserts bypass the session's change tracking, so bump explicitly, once
+    # per batch. This happens after the refreshes so that responses tagged with
+    # the new version are computed from refreshed data.
+    data_version.bump(data_version.TRADE)
+    
+    logger.info(f"Ingested {len(batch)} transactions for {min(periods)} to {max(periods)}")
+    return len(batch)
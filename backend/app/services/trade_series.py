@@ -0,0 +1,276 @@
+"""
+Trade series service.
+
+This module keeps the cumulative monthly trade value of every (region,
+product type, company, flow type) series in the trade cube. With the running
+total of each series, the value of any window of months is the difference of
+two columns, so the rolling-window totals behind the dashboard's "change" and
+"growth" fields cost a few subtractions per series instead of a pass over the
+cube's rows, whatever the time period.
+
+The store is derived from a trade cube once, when the cube is first queried,
+and replaced together with it.
+"""
+import threading
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.geography import REGION_COUNTRIES
+from app.services.trade_cube import TradeCube, month_index
+
+# Dimensions identifying a series; the region is derived from the source country
+SERIES_DIMENSIONS = ("region", "product_type", "company", "flow_type")
+
+# Dimensions of the rollup used by queries that don't involve companies
+TOTAL_DIMENSIONS = ("region", "product_type", "flow_type")
+
+
+class TradeSeries:
+    """Cumulative monthly trade value per series, held in one NumPy matrix."""
+
+    def __init__(
+        self,
+        keys: Dict[str, np.ndarray],
+        cumulative: np.ndarray,
+        first_month: int,
+        dictionaries: Dict[str, List[str]]
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            keys: Dimension codes of each series, by dimension
+            cumulative: Running total of each series (rows) at the start of
+                each month (columns), starting at first_month; one column
+                more than there are months, stored column-major
+            first_month: Month index of the first column
+            dictionaries: Decoded values of each dimension, indexed by code
+        """
+        self.keys = keys
+        self.cumulative = cumulative
+        self.first_month = first_month
+        self.dictionaries = dictionaries
+        self._lookup = {
+            dim: {value.lower(): code for code, value in enumerate(values)}
+            for dim, values in dictionaries.items()
+        }
+
+    @classmethod
+    def from_cube(cls, cube: TradeCube) -> "TradeSeries":
+        """
+        Build the store from a trade cube.
+
+        Company, product type and flow type codes are the cube's own, so
+        results grouped by company can be read against the cube's
+        dictionaries. Countries outside REGION_COUNTRIES are kept in a
+        series without a region.
+
+        Args:
+            cube: Trade cube
+
+        Returns:
+            The store
+        """
+        regions = list(REGION_COUNTRIES)
+        region_codes = {
+            country.lower(): code for code, name in enumerate(regions) for country in REGION_COUNTRIES[name]
+        }
+        # Region code of each source country code; len(regions) stands for no region
+        country_region = np.array(
+            [region_codes.get(country.lower(), len(regions)) for country in cube.dictionaries["source_country"]],
+            dtype=np.int64,
+        )
+        dictionaries = {
+            "region": regions,
+            "product_type": list(cube.dictionaries["product_type"]),
+            "company": list(cube.dictionaries["company"]),
+            "flow_type": list(cube.dictionaries["flow_type"]),
+        }
+        if not len(cube):
+            empty = {dim: np.empty(0, dtype=np.int32) for dim in SERIES_DIMENSIONS}
+            return cls(empty, np.zeros((0, 1)), 0, dictionaries)
+
+        # Combine the row's dimension codes into one key per series
+        row_codes = {
+            "region": country_region[cube.codes["source_country"]],
+            "product_type": cube.codes["product_type"],
+            "company": cube.codes["company"],
+            "flow_type": cube.codes["flow_type"],
+        }
+        sizes = [len(regions) + 1] + [max(len(dictionaries[dim]), 1) for dim in SERIES_DIMENSIONS[1:]]
+        row_keys = np.zeros(len(cube), dtype=np.int64)
+        for dim, size in zip(SERIES_DIMENSIONS, sizes):
+            row_keys = row_keys * size + row_codes[dim]
+        series_keys, series = np.unique(row_keys, return_inverse=True)
+
+        keys = {}
+        for dim, size in reversed(list(zip(SERIES_DIMENSIONS, sizes))):
+            series_keys, codes = np.divmod(series_keys, size)
+            keys[dim] = codes.astype(np.int32)
+
+        first_month = int(cube.month[0])
+        months = int(cube.month[-1]) - first_month + 1
+        cells = series.astype(np.int64) * months + (cube.month - first_month)
+        monthly = np.bincount(cells, weights=cube.measures["value"], minlength=len(series_keys) * months)
+        # Column-major, so that reading one month's running totals is a contiguous gather
+        cumulative = np.zeros((len(series_keys), months + 1), order="F")
+        np.cumsum(monthly.reshape(len(series_keys), months), axis=1, out=cumulative[:, 1:])
+        return cls({dim: keys[dim] for dim in SERIES_DIMENSIONS}, cumulative, first_month, dictionaries)
+
+    def __len__(self) -> int:
+        return len(self.cumulative)
+
+    def select(self, **filters: Optional[Iterable[str]]) -> np.ndarray:
+        """
+        Select the series matching dimension filters.
+
+        Args:
+            filters: Allowed values by dimension name (see SERIES_DIMENSIONS),
+                matched case-insensitively; None means no filter
+
+        Returns:
+            Array of series indices
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for dim, values in filters.items():
+            if values is None:
+                continue
+            lookup = self._lookup[dim]
+            allowed = np.zeros(len(self.dictionaries[dim]) + 1, dtype=bool)
+            allowed[[lookup[v.lower()] for v in values if v.lower() in lookup]] = True
+            mask &= allowed[self.keys[dim]]
+        return np.flatnonzero(mask)
+
+    def _column(self, month: int) -> int:
+        """Column holding the running total at the start of a month index, clamped to the stored months."""
+        return min(max(month - self.first_month, 0), self.cumulative.shape[1] - 1)
+
+    def window(self, series: np.ndarray, start: date, months: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the value of each series in a window of months and in the window before it.
+
+        Args:
+            series: Series indices
+            start: First month of the window
+            months: Length of the window (and of the previous window) in months
+
+        Returns:
+            Tuple of (window values, previous window values), one per series
+        """
+        first = month_index(start)
+        columns = [self._column(first - months), self._column(first), self._column(first + months)]
+        before, first, after = (self.cumulative[series, column] for column in columns)
+        return after - first, first - before
+
+    def window_sum(
+        self,
+        series: np.ndarray,
+        start: date,
+        months: int,
+        by: Optional[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sum the window values of some series, optionally grouped by a dimension.
+
+        Args:
+            series: Series indices
+            start: First month of the window
+            months: Length of the window in months
+            by: Dimension to group by (None for the overall total)
+
+        Returns:
+            Tuple of (window sums, previous window sums); scalars without by,
+            arrays indexed by code with by (series without a region are
+            left out of the region sums)
+        """
+        current, previous = self.window(series, start, months)
+        if by is None:
+            return current.sum(), previous.sum()
+        codes = self.keys[by][series]
+        size = len(self.dictionaries[by])
+        return (
+            np.bincount(codes, weights=current, minlength=size)[:size],
+            np.bincount(codes, weights=previous, minlength=size)[:size],
+        )
+
+    def month_sum(self, series: np.ndarray, start: date, months: int) -> np.ndarray:
+        """
+        Sum the value of some series by month.
+
+        Args:
+            series: Series indices
+            start: First month
+            months: Number of months
+
+        Returns:
+            Array of sums, one per month
+        """
+        columns = [self._column(month) for month in range(month_index(start), month_index(start) + months + 1)]
+        return np.diff([self.cumulative[series, column].sum() for column in columns])
+
+    def rollup(self, dimensions: Sequence[str]) -> "TradeSeries":
+        """
+        Sum the series over the dimensions that are not kept.
+
+        Queries that don't group or filter by company read the rollup
+        without it, which holds a few dozen series instead of one per
+        company.
+
+        Args:
+            dimensions: Dimensions to keep, a subset of this store's dimensions
+
+        Returns:
+            The rolled-up store
+        """
+        sizes = [len(self.dictionaries[dim]) + 1 for dim in dimensions]
+        keys = np.zeros(len(self), dtype=np.int64)
+        for dim, size in zip(dimensions, sizes):
+            keys = keys * size + self.keys[dim]
+        order = np.argsort(keys, kind="stable")
+        groups, starts = np.unique(keys[order], return_index=True)
+        cumulative = np.asfortranarray(
+            np.add.reduceat(self.cumulative[order], starts, axis=0) if len(order) else self.cumulative[:0]
+        )
+
+        rolled_keys = {}
+        for dim, size in reversed(list(zip(dimensions, sizes))):
+            groups, codes = np.divmod(groups, size)
+            rolled_keys[dim] = codes.astype(np.int32)
+        return TradeSeries(
+            {dim: rolled_keys[dim] for dim in dimensions}, cumulative, self.first_month,
+            {dim: self.dictionaries[dim] for dim in dimensions}
+        )
+
+
+_series: Dict[Tuple[str, ...], TradeSeries] = {}
+_series_cube: Optional[TradeCube] = None
+_series_lock = threading.Lock()
+
+
+def get_trade_series(cube: TradeCube, dimensions: Sequence[str] = SERIES_DIMENSIONS) -> TradeSeries:
+    """
+    Get the series store of a trade cube, building it the first time.
+
+    Args:
+        cube: Trade cube
+        dimensions: SERIES_DIMENSIONS, or a subset of them for a rollup (e.g. TOTAL_DIMENSIONS)
+
+    Returns:
+        The series store
+    """
+    global _series, _series_cube
+    dimensions = tuple(dimensions)
+    with _series_lock:
+        if _series_cube is cube and dimensions in _series:
+            return _series[dimensions]
+        stores = dict(_series) if _series_cube is cube else {}
+
+    if SERIES_DIMENSIONS not in stores:
+        stores[SERIES_DIMENSIONS] = TradeSeries.from_cube(cube)
+    if dimensions not in stores:
+        stores[dimensions] = stores[SERIES_DIMENSIONS].rollup(dimensions)
+    with _series_lock:
+        _series, _series_cube = stores, cube
+    return stores[dimensions]
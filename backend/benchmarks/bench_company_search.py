@@ -0,0 +1,103 @@
+"""
+Benchmark for company search.
+
+Builds the BM25 company index over 1M synthetic companies with a name,
+sector, country and short description each, and times single-word,
+multi-word, typeahead and country-filtered queries against the linear scan
+the search used before. Then times upserting batches of companies into the
+built index against rebuilding it.
+
+Usage:
+    python benchmarks/bench_company_search.py [--companies 1000000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.company_index import CompanyIndex
+
+PREFIXES = ["Medi", "Pharma", "Bio", "Gen", "Thera", "Vita", "Cura", "Nova", "Astra", "Zen", "Apex", "Omni"]
+SUFFIXES = ["Core", "Labs", "Health", "Vision", "Tech", "Gen", "Care", "Life", "Med", "Cell"]
+FORMS = ["", " Pharmaceuticals", " Corp", " Group", " Solutions", " GmbH", " Ltd"]
+SECTORS = ["Generic Medications", "Specialty Drugs", "Vaccines", "Diagnostics", "Distribution",
+           "Medical Devices", "Consumer Health", "Research & Development", "Biologics", "API Manufacturing"]
+COUNTRIES = ["Germany", "India", "United States", "China", "Brazil", "France", "Japan", "Israel", "Canada", "Italy"]
+WORDS = ["generic", "oncology", "antibiotics", "analgesics", "injectables", "tablets", "biosimilars", "vaccines",
+         "contract", "manufacturing", "distribution", "hospital", "clinical", "cardiovascular", "diabetes",
+         "dermatology", "respiratory", "wholesale", "export", "sterile", "oral", "solids", "europe", "asia"]
+
+
+def make_companies(count: int, rng: random.Random):
+    """Generate companies with mostly distinct names and short descriptions."""
+    return [
+        {
+            "id": str(i),
+            "name": f"{rng.choice(PREFIXES)}{rng.choice(SUFFIXES)}{i % 997}{rng.choice(FORMS)}",
+            "country": rng.choice(COUNTRIES),
+            "sector": rng.choice(SECTORS),
+            "size": "Medium",
+            "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12))),
+        }
+        for i in range(count)
+    ]
+
+
+def scan(companies, query: str, country, limit: int):
+    """The previous search: a substring scan of every company's name and sector."""
+    query = query.lower()
+    results = [
+        company for company in companies
+        if (not country or company["country"].lower() == country.lower())
+        and (query in company["name"].lower() or query in (company["sector"] or "").lower())
+    ]
+    return results[:limit]
+
+
+def timed(function, queries, repeat: int) -> float:
+    """Average milliseconds per query."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            function(*query)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--companies", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    companies = make_companies(args.companies, rng)
+
+    start = time.perf_counter()
+    index = CompanyIndex(companies)
+    print(f"Index build over {len(companies)} companies: {time.perf_counter() - start:.2f}s")
+
+    workloads = {
+        "rare term": [("medicore512", None), ("zenlife17", None), ("astracell3", None)],
+        "common term": [("generic", None), ("vaccines", None), ("oncology", None)],
+        "multi-word": [("generic oncology tablets", None), ("sterile injectables europe", None)],
+        "typeahead": [("pharmavision"[:length], None) for length in range(1, 13)],
+        "country": [("oncology", "Brazil"), ("generic injectables", "Japan"), ("bio", "India")],
+    }
+    for label, queries in workloads.items():
+        indexed = timed(lambda query, country: index.search(query, country, 10), queries, args.repeat)
+        scanned = timed(lambda query, country: scan(companies, query, country, 10), queries, 1)
+        print(f"{label:<12} index: {indexed:8.3f} ms/query   scan: {scanned:8.1f} ms/query")
+
+    for batch in (1, 100, 10_000):
+        updates = [dict(rng.choice(companies), description="sterile oncology injectables") for _ in range(batch)]
+        start = time.perf_counter()
+        index.upsert(updates)
+        print(f"upsert of {batch:>6} companies: {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
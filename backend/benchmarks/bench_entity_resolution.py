@@ -0,0 +1,102 @@
+"""
+Benchmark for prospect entity resolution.
+
+Merges 10k incoming (research) prospects into 100k known prospects, a tenth
+of which are duplicates with a different legal suffix and website casing.
+Exits with an error if fewer than MIN_PRECISION of the merges join a
+duplicate to the prospect it was made from.
+
+Usage:
+    python benchmarks/bench_entity_resolution.py [--known 100000] [--incoming 10000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.entity_resolution import merge_prospects
+
+COUNTRIES = ["Germany", "France", "India", "Brazil", "United States", "Japan", "Canada", "Italy"]
+SUFFIXES = ["GmbH", "Inc.", "Ltd", "S.A.", "AG", ""]
+WORDS = ["Pharma", "Health", "Bio", "Medi", "Gen", "Thera", "Cura", "Vita", "Nova", "Sana"]
+
+# Minimum share of merges that must join a seeded duplicate to its source prospect
+MIN_PRECISION = 0.99
+
+
+def make_known(count: int, rng: random.Random):
+    """Generate known prospects with unique names and domains."""
+    prospects = []
+    for i in range(count):
+        stem = f"{rng.choice(WORDS)}{i}"
+        prospects.append({
+            "id": str(i),
+            "name": f"{stem} {rng.choice(WORDS)} {rng.choice(SUFFIXES)}".strip(),
+            "location": f"City, {rng.choice(COUNTRIES)}",
+            "website": f"https://www.{stem.lower()}.com",
+            "opportunityScore": rng.randint(50, 95),
+        })
+    return prospects
+
+
+def make_incoming(known, count: int, duplicate_ratio: float, rng: random.Random):
+    """Generate incoming prospects, some of which duplicate known prospects, and the source ID of each duplicate."""
+    prospects = []
+    sources = {}
+    for i in range(count):
+        if rng.random() < duplicate_ratio:
+            source = rng.choice(known)
+            sources[f"research-{i}"] = source["id"]
+            name = source["name"].rsplit(" ", 1)[0] + " " + rng.choice(SUFFIXES)
+            prospects.append({
+                "id": f"research-{i}",
+                "name": name.strip(),
+                "location": source["location"].split(", ")[-1],
+                "website": source["website"].upper() if rng.random() < 0.5 else "",
+                "opportunityScore": 75,
+            })
+        else:
+            prospects.append({
+                "id": f"research-{i}",
+                "name": f"New{i} {rng.choice(WORDS)} {rng.choice(SUFFIXES)}".strip(),
+                "location": rng.choice(COUNTRIES),
+                "website": f"https://new{i}.example.com",
+                "opportunityScore": 75,
+            })
+    return prospects, sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--known", type=int, default=100_000)
+    parser.add_argument("--incoming", type=int, default=10_000)
+    parser.add_argument("--duplicates", type=float, default=0.1)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    known = make_known(args.known, rng)
+    incoming, sources = make_incoming(known, args.incoming, args.duplicates, rng)
+
+    start = time.perf_counter()
+    merged = merge_prospects(known, incoming)
+    elapsed = time.perf_counter() - start
+
+    merged_count = args.known + args.incoming - len(merged)
+    print(f"Merged {args.incoming:,} incoming into {args.known:,} known prospects in {elapsed:.2f}s")
+    print(f"Resolved {merged_count:,} duplicates, {len(merged):,} prospects after merge")
+
+    merges = {merged_id: prospect["id"] for prospect in merged for merged_id in prospect.get("mergedIds", [])}
+    correct = sum(1 for merged_id, target_id in merges.items() if sources.get(merged_id) == target_id)
+    precision = correct / len(merges) if merges else 1.0
+    recall = correct / len(sources) if sources else 1.0
+    print(f"Precision {precision:.1%}, recall {recall:.1%} of {len(sources):,} seeded duplicates")
+    if precision < MIN_PRECISION:
+        sys.exit(f"Precision {precision:.1%} is below {MIN_PRECISION:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark for product search.
+
+Builds the product index over 500k synthetic products with a few synonyms
+and an ATC code each, and times typeahead queries (every prefix of a few
+product names), ATC code prefixes, infix queries and misspelled (fuzzy)
+queries against the linear scan the search used before. The typeahead
+queries are also timed as the search service runs them, each narrowing
+down the candidate fields of the previous keystroke.
+
+Usage:
+    python benchmarks/bench_product_search.py [--products 500000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.product_index import ProductIndex
+
+STEMS = ["amlo", "ator", "para", "ibu", "amoxi", "ome", "met", "losar", "sertra", "fluo", "cef", "levo", "pred"]
+SUFFIXES = ["dipine", "statin", "cetamol", "profen", "cillin", "prazole", "formin", "tan", "line", "xetine", "zolin"]
+SALTS = ["", " hydrochloride", " sodium", " besylate", " calcium", " maleate"]
+
+
+def make_products(count: int, rng: random.Random):
+    """Generate products with unique names, synonyms and ATC codes."""
+    products = []
+    for i in range(count):
+        name = f"{rng.choice(STEMS)}{rng.choice(SUFFIXES)}{i}{rng.choice(SALTS)}"
+        products.append({
+            "id": str(i),
+            "api_name": name.capitalize(),
+            "synonyms": [f"{rng.choice(STEMS).capitalize()}{i}x" for _ in range(rng.randint(0, 3))],
+            "code": f"{rng.choice(string.ascii_uppercase)}{rng.randint(1, 99):02d}"
+                    f"{rng.choice(string.ascii_uppercase)}{rng.choice(string.ascii_uppercase)}{rng.randint(1, 99):02d}",
+            "form": "API",
+        })
+    return products
+
+
+def scan(products, query: str, limit: int):
+    """The previous search: a substring scan of every product's name, code and synonyms."""
+    query = query.lower()
+    results = []
+    for product in products:
+        if query in product["api_name"].lower() or query in product["code"].lower():
+            results.append(product)
+            continue
+        if any(query in synonym.lower() for synonym in product["synonyms"]):
+            results.append(product)
+    return results[:limit]
+
+
+def timed(function, queries, repeat: int) -> float:
+    """Average milliseconds per query."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            function(query)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1000
+
+
+def narrowed_typeahead(index: ProductIndex, names, max_candidates: int) -> None:
+    """Type each name one keystroke at a time, searching among the fields containing the previous prefix."""
+    for name in names:
+        candidates = None
+        for length in range(1, len(name) + 1):
+            query = name[:length]
+            narrowed = index.candidates(query, max_candidates, candidates)
+            index.search(query, 10, candidates=narrowed)
+            if narrowed is not None:
+                candidates = narrowed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--products", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    products = make_products(args.products, rng)
+
+    start = time.perf_counter()
+    index = ProductIndex(products)
+    print(f"Index build over {len(products)} products: {time.perf_counter() - start:.2f}s")
+
+    names = [rng.choice(products)["api_name"].lower() for _ in range(5)]
+    workloads = {
+        "typeahead": [name[:length] for name in names for length in range(1, len(name) + 1)],
+        "atc prefix": ["n", "n0", "n02", "n02b", "n02be"],
+        "infix": ["dipine12", "statin99", "hloride", "xetine4"],
+        # One letter dropped from each name, so only trigram similarity finds it
+        "fuzzy": [name[:3] + name[4:] for name in names],
+    }
+    index.search(names[0], 10)
+    for label, queries in workloads.items():
+        indexed = timed(lambda query: index.search(query, 10), queries, args.repeat)
+        scanned = timed(lambda query: scan(products, query, 10), queries, 1)
+        print(f"{label:<12} index: {indexed:8.3f} ms/query   scan: {scanned:8.1f} ms/query")
+    queries = len(workloads["typeahead"])
+    narrowed = timed(lambda _: narrowed_typeahead(index, names, 500), [None], args.repeat) / queries
+    print(f"{'narrowed':<12} index: {narrowed:8.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark for read endpoint response serialization.
+
+Compares, for the market trends, dashboard snapshot and a page of 500
+prospects, the cost of FastAPI's default response handling (response_model
+validation, jsonable_encoder and json.dumps) with encoding the payload once
+(orjson when installed) and with returning the cached encoded bytes.
+
+Usage:
+    python benchmarks/bench_serialization.py [--repeat 200]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.core import serialization
+from app.core.cache import VersionedCache
+from app.services import dashboard
+from app.services.matching import MOCK_PROSPECTS
+
+
+def default_response(adapter: TypeAdapter, payload: Any) -> bytes:
+    """Encode a payload the way FastAPI does for an endpoint with a response_model."""
+    validated = adapter.validate_python(payload)
+    return json.dumps(
+        jsonable_encoder(validated), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def timed(function, repeat: int) -> float:
+    """Average wall time of a call in microseconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    prospects = [dict(MOCK_PROSPECTS[i % len(MOCK_PROSPECTS)], id=str(i)) for i in range(500)]
+    payloads = [
+        ("market trends", TypeAdapter(Dict[str, Any]), dashboard.get_market_trends(None)),
+        ("dashboard snapshot", TypeAdapter(Dict[str, Any]), dashboard.get_dashboard_snapshot(None)),
+        ("500 prospects", TypeAdapter(List[Dict[str, Any]]), prospects),
+    ]
+    encoder = "orjson" if serialization.orjson is not None else "json"
+    print(f"Encoder: {encoder}")
+
+    cache = VersionedCache()
+    for name, adapter, payload in payloads:
+        cache.set(name, serialization.dumps(payload), 1)
+        before = timed(lambda: default_response(adapter, payload), args.repeat)
+        encoded = timed(lambda: serialization.dumps(payload), args.repeat)
+        cached = timed(lambda: cache.get(name, 1), args.repeat)
+        print(
+            f"{name:20} default {before:9.1f}us  encode {encoded:8.1f}us  cached {cached:6.1f}us  "
+            f"({before / encoded:.0f}x / {before / cached:.0f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
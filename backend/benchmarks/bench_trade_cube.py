@@ -0,0 +1,125 @@
+"""
+Benchmark for dashboard queries on the trade cube.
+
+Builds a cube of 1M aggregated trade records over 24 months and its
+cumulative trade series and growth table, materializes the exporter
+rankings of every dashboard slice, seeds the product heavy-hitters sketches,
+and times the market trends, top exporters and top products reads for a few
+filter combinations.
+
+Usage:
+    python benchmarks/bench_trade_cube.py [--records 1000000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import dashboard
+from app.services.growth_table import GrowthTable
+from app.services.product_sketches import ProductSketches
+from app.services.trade_cube import TradeCube
+from app.services.trade_series import get_trade_series
+
+COUNTRIES = [country for countries in dashboard.REGION_COUNTRIES.values() for country in countries]
+PRODUCT_TYPES = ["API", "FDF", "Excipients"]
+FILTERS = [
+    {},
+    {"product_type": "api"},
+    {"region": "europe"},
+    {"product_type": "fdf", "region": "asia"},
+]
+
+
+def make_records(count: int, rng: random.Random):
+    """Generate aggregated trade records for 2023 and 2024."""
+    companies = [f"company-{i}" for i in range(5_000)]
+    products = [f"product-{i}" for i in range(2_000)]
+    records = []
+    for _ in range(count):
+        records.append((
+            date(rng.choice((2023, 2024)), rng.randint(1, 12), 1),
+            rng.choice(COUNTRIES),
+            rng.choice(COUNTRIES),
+            rng.choice(PRODUCT_TYPES),
+            rng.choice(companies),
+            rng.choice(products),
+            rng.choice(("export", "import")),
+            rng.uniform(1e4, 1e7),
+            rng.uniform(1, 1000),
+        ))
+    return records
+
+
+def timed(function, repeat: int) -> float:
+    """Average wall time of a call in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    records = make_records(args.records, random.Random(42))
+    start = time.perf_counter()
+    cube = TradeCube.from_records(records)
+    print(f"Built cube of {len(cube):,} rows in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    series = get_trade_series(cube)
+    print(f"Built {len(series):,} cumulative trade series in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    table = GrowthTable.from_cube(cube)
+    counts = ", ".join(f"{len(entities.index):,} {kind}" for kind, entities in table.entities.items())
+    print(f"Computed the growth table ({counts}) in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    dashboard.refresh_rankings(cube)
+    print(f"Materialized {len(dashboard._rankings)} rankings in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    sketches = ProductSketches.from_cube(cube)
+    print(f"Seeded {len(sketches.sketches)} product sketches in {time.perf_counter() - start:.2f}s")
+
+    batch = [record for record in make_records(1_000, random.Random(7)) if record[3] == "API"]
+    batch = [(date(2024, 12, 1), "Japan") + record[2:] for record in batch]
+    refreshed = cube.append(batch)
+    start = time.perf_counter()
+    dashboard.refresh_rankings(refreshed, {"Japan"}, {"API"})
+    print(f"Refreshed rankings for a batch of {len(batch)} records in {time.perf_counter() - start:.2f}s")
+    cube = refreshed
+    rows = [
+        {"period": r[0], "source_country": r[1], "product_type": r[3], "product_id": r[5], "flow_type": r[6],
+         "value": r[7]}
+        for r in batch
+    ]
+    start = time.perf_counter()
+    sketches.update(rows)
+    print(f"Counted a batch of {len(batch)} records into the product sketches in {time.perf_counter() - start:.4f}s")
+
+    for filters in FILTERS:
+        product_type, region = filters.get("product_type"), filters.get("region")
+        trends = timed(lambda: dashboard._get_market_trends_from_cube(cube, product_type, region, "12m"), args.repeat)
+        exporters = timed(
+            lambda: dashboard._top_exporters_from_cube(cube, 5, product_type, region, "12m"), args.repeat
+        )
+        products = timed(
+            lambda: dashboard._top_products_from_sketches(sketches, cube, 10, product_type, region, "12m"),
+            args.repeat
+        )
+        print(f"{str(filters):45} trends {trends:7.2f}ms  exporters {exporters:7.2f}ms  products {products:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
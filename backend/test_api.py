@@ -88,6 +88,18 @@ class TestAPI(unittest.TestCase):
         self.assertIn("name", prospect)
         self.assertIn("location", prospect)
     
+    def test_get_prospect_details_batch(self):
+        """Test the batch prospect details endpoint."""
+        response = self.client.post(
+            "/api/match/prospects/details",
+            json={"prospect_ids": ["1", "2", "unknown"], "fields": ["name", "location"]}
+        )
+        self.assertEqual(response.status_code, 200)
+        
+        details = response.json()
+        self.assertEqual(set(details), {"1", "2"})
+        self.assertEqual(set(details["1"]), {"id", "name", "location"})
+    
     def test_generate_outreach_guidance(self):
         """Test the generate outreach guidance endpoint."""
         # Test with a valid prospect ID
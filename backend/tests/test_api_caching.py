@@ -0,0 +1,119 @@
+"""
+Tests for conditional GET support on read endpoints.
+"""
+import time
+import unittest
+from email.utils import formatdate
+from unittest.mock import patch
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.core import data_version, serialization
+from app.main import app
+
+
+class TestConditionalGet(unittest.TestCase):
+    """Test cases for ETag, Last-Modified and 304 handling."""
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_validators_are_set(self):
+        """Read endpoints send an ETag, Last-Modified and Cache-Control."""
+        for url in ("/api/dashboard/trends", "/api/dashboard/top-exporters", "/api/dashboard/top-products",
+                    "/api/search/regions", "/api/analytics/popular-searches"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertTrue(response.headers["etag"].startswith('W/"'), url)
+            self.assertIn("last-modified", response.headers)
+            self.assertIn("must-revalidate", response.headers["cache-control"])
+
+    def test_matching_etag_skips_service(self):
+        """A current If-None-Match gets a 304 without calling the service."""
+        etag = self.client.get("/api/dashboard/trends?region=Europe").headers["etag"]
+
+        with patch("app.services.dashboard.get_market_trends") as get_market_trends:
+            response = self.client.get("/api/dashboard/trends?region=Europe", headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b"")
+            self.assertEqual(response.headers["etag"], etag)
+            get_market_trends.assert_not_called()
+
+        # Other filters are a different representation
+        other = self.client.get("/api/dashboard/trends?region=Africa", headers={"If-None-Match": etag})
+        self.assertEqual(other.status_code, 200)
+
+    def test_snapshot(self):
+        """The pre-serialized snapshot is sent with caching headers and supports 304."""
+        response = self.client.get("/api/dashboard/snapshot?region=Europe")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/json")
+        self.assertIn("top_exporters", response.json())
+
+        repeat = self.client.get(
+            "/api/dashboard/snapshot?region=Europe", headers={"If-None-Match": response.headers["etag"]}
+        )
+        self.assertEqual(repeat.status_code, 304)
+
+        # Without validators, the encoded snapshot is reused until the data changes
+        with patch("app.services.dashboard.get_dashboard_snapshot") as get_dashboard_snapshot:
+            cached = self.client.get("/api/dashboard/snapshot?region=Europe")
+            get_dashboard_snapshot.assert_not_called()
+        self.assertEqual(cached.content, response.content)
+
+    def test_data_change_invalidates_etag(self):
+        """Bumping the data version changes the ETag, so the full response is sent again."""
+        etag = self.client.get("/api/dashboard/top-products").headers["etag"]
+
+        data_version.bump(data_version.TRADE)
+        response = self.client.get("/api/dashboard/top-products", headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["etag"], etag)
+
+    def test_if_modified_since(self):
+        """If-Modified-Since is honored when no If-None-Match is sent."""
+        data_version.bump(data_version.ANALYTICS)
+        future = formatdate(time.time() + 60, usegmt=True)
+        past = formatdate(time.time() - 3600, usegmt=True)
+
+        current = self.client.get("/api/analytics/popular-searches", headers={"If-Modified-Since": future})
+        stale = self.client.get("/api/analytics/popular-searches", headers={"If-Modified-Since": past})
+
+        self.assertEqual(current.status_code, 304)
+        self.assertEqual(stale.status_code, 200)
+
+
+
+class TestEncodedResponseCache(unittest.TestCase):
+    """Test cases for the cache of encoded read endpoint responses."""
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_encoded_response_is_reused(self):
+        """A repeated request is answered from the encoded bytes until the data changes."""
+        result = {"global_trade_volume": {"value": np.float64(1.5)}}
+        with patch("app.services.dashboard.get_market_trends", return_value=result) as get_market_trends:
+            first = self.client.get("/api/dashboard/trends?region=Oceania&time_period=3m")
+            second = self.client.get("/api/dashboard/trends?time_period=3m&region=Oceania")
+            self.assertEqual(get_market_trends.call_count, 1)
+            self.assertEqual(first.content, second.content)
+            self.assertEqual(first.json(), {"global_trade_volume": {"value": 1.5}})
+            self.assertIn("etag", second.headers)
+
+            data_version.bump(data_version.COMPANY)
+            self.client.get("/api/dashboard/trends?region=Oceania&time_period=3m")
+            self.assertEqual(get_market_trends.call_count, 2)
+
+    def test_standard_library_fallback(self):
+        """Without orjson, payloads are encoded the same way by the json module."""
+        value = {"name": "Zürich", "values": [np.int64(3), 1.5, None]}
+        with patch.object(serialization, "orjson", None):
+            fallback = serialization.dumps(value)
+        self.assertEqual(fallback, serialization.dumps(value))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Tests for the ATC code index.
+"""
+import unittest
+
+from app.services import search
+from app.services.atc_index import AtcIndex, atc_level
+
+CATALOGUE = [
+    {"id": "1", "code": "N02BE01"},
+    {"id": "2", "code": "C10AA05"},
+    {"id": "3", "code": "n02ba01"},
+    {"id": "4", "code": None},
+    {"id": "5", "code": "C10AA01"},
+    {"id": "6", "code": "C09CA01"},
+    {"id": "7", "code": "N02BE01"},
+]
+
+
+class TestAtcIndex(unittest.TestCase):
+    """Test cases for ATC prefix ranges and group counts."""
+
+    def setUp(self):
+        self.index = AtcIndex(CATALOGUE)
+
+    def test_levels(self):
+        """Levels follow the code lengths of the classification."""
+        self.assertEqual([atc_level(code) for code in ["N", "N02", "N02B", "N02BE", "N02BE01"]], [1, 2, 3, 4, 5])
+        self.assertIsNone(atc_level("N0"))
+
+    def test_descendants(self):
+        """All products under a group are returned in code order, at any level and casing."""
+        self.assertEqual(self.index.positions("N02").tolist(), [2, 0, 6])
+        self.assertEqual(self.index.positions("c10aa").tolist(), [4, 1])
+        self.assertEqual(self.index.positions("C").tolist(), [5, 4, 1])
+        self.assertEqual(self.index.positions("N02", limit=1).tolist(), [2])
+        self.assertEqual(self.index.positions("A").tolist(), [])
+        self.assertEqual(len(self.index), 6)
+
+    def test_counts_match_scan(self):
+        """Group counts equal the number of codes starting with the group."""
+        codes = [p["code"].upper() for p in CATALOGUE if p["code"]]
+        for prefix in ["", "N", "N0", "N02", "N02BE", "N02BE01", "C10", "C1", "X"]:
+            self.assertEqual(self.index.count(prefix), sum(code.startswith(prefix) for code in codes), prefix)
+
+    def test_children(self):
+        """Subgroups one level down carry their product counts."""
+        self.assertEqual(self.index.children(), [
+            {"code": "C", "level": 1, "count": 3},
+            {"code": "N", "level": 1, "count": 3},
+        ])
+        self.assertEqual(self.index.children("N02B"), [
+            {"code": "N02BA", "level": 4, "count": 1},
+            {"code": "N02BE", "level": 4, "count": 2},
+        ])
+        self.assertEqual([group["code"] for group in self.index.children("C1")], ["C10"])
+        self.assertEqual(self.index.children("N02BE01"), [])
+
+    def test_mask(self):
+        """The mask marks the catalogue positions under a group."""
+        self.assertEqual(self.index.mask("C10").tolist(), [False, True, False, False, True, False, False])
+
+
+class TestAtcSearch(unittest.TestCase):
+    """Test cases for ATC filters and browsing in the search service."""
+
+    def test_search_within_group(self):
+        """Product search only returns products under the ATC group."""
+        self.assertEqual([p["api_name"] for p in search.search_products(None, "a", atc="C")],
+                         ["Atorvastatin", "Amlodipine", "Losartan"])
+        self.assertEqual([p["api_name"] for p in search.search_products(None, "a", atc="C10")], ["Atorvastatin"])
+        self.assertEqual(search.search_products(None, "prozac", atc="C"), [])
+        self.assertEqual([p["api_name"] for p in search.search_products(None, "fluoxetin", atc="N06AB")],
+                         ["Fluoxetine"])
+
+    def test_browse(self):
+        """Browsing a group returns its count, subgroups and products."""
+        group = search.browse_atc(None, "n06")
+        self.assertEqual((group["code"], group["level"], group["count"]), ("N06", 2, 2))
+        self.assertEqual(group["children"], [{"code": "N06A", "level": 3, "count": 2}])
+        self.assertEqual([p["api_name"] for p in group["products"]], ["Fluoxetine", "Sertraline"])
+        self.assertEqual(search.browse_atc(None)["count"], 10)
+        self.assertEqual(len(search.browse_atc(None, limit=3)["products"]), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,7 +10,8 @@ from app.services.buyer_research import (
     extract_section_from_markdown,
     parse_markdown_table,
     parse_research_results,
-    research_potential_buyers
+    research_potential_buyers,
+    research_prospect_id
 )
 
 
@@ -108,6 +109,13 @@ Test company overview
         self.assertEqual(result[0]["reasonForRecommendation"], "Good fit for products")
         self.assertEqual(result[0]["source"], "perplexity_research")
         
+        # IDs identify the company, so parsing the results again keeps them
+        again = parse_research_results(research_response)
+        self.assertEqual([p["id"] for p in again], [p["id"] for p in result])
+        self.assertTrue(result[0]["id"].startswith("research-"))
+        self.assertNotEqual(result[0]["id"], result[1]["id"])
+        self.assertEqual(research_prospect_id("Company A Inc.", "usa"), result[0]["id"])
+        
         # Test with missing table section
         research_response = {"text": "# Source Company Overview\nTest company overview"}
         result = parse_research_results(research_response)
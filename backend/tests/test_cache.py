@@ -0,0 +1,117 @@
+"""
+Tests for the caching utilities and data version tracking.
+"""
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import data_version
+from app.core.cache import PrefixCache, VersionedCache
+from app.db.base import Base
+from app.models.company import Company
+
+
+class TestVersionedCache(unittest.TestCase):
+    """Test cases for VersionedCache."""
+
+    def test_version_mismatch_is_a_miss(self):
+        """Entries are only returned for the version they were stored with."""
+        cache = VersionedCache()
+        cache.set("key", "value", version=(1,))
+
+        self.assertEqual(cache.get("key", (1,)), "value")
+        self.assertIsNone(cache.get("key", (2,)))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted first."""
+        cache = VersionedCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+
+    @patch("app.core.cache.time.monotonic")
+    def test_ttl_expiry(self, mock_monotonic):
+        """Entries expire after their TTL."""
+        cache = VersionedCache(ttl_seconds=10)
+        mock_monotonic.return_value = 100.0
+        cache.set("key", "value")
+
+        mock_monotonic.return_value = 105.0
+        self.assertEqual(cache.get("key"), "value")
+        mock_monotonic.return_value = 111.0
+        self.assertIsNone(cache.get("key"))
+
+
+class TestPrefixCache(unittest.TestCase):
+    """Test cases for PrefixCache."""
+
+    def test_longest_prefix(self):
+        """A query gets the value of its longest cached prefix, within its scope and version."""
+        cache = PrefixCache()
+        cache.set("a", 1, version=1)
+        cache.set("amo", 2, version=1)
+        cache.set("amo", 3, version=1, scope="other")
+
+        self.assertEqual(cache.get("amox", 1), ("amo", 2))
+        self.assertEqual(cache.get("amo", 1, "other"), ("amo", 3))
+        self.assertEqual(cache.get("am", 1), ("a", 1))
+        # Entries of other versions are dropped when looked up
+        self.assertIsNone(cache.get("amox", 2))
+        self.assertIsNone(cache.get("b", 1))
+        self.assertEqual(cache.stats(), {"hits": 3, "misses": 2, "hit_rate": 0.6, "entries": 1})
+
+    def test_reusable_check(self):
+        """Prefixes whose values can't be used for the query are skipped."""
+        cache = PrefixCache()
+        cache.set("a", 1)
+        cache.set("ab", 2)
+
+        self.assertEqual(cache.get("abc", reusable=lambda prefix: prefix != "ab"), ("a", 1))
+        self.assertEqual(cache.get("ab", reusable=lambda prefix: False), ("ab", 2))
+        self.assertIsNone(cache.get("abc", reusable=lambda prefix: False))
+
+
+class TestDataVersion(unittest.TestCase):
+    """Test cases for data version tracking."""
+
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine, tables=[Company.__table__])
+        self.session_factory = sessionmaker(bind=engine)
+        data_version.track_session_changes(self.session_factory)
+
+    def test_commit_bumps_changed_domains(self):
+        """Committing a change bumps the version of its data domain only."""
+        company_version = data_version.get_version(data_version.COMPANY)
+        trade_version = data_version.get_version(data_version.TRADE)
+
+        db = self.session_factory()
+        db.add(Company(name="MedCore", country="Germany"))
+        db.commit()
+        db.close()
+
+        self.assertNotEqual(data_version.get_version(data_version.COMPANY), company_version)
+        self.assertEqual(data_version.get_version(data_version.TRADE), trade_version)
+
+    def test_rollback_does_not_bump(self):
+        """Changes that are rolled back leave the version unchanged."""
+        version = data_version.get_version(data_version.COMPANY)
+
+        db = self.session_factory()
+        db.add(Company(name="MedCore", country="Germany"))
+        db.flush()
+        db.rollback()
+        db.close()
+
+        self.assertEqual(data_version.get_version(data_version.COMPANY), version)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+"""
+Tests for the BM25 company index.
+"""
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import data_version
+from app.db.base import Base
+from app.models.company import Company
+from app.models.contact import Contact  # noqa: F401 - referenced by companies
+from app.models.country import Country  # noqa: F401 - referenced by transactions
+from app.models.license import License  # noqa: F401 - referenced by companies
+from app.models.product import Product  # noqa: F401 - referenced by companies
+from app.models.region import Region  # noqa: F401 - referenced by countries
+from app.models.transaction import Transaction  # noqa: F401 - referenced by companies
+from app.services import company_index, search
+from app.services.company_index import CompanyIndex, tokenize
+
+COMPANIES = [
+    {"id": "1", "name": "Acme Generics", "country": "Germany", "sector": "Generic Medications",
+     "description": "Maker of generic analgesics"},
+    {"id": "2", "name": "Vaxo", "country": "France", "sector": "Vaccines",
+     "description": "Vaccines and generic antibiotics for hospitals and clinics across Europe"},
+    {"id": "3", "name": "BioGenix", "country": "Germany", "sector": "Biologics", "description": None},
+    {"id": "4", "name": "Generic Health", "country": "India", "sector": None,
+     "description": "Generic oncology drugs"},
+]
+
+
+class TestCompanyIndex(unittest.TestCase):
+    """Test cases for BM25 ranking, filtering and incremental updates."""
+
+    def setUp(self):
+        self.index = CompanyIndex(COMPANIES)
+
+    def ids(self, *args, **kwargs):
+        return [self.index.companies[position]["id"] for position, _ in self.index.search(*args, **kwargs)]
+
+    def test_tokenize(self):
+        """Words are lowercased and CamelCase words are also split into their parts."""
+        self.assertEqual(tokenize("BioGenix Pharma-Labs"), ["biogenix", "pharma", "labs", "bio", "genix"])
+        self.assertEqual(tokenize("MediTech2 x_AbCd"), ["meditech2", "x", "abcd", "medi", "tech", "2", "ab", "cd"])
+
+    def test_ranked_by_field_weight(self):
+        """Names weigh more than sectors, which weigh more than descriptions."""
+        self.assertEqual(self.ids("generic"), ["1", "4", "2"])
+        self.assertEqual(self.ids("vaccines"), ["2"])
+        self.assertEqual(self.ids("unknown"), [])
+
+    def test_prefix_and_camel_case(self):
+        """The last query word also matches as a prefix, and CamelCase parts match whole."""
+        self.assertEqual(self.ids("vacc"), ["2"])
+        self.assertEqual(self.ids("genix"), ["3"])
+        self.assertEqual(self.ids("bio"), ["3"])
+        self.assertEqual(self.ids("generic onco"), ["4", "1", "2"])
+
+    def test_country_filter_and_limit(self):
+        """The country filter is case-insensitive and the limit keeps the best results."""
+        self.assertEqual(self.ids("generic", country="germany"), ["1"])
+        self.assertEqual(self.ids("generic", country="Spain"), [])
+        self.assertEqual(self.ids("generic", limit=1), ["1"])
+        self.assertEqual(self.ids("generic", limit=0), [])
+
+    def test_narrowed_candidates(self):
+        """Scoring only the companies matching a query it narrows gives the same results."""
+        self.assertTrue(self.index.narrows("generic v", "Generic Vacc"))
+        self.assertTrue(self.index.narrows("gen", "gen"))
+        self.assertFalse(self.index.narrows("generic", "generic v"))
+        self.assertFalse(self.index.narrows("acme g", "acme x"))
+        with patch.object(company_index, "MAX_EXPANSIONS", 0):
+            self.assertFalse(self.index.narrows("gen", "gene"))
+
+        for previous, query in [("g", "generic"), ("generic v", "generic vaccines"), ("b", "bio")]:
+            for country in [None, "Germany"]:
+                candidates, _ = self.index.score(previous, country)
+                self.assertEqual(self.index.search(query, country, candidates=candidates),
+                                 self.index.search(query, country), (query, country))
+
+    def test_search_companies_ignores_stale_candidates(self):
+        """Candidates found before the index changed are not taken as positions of the changed index."""
+        candidates, _ = self.index.score("vaccines")
+        version = self.index.version
+        companies, positions, found_version = self.index.search_companies("vaccines", candidates=candidates,
+                                                                          version=version)
+        self.assertEqual([c["id"] for c in companies], ["2"])
+        self.assertEqual((positions.tolist(), found_version), (candidates.tolist(), version))
+
+        with patch.object(company_index, "MERGE_RATIO", 0.0):
+            self.index.remove(["1"])
+        companies, positions, found_version = self.index.search_companies("vaccines", candidates=candidates,
+                                                                          version=version)
+        self.assertEqual([c["id"] for c in companies], ["2"])
+        self.assertEqual((positions.tolist(), found_version), ([0], self.index.version))
+
+    def test_updates_score_like_a_rebuilt_index(self):
+        """Upserts and removals give the same results as building the index from scratch."""
+        updated = dict(COMPANIES[1], description="Vaccines only")
+        added = {"id": "5", "name": "Generic Vaccines", "country": "France", "sector": "Vaccines"}
+        expected = CompanyIndex([COMPANIES[0], COMPANIES[2], updated, added])
+
+        for merge_ratio in (10.0, 0.0):
+            with patch.object(company_index, "MERGE_RATIO", merge_ratio):
+                index = CompanyIndex(COMPANIES)
+                index.upsert([updated, added])
+                index.remove(["4", "unknown"])
+            self.assertEqual(len(index), 4)
+            for query in ["generic", "vaccines", "vacc", "bio", "generic vaccines"]:
+                for country in [None, "France"]:
+                    found = [(index.companies[p]["id"], round(s, 9)) for p, s in index.search(query, country)]
+                    want = [(expected.companies[p]["id"], round(s, 9)) for p, s in expected.search(query, country)]
+                    self.assertEqual(sorted(found), sorted(want), (query, country, merge_ratio))
+
+    def test_similar_companies_follow_updates(self):
+        """Misspelled names match by trigram similarity in both segments, without removed companies."""
+        self.assertEqual([c["id"] for c in self.index.similar_companies("Biogenics")], ["3"])
+        with patch.object(company_index, "MERGE_RATIO", 10.0):
+            self.index.upsert([{"id": "5", "name": "BioGenica", "country": "France"}])
+            self.index.remove(["3"])
+        self.assertEqual([c["id"] for c in self.index.similar_companies("Biogenics")], ["5"])
+        self.assertEqual(self.index.similar_companies("Biogenics", country="Germany"), [])
+
+        self.index._merge()
+        self.assertEqual([c["id"] for c in self.index.similar_companies("Biogenics")], ["5"])
+
+
+class TestCompanySearch(unittest.TestCase):
+    """Test cases for the company search service and its change tracking."""
+
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine, tables=[Company.__table__])
+        self.session_factory = sessionmaker(bind=engine)
+        data_version.track_session_changes(self.session_factory)
+        search.track_company_changes(self.session_factory)
+
+    def tearDown(self):
+        search._company_search_index = None
+        search._company_search_version = None
+
+    def use_index(self, companies):
+        search._company_search_index = CompanyIndex(companies)
+        search._company_search_version = data_version.get_version(data_version.COMPANY)
+
+    def test_committed_changes_are_indexed(self):
+        """Committed company inserts and updates reach the index without a rebuild; rolled back ones don't."""
+        self.use_index(COMPANIES)
+        db = self.session_factory()
+        company = Company(name="Zentiva Generics", country="Czechia", sector="Generic Medications")
+        db.add(company)
+        db.commit()
+        self.assertEqual(search.get_company_search_index(db).search("zentiva"), [(4, unittest.mock.ANY)])
+
+        company.name = "Zentiva"
+        db.add(Company(name="Zentiva Labs", country="Czechia"))
+        db.flush()
+        db.rollback()
+        self.assertEqual(len(search.get_company_search_index(db).search("zentiva")), 1)
+
+        company = db.get(Company, company.id)
+        company.name = "Sandoz"
+        db.commit()
+        self.assertEqual(search.get_company_search_index(db).search("zentiva"), [])
+        self.assertEqual(len(search.get_company_search_index(db).search("sandoz")), 1)
+        # Misspelled names are looked up in the same index
+        self.assertEqual([c["name"] for c in search.search_companies(db, "Sandos")], ["Sandoz"])
+        db.close()
+
+    def test_rebuilt_when_company_data_changes_otherwise(self):
+        """The index is rebuilt when the company data version moves without a tracked commit."""
+        self.use_index(COMPANIES)
+        index = search._company_search_index
+        db = self.session_factory()
+        # A tracked commit bumps the company data version and is applied without a rebuild
+        db.add(Company(name="Zentiva Generics", country="Czechia"))
+        db.commit()
+        self.assertIs(search.get_company_search_index(db), index)
+        self.assertEqual(len(index), 5)
+
+        data_version.bump(data_version.COMPANY)
+        rebuilt = search.get_company_search_index(db)
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(len(rebuilt), len(search._load_companies(db)))
+        db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
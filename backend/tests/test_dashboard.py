@@ -0,0 +1,414 @@
+"""
+Tests for the dashboard service.
+"""
+import os
+import tempfile
+import unittest
+import uuid
+from datetime import date
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core import data_version
+from app.db.base import Base
+from app.db.trade_aggregates import trade_monthly
+from app.models.company import Company
+from app.models.contact import Contact
+from app.models.country import Country
+from app.models.license import License
+from app.models.product import Product  # noqa: F401 - referenced by transactions
+from app.models.region import Region
+from app.models.transaction import Transaction
+from app.services import dashboard, geography, trade_cube
+from app.services.growth_table import GrowthTable
+from app.services.trade_cube import TradeCube, set_trade_cube
+from app.services.trade_series import TOTAL_DIMENSIONS, TradeSeries
+
+
+def create_trade_session():
+    """Create an in-memory SQLite session with the trade tables and monthly aggregate."""
+    engine = create_engine("sqlite:///:memory:")
+    # The product table uses a PostgreSQL ARRAY column, so it is left out here
+    tables = [Region.__table__, Country.__table__, Company.__table__, Contact.__table__, License.__table__,
+              Transaction.__table__]
+    Base.metadata.create_all(bind=engine, tables=tables)
+    trade_monthly.create(bind=engine)
+    db = sessionmaker(bind=engine)()
+    geography._index_cache.clear()
+    geography.seed_geography(db)
+    return db
+
+
+# Company and product IDs of the monthly trade rows
+COMPANY_A, COMPANY_B = str(uuid.uuid4()), str(uuid.uuid4())
+PRODUCT_A, PRODUCT_B = str(uuid.uuid4()), str(uuid.uuid4())
+
+
+def monthly_trade_rows():
+    """Monthly export values: Germany grows 50% year over year, India starts in 2024."""
+    rows = []
+    for month in range(1, 13):
+        rows.append(dict(bucket=date(2023, month, 1), source_country="Germany", destination_country="France",
+                         product_type="API", company=COMPANY_A, product=PRODUCT_A, flow_type="export",
+                         value=1e9, qty=10))
+        rows.append(dict(bucket=date(2024, month, 1), source_country="Germany", destination_country="France",
+                         product_type="API", company=COMPANY_A, product=PRODUCT_A, flow_type="export",
+                         value=1.5e9, qty=10))
+        rows.append(dict(bucket=date(2024, month, 1), source_country="India", destination_country="Brazil",
+                         product_type="FDF", company=COMPANY_B, product=PRODUCT_B, flow_type="export",
+                         value=0.5e9, qty=10))
+    return rows
+
+
+def build_cube():
+    """Build a trade cube from the monthly trade rows."""
+    records = [
+        (r["bucket"], r["source_country"], r["destination_country"], r["product_type"], r["company"],
+         r["product"], r["flow_type"], r["value"], r["qty"])
+        for r in monthly_trade_rows()
+    ]
+    labels = {
+        "company": {COMPANY_A: {"name": "MedCore", "country": "Germany"},
+                    COMPANY_B: {"name": "IndoPharm", "country": "India"}},
+        "product": {PRODUCT_A: {"name": "Paracetamol", "category": "Analgesic"},
+                    PRODUCT_B: {"name": "Metformin", "category": "Diabetes"}},
+    }
+    return TradeCube.from_records(records, labels)
+
+
+class TestMarketTrendsFromAggregates(unittest.TestCase):
+    """Test cases for market trends computed from the monthly trade aggregate."""
+
+    def setUp(self):
+        self.db = create_trade_session()
+        country_ids = geography.resolve_country_ids(self.db, ["Germany", "France", "India", "Brazil"])
+        rows = [
+            dict(bucket=row["bucket"], source_country_id=country_ids[row["source_country"]],
+                 destination_country_id=country_ids[row["destination_country"]], product_type=row["product_type"],
+                 flow_type=row["flow_type"], value=row["value"], qty=row["qty"], transactions=1)
+            for row in monthly_trade_rows()
+        ]
+        self.db.execute(insert(trade_monthly), rows)
+
+        for row in monthly_trade_rows():
+            self.db.add(Transaction(
+                year=row["bucket"].year, month=row["bucket"].month, value=row["value"], qty=row["qty"],
+                flow_type=row["flow_type"], product_type=row["product_type"],
+                source_country_id=country_ids[row["source_country"]],
+                destination_country_id=country_ids[row["destination_country"]],
+                company_id=uuid.UUID(row["company"]), product_id=uuid.UUID(row["product"]),
+            ))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    @patch("app.services.dashboard.settings.USE_MOCK_DATA", False)
+    def test_trends(self):
+        """Totals, changes, regional breakdown and monthly trends come from the aggregate."""
+        result = dashboard.get_market_trends(self.db, time_period="12m")
+
+        self.assertEqual(result["global_trade_volume"]["value"], 24.0)
+        self.assertEqual(result["global_trade_volume"]["change"], 100.0)
+        self.assertEqual(result["active_products"], {"value": 2, "change": 1, "trend": "up"})
+        self.assertEqual(result["export_companies"]["value"], 2)
+        self.assertEqual(result["active_markets"], {"value": 2, "change": 1, "trend": "up"})
+
+        regions = {r["name"]: r for r in result["regional_breakdown"]}
+        self.assertEqual(regions["Europe"]["volume"], 18.0)
+        self.assertEqual(regions["Europe"]["growth"], 50.0)
+        self.assertEqual(regions["Asia Pacific"]["volume"], 6.0)
+
+        self.assertEqual(len(result["monthly_trends"]), 12)
+        self.assertEqual(result["monthly_trends"][0], {"month": "Jan", "value": 2.0, "color": "bg-accent"})
+
+    @patch("app.services.dashboard.settings.USE_MOCK_DATA", False)
+    def test_filters(self):
+        """Product type, region and time period filters restrict the aggregate."""
+        result = dashboard.get_market_trends(self.db, product_type="api", region="europe", time_period="3m")
+
+        self.assertEqual(result["global_trade_volume"]["value"], 4.5)
+        self.assertEqual([r["name"] for r in result["regional_breakdown"]], ["Europe"])
+        self.assertEqual([m["month"] for m in result["monthly_trends"]], ["Oct", "Nov", "Dec"])
+
+    @patch("app.services.dashboard.settings.USE_MOCK_DATA", False)
+    def test_max_points(self):
+        """Monthly trends longer than max_points are downsampled, keeping the first and last month."""
+        result = dashboard.get_market_trends(self.db, time_period="2y", max_points=6)
+        full = dashboard.get_market_trends(self.db, time_period="2y")
+
+        self.assertEqual(len(result["monthly_trends"]), 6)
+        self.assertEqual(result["monthly_trends"][0], full["monthly_trends"][0])
+        self.assertEqual(result["monthly_trends"][-1], full["monthly_trends"][-1])
+        self.assertEqual(result["global_trade_volume"], full["global_trade_volume"])
+
+
+class TestDashboardFromCube(unittest.TestCase):
+    """Test cases for dashboard data computed from the trade cube."""
+
+    def setUp(self):
+        set_trade_cube(build_cube())
+
+    def tearDown(self):
+        set_trade_cube(None)
+
+    @patch("app.services.dashboard.settings.USE_MOCK_DATA", False)
+    def test_trends_match_aggregates(self):
+        """The cube gives the same market trends as the monthly aggregate."""
+        aggregates = TestMarketTrendsFromAggregates()
+        aggregates.setUp()
+        try:
+            for kwargs in ({"time_period": "12m"}, {"product_type": "api", "region": "europe", "time_period": "3m"},
+                           {"region": "asia", "time_period": "2y"}):
+                with patch("app.services.dashboard.get_trade_cube", return_value=None):
+                    expected = dashboard.get_market_trends(aggregates.db, **kwargs)
+                self.assertEqual(dashboard.get_market_trends(None, **kwargs), expected)
+        finally:
+            aggregates.tearDown()
+
+    @patch("app.services.dashboard.settings.USE_MOCK_DATA", False)
+    def test_top_exporters(self):
+        """Exporters are ranked by export value with share and growth."""
+        exporters = dashboard.get_top_exporters(None, limit=5)
+
+        self.assertEqual([e["company"] for e in exporters], ["MedCore", "IndoPharm"])
+        self.assertEqual(exporters[0], {
+            "rank": 1, "company": "MedCore", "country": "Germany", "volume": "$18B",
+            "marketShare": 75.0, "growth": "+50.0%", "products": ["Analgesic"],
+        })
+        self.assertEqual(exporters[1]["growth"], "N/A")
+
+        self.assertEqual([e["company"] for e in dashboard.get_top_exporters(None, region="asia")], ["IndoPharm"])
+        self.assertEqual(dashboard.get_top_exporters(None, product_type="Excipients"), [])
+
+    @patch("app.services.dashboard.settings.USE_MOCK_DATA", False)
+    def test_top_products(self):
+        """Products are ranked by export value."""
+        products = dashboard.get_top_products(None, limit=1)
+
+        self.assertEqual(products, [
+            {"rank": 1, "name": "Paracetamol", "category": "Analgesic", "volume": "$18B", "volumeError": "$0",
+             "growth": "+50.0%"},
+        ])
+
+
+class TestRankings(unittest.TestCase):
+    """Test cases for the materialized exporter and product rankings."""
+
+    def setUp(self):
+        self.cube = build_cube()
+        set_trade_cube(self.cube)
+        dashboard.refresh_rankings(self.cube)
+
+    def tearDown(self):
+        set_trade_cube(None)
+
+    def test_all_slices_are_materialized(self):
+        """Every region, product type and time period slice is ranked up front."""
+        slices = dashboard._ranking_slices(self.cube)
+        self.assertEqual(set(dashboard._rankings), set(slices))
+
+        ranking = dashboard._rankings[("company", "all", "all", 12)]
+        self.assertEqual([self.cube.dictionaries["company"][c] for c in ranking.codes], [COMPANY_A, COMPANY_B])
+        self.assertEqual(ranking.total, 24e9)
+
+    def test_incremental_refresh(self):
+        """Only slices containing the new transactions' countries and product types are recomputed."""
+        before = dict(dashboard._rankings)
+        cube = self.cube.append(
+            [(date(2024, 12, 1), "Japan", "France", "API", COMPANY_B, PRODUCT_B, "export", 30e9, 5)]
+        )
+        set_trade_cube(cube)
+        dashboard.refresh_rankings(cube, {"Japan"}, {"API"})
+
+        self.assertIs(dashboard._rankings[("company", "all", "europe", 12)], before[("company", "all", "europe", 12)])
+        self.assertIs(dashboard._rankings[("company", "fdf", "all", 12)], before[("company", "fdf", "all", 12)])
+        self.assertIsNot(dashboard._rankings[("company", "api", "asia", 1)], before[("company", "api", "asia", 1)])
+
+        with patch("app.services.dashboard.settings.USE_MOCK_DATA", False):
+            exporters = dashboard.get_top_exporters(None, limit=1, time_period="1m")
+        self.assertEqual(exporters[0]["company"], "IndoPharm")
+        self.assertEqual(exporters[0]["products"], ["Diabetes"])
+
+    @patch("app.services.dashboard.settings.USE_MOCK_DATA", False)
+    def test_product_filters(self):
+        """Top products can be filtered by product type and time period."""
+        products = dashboard.get_top_products(None, product_type="FDF", time_period="3m")
+        self.assertEqual([p["name"] for p in products], ["Metformin"])
+        self.assertEqual(products[0]["volume"], "$1.5B")
+
+
+class TestDashboardSnapshot(unittest.TestCase):
+    """Test cases for the combined dashboard snapshot."""
+
+    def test_snapshot_combines_dashboard_data(self):
+        """The snapshot holds the trends, top exporters and top products of one filter combination."""
+        snapshot = dashboard.get_dashboard_snapshot(None, region="Europe", exporters_limit=2, products_limit=3)
+
+        self.assertEqual(snapshot["global_trade_volume"], dashboard.MOCK_MARKET_TRENDS["global_trade_volume"])
+        self.assertEqual([r["name"] for r in snapshot["regional_breakdown"]], ["Europe"])
+        self.assertEqual(len(snapshot["monthly_trends"]), 12)
+        self.assertEqual([e["country"] for e in snapshot["top_exporters"]], ["Switzerland", "Switzerland"])
+        self.assertEqual(len(snapshot["top_products"]), 3)
+
+    @patch("app.services.dashboard.settings.USE_MOCK_DATA", False)
+    def test_snapshot_from_one_cube_slice(self):
+        """With a trade cube, the shared slice gives the same sections as the separate endpoints."""
+        cube = build_cube()
+        set_trade_cube(cube)
+        dashboard.refresh_rankings(cube)
+        try:
+            for kwargs in ({}, {"product_type": "api", "region": "europe", "time_period": "3m"},
+                           {"region": "asia", "time_period": "2y"}, {"product_type": "Excipients"}):
+                with patch.object(cube, "rows", wraps=cube.rows) as rows:
+                    snapshot = dashboard.get_dashboard_snapshot(None, **kwargs)
+                self.assertEqual(rows.call_count, 1)
+
+                expected = dashboard.get_market_trends(None, **kwargs)
+                expected["top_exporters"] = dashboard.get_top_exporters(None, **kwargs)
+                expected["top_products"] = dashboard.get_top_products(None, **kwargs)
+                self.assertEqual(snapshot, expected)
+        finally:
+            set_trade_cube(None)
+
+
+class TestTradeCube(unittest.TestCase):
+    """Test cases for the trade cube itself."""
+
+    def test_append_replaces_trailing_months(self):
+        """Appending from a month replaces that month onwards and keeps dimension codes stable."""
+        cube = build_cube()
+        company_code = cube.encode("company", [COMPANY_A])[0]
+
+        refreshed = cube.append(
+            [(date(2024, 12, 1), "Japan", "France", "API", COMPANY_A, PRODUCT_A, "export", 2e9, 5)],
+            since=date(2024, 12, 1),
+        )
+
+        self.assertEqual(len(refreshed), len(cube) - 2 + 1)
+        self.assertEqual(refreshed.encode("company", [COMPANY_A])[0], company_code)
+        december = refreshed.rows(date(2024, 12, 1), date(2025, 1, 1))
+        self.assertEqual(refreshed.measures["value"][december].tolist(), [2e9])
+        # The original cube is unchanged
+        self.assertEqual(len(cube.rows(date(2024, 12, 1), date(2025, 1, 1))), 2)
+
+    def test_save_and_load(self):
+        """A saved cube is memory-mapped back with the same rows and dictionaries."""
+        cube = build_cube()
+        with tempfile.TemporaryDirectory() as directory:
+            first = cube.save(directory)
+            second = cube.save(directory)
+            third = cube.append([], since=date(2024, 1, 1)).save(directory)
+            loaded = TradeCube.load(directory)
+
+            self.assertEqual(len(loaded), 12)
+            self.assertEqual(loaded.dictionaries, cube.dictionaries)
+            self.assertEqual(loaded.labels, cube.labels)
+            # The previous generation is kept for processes still switching from it
+            self.assertEqual(sorted(os.listdir(directory)), sorted(["CURRENT", second, third]))
+            self.assertNotIn(first, os.listdir(directory))
+
+        self.assertIsNone(TradeCube.load(os.path.join(directory, "missing")))
+
+    def test_new_generations_are_remapped(self):
+        """A cube saved by another process replaces the one in use on the next access."""
+        cube = build_cube()
+        with tempfile.TemporaryDirectory() as directory, patch.object(trade_cube.settings, "TRADE_CUBE_DIR", directory):
+            try:
+                set_trade_cube(cube, cube.save(directory))
+                self.assertIs(trade_cube.get_trade_cube(), cube)
+
+                # Another process saves a cube with one more month
+                cube.append(
+                    [(date(2025, 1, 1), "Japan", "France", "API", COMPANY_A, PRODUCT_A, "export", 1e9, 1)],
+                    since=date(2025, 1, 1),
+                ).save(directory)
+                version = data_version.get_version(data_version.TRADE)
+                remapped = trade_cube.get_trade_cube()
+                self.assertIsNot(remapped, cube)
+                self.assertNotEqual(data_version.get_version(data_version.TRADE), version)
+                self.assertEqual(len(remapped), len(cube) + 1)
+                self.assertIs(trade_cube.get_trade_cube(), remapped)
+
+                # A cube set without a generation is kept regardless of the files
+                set_trade_cube(None)
+                cube.save(directory)
+                self.assertIsNone(trade_cube.get_trade_cube())
+            finally:
+                set_trade_cube(None)
+
+
+class TestTradeSeries(unittest.TestCase):
+    """Test cases for the cumulative trade series."""
+
+    def setUp(self):
+        self.cube = build_cube()
+        self.series = TradeSeries.from_cube(self.cube)
+
+    def test_window_matches_cube_rows(self):
+        """Window totals equal the sum of the cube's rows for every time period."""
+        for months in dashboard.TIME_PERIOD_MONTHS.values():
+            start = dashboard._add_months(date(2025, 1, 1), -months)
+            previous_start = dashboard._add_months(start, -months)
+            selected = self.series.select(region=["Europe"], flow_type=["export"])
+
+            current, previous = self.series.window_sum(selected, start, months)
+
+            rows = self.cube.rows(start, date(2025, 1, 1), source_country=["Germany"])
+            previous_rows = self.cube.rows(previous_start, start, source_country=["Germany"])
+            self.assertAlmostEqual(current, self.cube.measures["value"][rows].sum())
+            self.assertAlmostEqual(previous, self.cube.measures["value"][previous_rows].sum())
+
+    def test_grouped_and_rolled_up(self):
+        """Sums group by company, and the rollup without companies keeps the totals."""
+        company_a, company_b = self.cube.encode("company", [COMPANY_A, COMPANY_B])
+        current, previous = self.series.window_sum(self.series.select(), date(2024, 1, 1), 12, by="company")
+        self.assertEqual((current[company_a], previous[company_a]), (18e9, 12e9))
+        self.assertEqual((current[company_b], previous[company_b]), (6e9, 0.0))
+
+        totals = self.series.rollup(TOTAL_DIMENSIONS)
+        self.assertEqual(len(totals), 2)
+        months = totals.month_sum(totals.select(product_type=["api"]), date(2023, 11, 1), 4)
+        self.assertEqual(months.tolist(), [1e9, 1e9, 1.5e9, 1.5e9])
+
+
+class TestGrowthTable(unittest.TestCase):
+    """Test cases for the growth table."""
+
+    def setUp(self):
+        self.table = GrowthTable.from_cube(build_cube())
+
+    def test_yearly_history(self):
+        """Yearly values and year-over-year growth per company, latest year first."""
+        self.assertEqual(self.table.yearly_history("company", COMPANY_A), [
+            {"year": 2024, "volumeUsd": 18e9, "growthRatio": 0.5},
+            {"year": 2023, "volumeUsd": 12e9, "growthRatio": None},
+        ])
+        self.assertEqual(self.table.yearly_history("company", "missing"), [])
+
+    def test_window_growth(self):
+        """Window growth compares the latest months with the months before, for every entity kind."""
+        self.assertAlmostEqual(self.table.window_growth("exporter", COMPANY_A, 12), 0.5)
+        self.assertAlmostEqual(self.table.window_growth("product", PRODUCT_A, 3), 0.0)
+        self.assertIsNone(self.table.window_growth("product", PRODUCT_B, 12))
+        self.assertAlmostEqual(self.table.window_growth("region", "Europe", 12), 0.5)
+        self.assertAlmostEqual(self.table.window_growth("lane", ("Germany", "France"), 12), 0.5)
+        self.assertIsNone(self.table.window_growth("lane", ("India", "Brazil"), 12))
+        self.assertIsNone(self.table.window_growth("lane", ("Germany", "France"), 24))
+
+    def test_no_window_growth_before_the_first_month(self):
+        """Windows whose window before is not fully covered by the cube have no growth."""
+        table = GrowthTable.from_cube(TradeCube.from_records([
+            (r["bucket"], r["source_country"], r["destination_country"], r["product_type"], r["company"],
+             r["product"], r["flow_type"], r["value"], r["qty"])
+            for r in monthly_trade_rows() if r["bucket"] >= date(2023, 7, 1)
+        ]))
+        self.assertIsNone(table.window_growth("exporter", COMPANY_A, 12))
+        self.assertEqual(table.window_growth("exporter", COMPANY_A, 6),
+                         self.table.window_growth("exporter", COMPANY_A, 6))
+
+
+if __name__ == '__main__':
+    unittest.main()
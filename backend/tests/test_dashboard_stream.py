@@ -0,0 +1,172 @@
+"""
+Tests for the dashboard stream service.
+"""
+import asyncio
+import json
+import threading
+import unittest
+
+from app.core import data_version
+from app.services.dashboard_stream import DashboardBroadcaster, snapshot_delta
+
+
+def parse_event(text):
+    """Split a Server-Sent Event into its name and decoded data."""
+    lines = dict(line.split(": ", 1) for line in text.strip().split("\n"))
+    return lines["event"], json.loads(lines["data"])
+
+
+class TestSnapshotDelta(unittest.TestCase):
+    """Test cases for snapshot deltas."""
+
+    def test_only_changes_are_sent(self):
+        """Unchanged fields and list positions are left out."""
+        previous = {
+            "active_markets": {"value": 10},
+            "active_products": {"value": 5},
+            "top_exporters": [{"company": "A"}, {"company": "B"}],
+            "monthly_trends": [{"month": "Jan", "value": 1}],
+        }
+        current = {
+            "active_markets": {"value": 11},
+            "active_products": {"value": 5},
+            "top_exporters": [{"company": "B"}, {"company": "A"}],
+            "monthly_trends": [{"month": "Jan", "value": 1}, {"month": "Feb", "value": 2}],
+        }
+
+        self.assertEqual(snapshot_delta(previous, current), {
+            "active_markets": {"value": 11},
+            "top_exporters": {"length": 2, "items": {"0": {"company": "B"}, "1": {"company": "A"}}},
+            "monthly_trends": {"length": 2, "items": {"1": {"month": "Feb", "value": 2}}},
+        })
+        self.assertEqual(snapshot_delta(current, current), {})
+
+
+class TestDashboardBroadcaster(unittest.TestCase):
+    """Test cases for broadcasting dashboard deltas."""
+
+    def setUp(self):
+        self.volume = 1
+        self.computed = []
+        # When set, snapshots are computed once the test sets the event
+        self.gate = None
+
+        def compute_snapshot(filters):
+            self.computed.append(filters)
+            if self.gate is not None:
+                self.gate.wait(timeout=1)
+            if self.volume is None:
+                raise RuntimeError("snapshot failed")
+            return {"global_trade_volume": {"value": self.volume}, "region": filters["region"]}
+
+        self.broadcaster = DashboardBroadcaster(compute_snapshot)
+
+    def tearDown(self):
+        data_version.remove_listener(self.broadcaster._on_data_change)
+
+    def test_delta_is_computed_once_per_channel(self):
+        """Subscribers with the same filters share one recomputation and receive the same delta."""
+        async def scenario():
+            europe = {"product_type": None, "region": "Europe", "time_period": "12m"}
+            key_a, queue_a, snapshot_a = await self.broadcaster.subscribe(europe)
+            key_b, queue_b, snapshot_b = await self.broadcaster.subscribe(dict(europe, region="europe"))
+            self.assertEqual(key_a, key_b)
+            self.assertEqual(snapshot_a, snapshot_b)
+            self.assertEqual(len(self.computed), 1)
+
+            self.volume = 2
+            data_version.bump(data_version.TRADE)
+            event_a = await asyncio.wait_for(queue_a.get(), timeout=1)
+            event_b = await asyncio.wait_for(queue_b.get(), timeout=1)
+            self.assertIs(event_a, event_b)
+            self.assertEqual(len(self.computed), 2)
+            return event_a
+
+        name, data = parse_event(asyncio.run(scenario()))
+        self.assertEqual(name, "delta")
+        self.assertEqual(data, {"global_trade_volume": {"value": 2}})
+
+    def test_stale_subscribe_sends_delta_to_existing_subscribers(self):
+        """A subscriber joining after a change pushes the delta to the others, and it is sent only once."""
+        async def scenario():
+            europe = {"product_type": None, "region": "Europe", "time_period": "12m"}
+            _, queue_a, _ = await self.broadcaster.subscribe(europe)
+
+            self.volume = 2
+            data_version.bump(data_version.TRADE)
+            _, queue_b, snapshot_b = await self.broadcaster.subscribe(europe)
+            self.assertEqual(snapshot_b["global_trade_volume"], {"value": 2})
+            event = await asyncio.wait_for(queue_a.get(), timeout=1)
+
+            # Overlapping refreshes run one after the other and find the snapshot current
+            await asyncio.gather(self.broadcaster.refresh(), self.broadcaster.refresh())
+            self.assertTrue(queue_a.empty())
+            self.assertTrue(queue_b.empty())
+            self.assertEqual(len(self.computed), 2)
+            return event
+
+        name, data = parse_event(asyncio.run(scenario()))
+        self.assertEqual(name, "delta")
+        self.assertEqual(data, {"global_trade_volume": {"value": 2}})
+
+    def test_unsubscribe_during_subscribe_keeps_the_channel(self):
+        """A subscriber joining while the last other subscriber leaves still receives deltas."""
+        async def scenario():
+            europe = {"product_type": None, "region": "Europe", "time_period": "12m"}
+            key, queue_a, _ = await self.broadcaster.subscribe(europe)
+
+            self.volume = 2
+            data_version.bump(data_version.TRADE)
+            self.gate = threading.Event()
+            subscribing = asyncio.ensure_future(self.broadcaster.subscribe(europe))
+            while len(self.computed) < 2:
+                await asyncio.sleep(0.01)
+            self.broadcaster.unsubscribe(key, queue_a)
+            self.gate.set()
+            self.gate = None
+            _, queue_b, _ = await subscribing
+            self.assertIn(key, self.broadcaster._channels)
+
+            self.volume = 3
+            data_version.bump(data_version.TRADE)
+            return await asyncio.wait_for(queue_b.get(), timeout=1)
+
+        name, data = parse_event(asyncio.run(scenario()))
+        self.assertEqual(name, "delta")
+        self.assertEqual(data, {"global_trade_volume": {"value": 3}})
+
+    def test_failed_subscribe_drops_its_channel(self):
+        """A channel created for a subscriber whose first snapshot fails is removed."""
+        async def scenario():
+            self.volume = None
+            with self.assertRaises(RuntimeError):
+                await self.broadcaster.subscribe({"region": "Africa"})
+            self.assertEqual(self.broadcaster._channels, {})
+
+        asyncio.run(scenario())
+
+    def test_stream_starts_with_snapshot_and_unsubscribes(self):
+        """The event stream sends the snapshot first and leaves its channel on disconnect."""
+        async def scenario():
+            disconnected = False
+
+            async def is_disconnected():
+                return disconnected
+
+            stream = self.broadcaster.events({"region": "Africa"}, is_disconnected)
+            first = await stream.__anext__()
+            self.assertEqual(len(self.broadcaster._channels), 1)
+
+            disconnected = True
+            with self.assertRaises(StopAsyncIteration):
+                await stream.__anext__()
+            self.assertEqual(self.broadcaster._channels, {})
+            return first
+
+        name, data = parse_event(asyncio.run(scenario()))
+        self.assertEqual(name, "snapshot")
+        self.assertEqual(data["region"], "Africa")
+
+
+if __name__ == '__main__':
+    unittest.main()
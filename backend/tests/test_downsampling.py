@@ -0,0 +1,46 @@
+"""
+Tests for time series downsampling.
+"""
+import unittest
+
+import numpy as np
+
+from app.core.downsampling import lttb
+
+
+class TestLTTB(unittest.TestCase):
+    """Test cases for Largest-Triangle-Three-Buckets downsampling."""
+
+    def test_short_series_is_kept(self):
+        """A series no longer than max_points keeps every point."""
+        self.assertEqual(lttb(np.arange(5), [1, 2, 3, 4, 5], 5).tolist(), [0, 1, 2, 3, 4])
+
+    def test_keeps_endpoints_and_extremes(self):
+        """The first and last points and the spikes of the series are kept."""
+        y = np.zeros(100)
+        y[37], y[71] = 50.0, -40.0
+        kept = lttb(np.arange(100), y, 10)
+
+        self.assertEqual(len(kept), 10)
+        self.assertEqual(kept[0], 0)
+        self.assertEqual(kept[-1], 99)
+        self.assertIn(37, kept)
+        self.assertIn(71, kept)
+        self.assertTrue(np.all(np.diff(kept) > 0))
+
+    def test_one_point_per_bucket(self):
+        """Each point between the endpoints comes from its own bucket."""
+        rng = np.random.default_rng(1)
+        kept = lttb(np.arange(1000), rng.normal(size=1000), 50)
+        bounds = np.floor(np.linspace(1, 999, 49)).astype(int)
+
+        self.assertEqual(np.searchsorted(bounds, kept[1:-1], side="right").tolist(), list(range(1, 49)))
+
+    def test_rejects_too_few_points(self):
+        """At least the two endpoints and one bucket must be kept."""
+        with self.assertRaises(ValueError):
+            lttb(np.arange(10), np.arange(10), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Tests for the entity resolution service.
+"""
+import unittest
+from unittest.mock import patch
+
+from app.services import entity_resolution
+from app.services.entity_resolution import (
+    normalize_domain,
+    name_tokens,
+    normalize_country,
+    blocking_keys,
+    merge_prospects
+)
+
+
+class TestEntityResolution(unittest.TestCase):
+    """Test cases for the entity resolution service."""
+
+    def test_normalization(self):
+        """Test domain, name and country normalization."""
+        self.assertEqual(normalize_domain("https://www.MedCore.com/about"), "medcore.com")
+        self.assertEqual(normalize_domain("medcore.com:8080"), "medcore.com")
+        self.assertIsNone(normalize_domain(""))
+
+        self.assertEqual(name_tokens("MedCore Pharmaceuticals GmbH"), ("medcore", "pharma"))
+        self.assertEqual(name_tokens("The Pharma Solutions Inc."), ("pharma", "solutions"))
+        self.assertEqual(name_tokens("Vita7 Pharma S.A."), ("vita7", "pharma"))
+        self.assertEqual(name_tokens("Sana S.p.A."), ("sana",))
+
+        self.assertEqual(normalize_country("Berlin, Germany"), "germany")
+        self.assertEqual(normalize_country("USA"), "united states")
+
+    def test_blocking_keys(self):
+        """Test that blocking keys combine domain, name token and country."""
+        keys = blocking_keys({"name": "MedCore Pharma AG", "location": "Berlin, Germany", "website": "www.medcore.de"})
+        self.assertEqual(keys, {("domain", "medcore.de"), ("name", "medcore", "germany")})
+
+        # Names as similar as the threshold share one of their rarest tokens
+        counts = {"pharma": 10, "global": 5, "health": 3, "networks": 2}
+        keys = blocking_keys({"name": "Global Health Networks Pharma", "location": "India"}, counts)
+        self.assertEqual(keys, {("name", "networks", "india"), ("name", "health", "india")})
+
+    def test_dotted_legal_suffixes_do_not_match(self):
+        """Different companies sharing an industry word and a dotted legal form stay separate."""
+        known = [{"id": "1", "name": "New5 Pharma S.A.", "location": "Spain"}]
+        merged = merge_prospects(known, [{"id": "research-1", "name": "Vita7 Pharma S.A.", "location": "Spain"}])
+        self.assertEqual([p["id"] for p in merged], ["1", "research-1"])
+
+    def test_word_order_and_block_size(self):
+        """Names in another word order are found, and oversized blocks are not compared in full."""
+        known = [{"id": str(i), "name": f"Pharma Unit {i}", "location": "Germany"} for i in range(5)]
+        known.append({"id": "medcore", "name": "Pharma MedCore", "location": "Germany"})
+        merged = merge_prospects(known, [{"id": "research-1", "name": "MedCore Pharma GmbH", "location": "Germany"}])
+        self.assertEqual(len(merged), 6)
+        self.assertEqual(merged[5]["mergedIds"], ["research-1"])
+
+        known = [{"id": str(i), "name": "Acme Labs", "location": "Germany"} for i in range(10)]
+        with patch.object(entity_resolution, "MAX_BLOCK_SIZE", 3), \
+                patch.object(entity_resolution, "_similarity", wraps=entity_resolution._similarity) as similarity:
+            merged = merge_prospects(known, [{"id": "research-1", "name": "Acme Labs", "location": "Germany"}])
+        self.assertEqual(similarity.call_count, 3)
+        self.assertEqual(len(merged), 10)
+
+    def test_merge_prospects(self):
+        """Test that duplicates are merged into the known prospect."""
+        known = [
+            {"id": "1", "name": "MedCore Pharmaceuticals", "location": "Berlin, Germany", "opportunityScore": 92},
+            {"id": "2", "name": "Pharma Solutions Inc.", "location": "Toronto, Canada", "opportunityScore": 70},
+        ]
+        incoming = [
+            {"id": "research-1", "name": "MedCore Pharma GmbH", "location": "Germany",
+             "website": "https://medcore.example.com", "opportunityScore": 75},
+            {"id": "research-2", "name": "Pharma Solutions Inc.", "location": "USA", "opportunityScore": 75},
+            {"id": "research-3", "name": "Medcore", "location": "Germany",
+             "website": "https://www.medcore.example.com", "opportunityScore": 75},
+        ]
+
+        merged = merge_prospects(known, incoming)
+
+        self.assertEqual([p["id"] for p in merged], ["1", "2", "research-2"])
+        self.assertEqual(merged[0]["website"], "https://medcore.example.com")
+        self.assertEqual(merged[0]["mergedIds"], ["research-1", "research-3"])
+        self.assertEqual(merged[0]["opportunityScore"], 92)
+
+        # Inputs are left untouched
+        self.assertNotIn("website", known[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Tests for numeric feature parsing and display formatting.
+"""
+import unittest
+from datetime import datetime, timedelta
+
+from app.core import features
+
+
+class TestFeatures(unittest.TestCase):
+    """Test cases for the feature parsing and formatting functions."""
+
+    def test_usd_amounts(self):
+        """Test parsing and formatting USD amounts."""
+        self.assertEqual(features.parse_usd_amount("$2.4B"), 2.4e9)
+        self.assertEqual(features.parse_usd_amount("$180M"), 180e6)
+        self.assertEqual(features.parse_usd_amount("$1,250"), 1250)
+        self.assertIsNone(features.parse_usd_amount("unknown"))
+
+        self.assertEqual(features.format_usd(2.4e9), "$2.4B")
+        self.assertEqual(features.format_usd(180e6), "$180M")
+        self.assertEqual(features.format_usd(None), "N/A")
+
+    def test_employee_ranges(self):
+        """Test parsing and formatting employee ranges."""
+        self.assertEqual(features.parse_employee_range("5,000-10,000"), (5000, 10000))
+        self.assertEqual(features.parse_employee_range("10,000+"), (10000, None))
+        self.assertEqual(features.format_employee_range(500, 1000), "500-1,000")
+        self.assertEqual(features.format_employee_range(10000, None), "10,000+")
+
+    def test_relative_times(self):
+        """Test parsing and formatting relative times."""
+        now = datetime(2024, 1, 15, 12, 0)
+        self.assertEqual(features.parse_relative_time("2 days ago", now), now - timedelta(days=2))
+        self.assertEqual(features.parse_relative_time("1 week ago", now), now - timedelta(weeks=1))
+        self.assertIsNone(features.parse_relative_time("last Tuesday", now))
+
+        self.assertEqual(features.format_relative_time(now - timedelta(days=2), now), "2 days ago")
+        self.assertEqual(features.format_relative_time(now - timedelta(days=8), now), "1 week ago")
+        self.assertEqual(features.format_relative_time(now, now), "just now")
+
+    def test_prospect_round_trip(self):
+        """Loading and serializing a prospect gives back its display strings."""
+        prospect = {
+            "id": "1",
+            "revenue": "$2.4B",
+            "purchasingVolume": "$180M",
+            "employees": "5,000-10,000",
+            "lastContact": "2 days ago",
+            "tradingHistory": [{"year": 2023, "volume": "$175M", "growth": "+12%"}],
+        }
+        now = datetime(2024, 1, 15, 12, 0)
+
+        record = features.load_prospect(prospect, now)
+        self.assertEqual(record["revenueUsd"], 2.4e9)
+        self.assertEqual((record["employeesMin"], record["employeesMax"]), (5000, 10000))
+        self.assertNotIn("revenue", record)
+
+        self.assertEqual(features.serialize_prospect(record, now), prospect)
+
+
+if __name__ == '__main__':
+    unittest.main()
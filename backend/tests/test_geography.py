@@ -0,0 +1,57 @@
+"""
+Tests for the geography service.
+"""
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.country import Country
+from app.models.region import Region
+from app.services import geography
+
+
+class TestGeography(unittest.TestCase):
+    """Test cases for the country and region dimension tables."""
+
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine, tables=[Region.__table__, Country.__table__])
+        self.db = sessionmaker(bind=engine)()
+        geography._index_cache.clear()
+        geography.seed_geography(self.db)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_seed_is_idempotent(self):
+        """Seeding again adds no rows."""
+        count = self.db.query(Country).count()
+        geography.seed_geography(self.db)
+
+        self.assertEqual(self.db.query(Country).count(), count)
+        self.assertEqual(self.db.query(Region).count(), len(geography.REGION_COUNTRIES))
+
+    def test_resolve_adds_unknown_countries(self):
+        """Known countries keep their codes and unknown ones are added without a region."""
+        germany = geography.get_geography(self.db).country_id("germany")
+        ids = geography.resolve_country_ids(self.db, ["Germany", "Vietnam"])
+
+        self.assertEqual(ids["Germany"], germany)
+        index = geography.get_geography(self.db)
+        self.assertEqual(index.country_names[ids["Vietnam"]], "Vietnam")
+        self.assertNotIn(ids["Vietnam"], index.country_regions)
+
+    def test_region_country_ids(self):
+        """Region filters resolve to the codes of their member countries."""
+        index = geography.get_geography(self.db)
+        codes = index.region_country_ids(["Europe", "Africa"])
+
+        self.assertEqual({index.country_names[code] for code in codes},
+                         set(geography.REGION_COUNTRIES["Europe"] + geography.REGION_COUNTRIES["Africa"]))
+        self.assertEqual(index.region_country_ids(["Antarctica"]), frozenset())
+
+
+if __name__ == '__main__':
+    unittest.main()
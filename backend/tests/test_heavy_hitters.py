@@ -0,0 +1,88 @@
+"""
+Tests for the heavy-hitters sketches and the product sketches built on them.
+"""
+import random
+import unittest
+from datetime import date
+
+from app.core.heavy_hitters import SpaceSaving, merge_estimates, merge_top
+from app.services.product_sketches import ProductSketches
+from app.services.trade_cube import TradeCube
+
+
+class TestSpaceSaving(unittest.TestCase):
+    """Test cases for the Space-Saving sketch."""
+
+    def test_exact_below_capacity(self):
+        """With fewer items than counters, counts are exact."""
+        sketch = SpaceSaving(4)
+        for item, weight in [("a", 5), ("b", 2), ("a", 1), ("c", 3)]:
+            sketch.update(item, weight)
+
+        self.assertEqual(merge_top([sketch], 2), [("a", 6, 0), ("c", 3, 0)])
+        self.assertEqual(sketch.floor, 0.0)
+
+    def test_error_bounds_hold(self):
+        """Every tracked count bounds the true total from above, within its error."""
+        rng = random.Random(1)
+        totals = {}
+        sketch = SpaceSaving(20)
+        for _ in range(5000):
+            # Skewed stream: a few items carry most of the weight
+            item = f"item-{min(int(rng.paretovariate(1.2)), 200)}"
+            weight = rng.uniform(1, 10)
+            totals[item] = totals.get(item, 0.0) + weight
+            sketch.update(item, weight)
+
+        for item, count in sketch.counts.items():
+            self.assertGreaterEqual(count + 1e-9, totals[item])
+            self.assertLessEqual(count - sketch.errors[item], totals[item] + 1e-9)
+        for item, total in totals.items():
+            if item not in sketch.counts:
+                self.assertLessEqual(total, sketch.floor + 1e-9)
+        self.assertEqual(merge_top([sketch], 1)[0].item, max(totals, key=totals.get))
+
+    def test_merge(self):
+        """Merged sketches add counts, and items a full sketch misses get its floor as error."""
+        first, second = SpaceSaving(2), SpaceSaving(2)
+        first.load([("a", 10), ("b", 4), ("c", 1)])
+        second.load([("a", 3), ("c", 2)])
+
+        top = merge_top([first, second], 3)
+        self.assertEqual(top[0], ("a", 13, 0))
+        self.assertEqual({hit.item: hit for hit in top}["c"], ("c", 6, 4))
+        self.assertEqual(merge_estimates([first, second], ["d"])["d"], ("d", 6, 6))
+
+
+class TestProductSketches(unittest.TestCase):
+    """Test cases for the product sketches seeded from the trade cube."""
+
+    def setUp(self):
+        records = []
+        for month in range(1, 13):
+            records.append((date(2024, month, 1), "Germany", "France", "API", "c1", "p1", "export", 10.0, 1))
+            records.append((date(2024, month, 1), "India", "Brazil", "FDF", "c2", "p2", "export", 4.0, 1))
+            records.append((date(2024, month, 1), "India", "Brazil", "FDF", "c2", "p3", "import", 99.0, 1))
+        self.sketches = ProductSketches.from_cube(TradeCube.from_records(records))
+
+    def test_top_by_region(self):
+        """Only export value of the selected regions is counted."""
+        top = self.sketches.top(5, 3, regions=["Asia Pacific"])
+        self.assertEqual([(hit.item, hit.count) for hit, _ in top], [("p2", 12.0)])
+        self.assertEqual([hit.item for hit, _ in self.sketches.top(5, 12)], ["p1", "p2"])
+
+    def test_update_with_ingested_rows(self):
+        """New transactions are counted into their month, moving the window forward."""
+        self.sketches.update([
+            {"period": date(2025, 1, 1), "source_country": "india", "product_type": "FDF", "product_id": "p2",
+             "flow_type": "export", "value": 50.0},
+        ])
+
+        hit, previous = self.sketches.top(1, 1)[0]
+        self.assertEqual((hit.item, hit.count), ("p2", 50.0))
+        self.assertEqual(previous.count, 4.0)
+        self.assertEqual(self.sketches.top(5, 1, product_types=["api"]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
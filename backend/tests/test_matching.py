@@ -0,0 +1,244 @@
+"""
+Tests for the matching service.
+"""
+import unittest
+import uuid
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.core import data_version
+from app.core.cache import VersionedCache
+from app.db.base import Base
+from app.models.company import Company
+from app.models.contact import Contact
+from app.models.country import Country
+from app.models.license import License
+from app.models.region import Region
+from app.models.transaction import Transaction
+from app.services import geography, matching
+from app.services.perplexity_client import RESEARCH_CACHE_TTL_HOURS
+from app.services.trade_cube import TradeCube, _query_records, set_trade_cube
+
+
+def create_test_session():
+    """Create an in-memory SQLite session with the tables the matching service reads."""
+    engine = create_engine("sqlite:///:memory:")
+    # The product table uses a PostgreSQL ARRAY column, so it is left out here
+    tables = [Region.__table__, Country.__table__, Company.__table__, Contact.__table__, License.__table__,
+              Transaction.__table__]
+    Base.metadata.create_all(bind=engine, tables=tables)
+    return engine, sessionmaker(bind=engine)()
+
+
+class TestLoadCompanyDetails(unittest.TestCase):
+    """Test cases for the database-backed prospect detail loader."""
+
+    def setUp(self):
+        # Without a trade cube, trading history is aggregated in SQL
+        set_trade_cube(None)
+        self.engine, self.db = create_test_session()
+        self.company = Company(name="MedCore Pharmaceuticals", country="Germany", sector="Generic Medications")
+        self.db.add(self.company)
+        self.db.flush()
+
+        product_id = uuid.uuid4()
+        self.db.add_all([
+            License(region="EU", status="active", authority="EMA", company_id=self.company.id,
+                    product_id=product_id, updated_at=datetime(2023, 3, 1)),
+            License(region="UK", status="expired", license_number="UK-1", company_id=self.company.id,
+                    product_id=product_id, updated_at=datetime(2022, 1, 1)),
+            Contact(name="Dr. Sarah Chen", role="Chief Procurement Officer", company_id=self.company.id),
+        ])
+        country_ids = geography.resolve_country_ids(self.db, ["India", "France", "Italy"])
+        for year, value, country in [(2022, 100e6, "France"), (2023, 60e6, "France"), (2023, 60e6, "Italy")]:
+            self.db.add(Transaction(
+                year=year, value=value, flow_type="import", source_country_id=country_ids["India"],
+                destination_country_id=country_ids[country], company_id=self.company.id, product_id=product_id,
+            ))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_details_are_aggregated(self):
+        """Trading history, compliance status, market presence and contacts are assembled."""
+        details = matching.load_company_details(self.db, [self.company.id])[str(self.company.id)]
+
+        self.assertEqual(details["name"], "MedCore Pharmaceuticals")
+        self.assertEqual(details["tradingHistory"], [
+            {"year": 2023, "volume": "$120M", "growth": "+20%"},
+            {"year": 2022, "volume": "$100M", "growth": "N/A"},
+        ])
+        self.assertEqual(details["marketPresence"], ["France", "Italy"])
+        self.assertEqual(details["complianceStatus"]["certifications"], ["EMA"])
+        self.assertEqual(details["complianceStatus"]["lastAudit"], "March 2023")
+        self.assertEqual(len(details["complianceStatus"]["issues"]), 1)
+        self.assertEqual([c["name"] for c in details["contacts"]], ["Dr. Sarah Chen"])
+
+    def test_employees(self):
+        """Employee range bounds are shown as a range, and the size class when they are missing."""
+        self.company.size = "Medium"
+        other = Company(name="Vaxo", country="France", size="Large", employees_min=5000, employees_max=10000)
+        self.db.add(other)
+        self.db.commit()
+
+        details = matching.load_company_details(self.db, [self.company.id, other.id])
+        self.assertEqual(details[str(self.company.id)]["employees"], "Medium")
+        self.assertEqual(details[str(other.id)]["employees"], "5,000-10,000")
+        self.assertNotIn("size", details[str(other.id)])
+
+    def test_fixed_number_of_queries(self):
+        """The loader issues the same number of queries however many companies are loaded."""
+        for i in range(5):
+            self.db.add(Company(name=f"Company {i}", country="France"))
+        self.db.commit()
+        company_ids = [c.id for c in self.db.query(Company).all()]
+        self.db.expunge_all()
+
+        statements = []
+        event.listen(self.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        details = matching.load_company_details(self.db, company_ids)
+
+        self.assertEqual(len(details), 6)
+        self.assertEqual(len(statements), 5)
+
+    def test_trading_history_from_growth_table(self):
+        """With a trade cube, trading history comes from its growth table without a transactions query."""
+        expected = matching.load_company_details(self.db, [self.company.id])
+        set_trade_cube(TradeCube.from_records(_query_records(self.db)))
+        self.db.expunge_all()
+        try:
+            statements = []
+            event.listen(self.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+            details = matching.load_company_details(self.db, [self.company.id])
+        finally:
+            set_trade_cube(None)
+
+        self.assertEqual(details, expected)
+        self.assertEqual(len(statements), 4)
+
+    def test_get_prospect_details_by_company_id(self):
+        """get_prospect_details resolves UUIDs against the database."""
+        details = matching.get_prospect_details(self.db, str(self.company.id))
+        self.assertEqual(details["id"], str(self.company.id))
+
+        self.assertEqual(matching.get_prospect_details(self.db, str(uuid.uuid4())), {})
+
+    def test_get_prospect_details_batch(self):
+        """Database, research and mock prospects are resolved in one batch call."""
+        store = VersionedCache()
+        store.set("research-1", {"id": "research-1", "name": "MediCorp", "segment": "Distributor", "location": "Germany"})
+        with patch("app.services.buyer_research._research_store", store):
+            details = matching.get_prospect_details_batch(
+                self.db, [str(self.company.id), "research-1", "1", "missing"], fields=["name"]
+            )
+
+        self.assertEqual(details, {
+            str(self.company.id): {"id": str(self.company.id), "name": "MedCore Pharmaceuticals"},
+            "research-1": {"id": "research-1", "name": "MediCorp"},
+            "1": {"id": "1", "name": "MedCore Pharmaceuticals"},
+        })
+
+
+class TestFindProspectsCache(unittest.TestCase):
+    """Test cases for the find_prospects result cache."""
+
+    def setUp(self):
+        matching._prospect_cache.clear()
+        matching._candidate_cache.clear()
+
+    def test_fingerprint_is_canonical(self):
+        """Order, casing and whitespace of the inputs do not change the fingerprint."""
+        a = matching.prospect_query_fingerprint(
+            "Test Pharma", ["Paracetamol", "Ibuprofen"], ["Europe", "Asia"], 10, True, "https://www.test.com/"
+        )
+        b = matching.prospect_query_fingerprint(
+            " test pharma", ["ibuprofen", "Paracetamol "], ["Asia", "Europe"], 10, True, "test.com"
+        )
+        c = matching.prospect_query_fingerprint(
+            "Test Pharma", ["Paracetamol", "Ibuprofen"], ["Europe", "Asia"], 5, True, "https://www.test.com/"
+        )
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+
+    def test_repeat_search_is_cached_until_data_changes(self):
+        """A repeated search is served from the cache until a data version is bumped."""
+        db = MagicMock()
+        args = (db, "Test Pharma", ["Paracetamol"], ["Europe"])
+
+        with patch.object(matching.entity_resolution, "merge_prospects",
+                          wraps=matching.entity_resolution.merge_prospects) as merge:
+            first = matching.find_prospects(*args)
+            second = matching.find_prospects(*args)
+            self.assertEqual(first, second)
+            self.assertEqual(merge.call_count, 1)
+
+            data_version.bump(data_version.TRADE)
+            matching.find_prospects(*args)
+            self.assertEqual(merge.call_count, 2)
+
+    @patch("app.core.cache.time.monotonic")
+    def test_cached_search_expires_with_research(self, mock_monotonic):
+        """Cached searches are recomputed once the research results they include have expired."""
+        db = MagicMock()
+        args = (db, "Test Pharma", ["Paracetamol"], ["Europe"])
+        mock_monotonic.return_value = 1000.0
+
+        with patch.object(matching.entity_resolution, "merge_prospects",
+                          wraps=matching.entity_resolution.merge_prospects) as merge:
+            matching.find_prospects(*args)
+            mock_monotonic.return_value += RESEARCH_CACHE_TTL_HOURS * 3600 - 1
+            matching.find_prospects(*args)
+            self.assertEqual(merge.call_count, 1)
+
+            mock_monotonic.return_value += 2
+            matching.find_prospects(*args)
+            self.assertEqual(merge.call_count, 2)
+
+
+class TestFindProspectsPagination(unittest.TestCase):
+    """Test cases for keyset pagination of prospects."""
+
+    def setUp(self):
+        matching._prospect_cache.clear()
+        matching._candidate_cache.clear()
+
+    def test_pages_cover_ranking_without_overlap(self):
+        """Following cursors walks the full ranking in order, without duplicates."""
+        db = MagicMock()
+        args = (db, "Test Pharma", ["Paracetamol"], ["Europe"])
+
+        seen = []
+        cursor = None
+        with patch.object(matching, "_collect_candidates", wraps=matching._collect_candidates) as collect:
+            while True:
+                page = matching.find_prospects_page(*args, limit=2, cursor=cursor)
+                seen.extend(page["items"])
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+            # Later pages are served from the kept candidate set
+            self.assertEqual(collect.call_count, 1)
+
+        expected = sorted(matching.MOCK_PROSPECTS, key=lambda p: (-p["opportunityScore"], p["id"]))
+        self.assertEqual([p["id"] for p in seen], [p["id"] for p in expected])
+
+    def test_empty_page(self):
+        """A zero page size returns no prospects and no cursor."""
+        page = matching.find_prospects_page(MagicMock(), "Test Pharma", ["Paracetamol"], ["Europe"], limit=0)
+        self.assertEqual(page, {"items": [], "next_cursor": None})
+
+    def test_cursor_round_trip(self):
+        """Cursors encode the (score, id) rank key of the last prospect."""
+        cursor = matching.encode_cursor({"id": "research-1", "opportunityScore": 75})
+        self.assertEqual(matching.decode_cursor(cursor), (-75.0, "research-1"))
+
+        with self.assertRaises(ValueError):
+            matching.decode_cursor("not-a-cursor")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+"""
+Tests for the search service and the product index.
+"""
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query, Session
+
+from app.core import data_version
+from app.core.config import settings
+from app.models.contact import Contact  # noqa: F401 - referenced by companies
+from app.models.country import Country  # noqa: F401 - referenced by transactions
+from app.models.license import License  # noqa: F401 - referenced by companies
+from app.models.region import Region  # noqa: F401 - referenced by countries
+from app.models.transaction import Transaction  # noqa: F401 - referenced by companies
+from app.services import contacts, search
+from app.services.product_index import EXACT, FUZZY, INFIX, PREFIX, ProductIndex
+
+CATALOGUE = [
+    {"id": "1", "api_name": "Acetylsalicylic Acid", "synonyms": ["Aspirin"], "code": "N02BA01"},
+    {"id": "2", "api_name": "Aspirin Glycine", "synonyms": [], "code": "N02BA51"},
+    {"id": "3", "api_name": "Paracetamol", "synonyms": ["Acetaminophen"], "code": "N02BE01"},
+    {"id": "4", "api_name": "Ascorbic Acid", "synonyms": ["Vitamin C"], "code": "A11GA01"},
+    {"id": "5", "api_name": "Lysine Acetylsalicylate", "synonyms": None, "code": None},
+]
+
+
+class TestProductIndex(unittest.TestCase):
+    """Test cases for the exact, prefix and infix product index."""
+
+    def setUp(self):
+        self.index = ProductIndex(CATALOGUE)
+
+    def test_ranked_by_match_type(self):
+        """Exact matches come before prefix matches, which come before infix matches."""
+        self.assertEqual(self.index.match("aspirin"), [(0, EXACT), (1, PREFIX)])
+        self.assertEqual(self.index.match("acet"), [(0, PREFIX), (2, PREFIX), (4, PREFIX)])
+        self.assertEqual(self.index.match("acid"), [(0, PREFIX), (3, PREFIX)])
+        self.assertEqual(self.index.match("salicyl"), [(0, INFIX), (4, INFIX)])
+
+    def test_codes_and_case(self):
+        """ATC codes are matched by prefix, case-insensitively and ignoring extra whitespace."""
+        self.assertEqual([p["id"] for p in self.index.search("n02b")], ["1", "2", "3"])
+        self.assertEqual([p["id"] for p in self.index.search("  VITAMIN   c ")], ["4"])
+
+    def test_limit(self):
+        """Results stop at the limit, across match types."""
+        self.assertEqual(self.index.match("a", limit=2), [(0, PREFIX), (1, PREFIX)])
+        self.assertEqual(self.index.match("ac", limit=0), [])
+        self.assertEqual(self.index.match("   "), [])
+
+    def test_matches_substring_scan(self):
+        """Exact, prefix and infix matches are the products found by scanning every field for the query."""
+        for query in ["a", "acid", "cet", "n02", "in", "c", "xyz", "vitamin c"]:
+            expected = {
+                p["id"] for p in CATALOGUE
+                if any(query in value.lower() for value in [p["api_name"], p["code"] or "", *(p["synonyms"] or [])])
+            }
+            found = {CATALOGUE[position]["id"] for position, kind in self.index.match(query, limit=10) if kind != FUZZY}
+            self.assertEqual(found, expected, query)
+
+    def test_fuzzy_matches(self):
+        """Misspelled queries that match nothing else match by trigram similarity."""
+        self.assertEqual(self.index.match("paracetemol"), [(2, FUZZY)])
+        self.assertEqual(self.index.match("acetylsalicilic"), [(0, FUZZY), (4, FUZZY)])
+        self.assertEqual(self.index.match("acetylsalicilic", threshold=0.5), [(0, FUZZY)])
+        self.assertEqual(self.index.match("zzz"), [])
+
+    def test_candidates_narrow_longer_queries(self):
+        """Matching among the fields containing a prefix of the query gives the same results."""
+        for query in ["a", "ac", "as", "n0", "vi", "sal"]:
+            candidates = self.index.candidates(query, 10)
+            for longer in [query + suffix for suffix in ["", "c", "ci", "cid", "pirin", "2b", "tamin c", "icyl"]]:
+                for allowed in [None, self.index.atc.mask("N02")]:
+                    self.assertEqual(self.index.match(longer, allowed=allowed, candidates=candidates),
+                                     self.index.match(longer, allowed=allowed), longer)
+            narrowed = self.index.candidates(query + "c", 10, within=candidates)
+            self.assertEqual(narrowed.tolist(), self.index.candidates(query + "c", 10).tolist())
+        self.assertIsNone(self.index.candidates("a", 2))
+        self.assertIsNone(self.index.candidates(" ", 10))
+
+    def test_resolve(self):
+        """Names, synonyms and codes resolve exactly, misspellings to the most similar field."""
+        self.assertEqual(self.index.resolve("ASPIRIN"), (0, EXACT, 1.0))
+        self.assertEqual(self.index.resolve("n02be01"), (2, EXACT, 1.0))
+        position, match_type, confidence = self.index.resolve("paracetemol")
+        self.assertEqual((position, match_type), (2, FUZZY))
+        self.assertLess(confidence, 1.0)
+        self.assertIsNone(self.index.resolve("paracetemol", threshold=0.9))
+        self.assertIsNone(self.index.resolve("zzz"))
+        self.assertIsNone(self.index.resolve("  "))
+
+
+class TestSearchProducts(unittest.TestCase):
+    """Test cases for product and company search."""
+
+    def test_index_is_rebuilt_when_products_change(self):
+        """The index is built once per product catalogue version."""
+        with patch.object(search, "ProductIndex", wraps=ProductIndex) as build:
+            data_version.bump(data_version.PRODUCT)
+            self.assertEqual([p["api_name"] for p in search.search_products(None, "prozac")], ["Fluoxetine"])
+            search.search_products(None, "amox")
+            self.assertEqual(build.call_count, 1)
+
+            data_version.bump(data_version.PRODUCT)
+            search.search_products(None, "amox")
+            self.assertEqual(build.call_count, 2)
+
+    def test_misspelled_names(self):
+        """Misspelled product and company names are found by similarity."""
+        self.assertEqual([p["api_name"] for p in search.search_products(None, "amoxycillin")], ["Amoxicillin"])
+        self.assertEqual([c["name"] for c in search.search_companies(None, "Novatis")], ["Novartis"])
+        self.assertEqual(search.search_companies(None, "Novatis", country="Germany"), [])
+        self.assertEqual(search.search_companies(None, "Novatis", threshold=0.9), [])
+
+    def test_fuzzy_only_without_term_matches(self):
+        """Companies matching the query are ranked by BM25 without adding similar names."""
+        names = [c["name"] for c in search.search_companies(None, "pharma")]
+        self.assertEqual(names, ["PharmaVision Corp", "BioPharma Solutions", "Teva Pharmaceutical",
+                                 "MedCore Pharmaceuticals", "Roche", "Johnson & Johnson"])
+        self.assertEqual([c["name"] for c in search.search_companies(None, "pharma", country="Brazil")],
+                         ["BioPharma Solutions"])
+
+    def test_typeahead_reuses_prefix_candidates(self):
+        """Each keystroke narrows down the candidates of the previous one, with unchanged results."""
+        search._product_typeahead_cache.clear()
+        search._company_typeahead_cache.clear()
+        for query in ["m", "me", "met", "metf"]:
+            expected = search.get_product_index(None).search(query)
+            self.assertEqual(search.search_products(None, query), expected)
+        for query in ["p", "ph", "pha", "pharma", "pharma x"]:
+            expected = search.search_companies(None, query)
+            index = search.get_company_search_index(None)
+            self.assertEqual(expected, [index.companies[position] for position, _ in index.search(query)])
+
+        stats = search.get_typeahead_stats()
+        self.assertEqual((stats["products"]["hits"], stats["products"]["misses"]), (3, 1))
+        self.assertEqual((stats["companies"]["hits"], stats["companies"]["misses"]), (3, 2))
+
+    def test_resolve_products(self):
+        """Each entry of a list is resolved in order, duplicates included."""
+        results = search.resolve_products(None, ["Advil", "j01ca04", "amoxicilin", "unknown product", "advil "])
+        self.assertEqual([r["id"] for r in results], ["2", "3", "3", None, "2"])
+        self.assertEqual([r["match"] for r in results], ["exact", "exact", "fuzzy", None, "exact"])
+        self.assertEqual(results[0], {"query": "Advil", "id": "2", "api_name": "Ibuprofen",
+                                      "match": "exact", "confidence": 1.0})
+        self.assertTrue(0.3 <= results[2]["confidence"] < 1.0)
+        self.assertEqual(results[3]["confidence"], 0.0)
+
+
+class TestDatabaseSearch(unittest.TestCase):
+    """Test cases for the queries of the database search backend, compiled for PostgreSQL."""
+
+    def queries(self, search_function, query):
+        """Run a database search in which no query finds anything and return the queries' SQL."""
+        statements = []
+
+        def all_rows(rows_query):
+            statements.append(str(rows_query.statement.compile(dialect=postgresql.dialect())))
+            return []
+
+        db = Session()
+        with patch.object(settings, "SEARCH_BACKEND", "database"), patch.object(settings, "USE_MOCK_DATA", False), \
+                patch.object(Query, "all", all_rows), patch.object(db, "execute"):
+            self.assertEqual(search_function(db, query), [])
+        return statements
+
+    def test_full_text_then_substring_queries(self):
+        """Each search ranks full-text matches with ts_rank, then falls back to substring matches."""
+        for search_function, name, fallbacks in [
+            (search.search_products, "product.api_name", 2),
+            (search.search_companies, "company.name", 2),
+            (contacts.search_contacts, "contact.name", 1),
+        ]:
+            table = name.split(".")[0]
+            statements = self.queries(search_function, "Joh")
+            self.assertEqual(len(statements), 1 + fallbacks, table)
+            self.assertIn(f"{table}.search_vector @@ websearch_to_tsquery('english'::regconfig, ", statements[0])
+            self.assertIn(f"ts_rank({table}.search_vector, websearch_to_tsquery(", statements[0])
+            self.assertIn(f"{name} ILIKE ", statements[1])
+            if fallbacks > 1:
+                self.assertIn(f"similarity({name}, ", statements[2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Tests for the trade ingest service.
+"""
+import tempfile
+import unittest
+import uuid
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core import data_version
+from app.db.base import Base
+from app.models.company import Company
+from app.models.contact import Contact  # noqa: F401 - referenced by companies
+from app.models.country import Country
+from app.models.license import License  # noqa: F401 - referenced by companies
+from app.models.product import Product  # noqa: F401 - referenced by transactions
+from app.models.region import Region
+from app.models.transaction import Transaction
+from app.services import geography, trade_cube, trade_ingest
+from app.services.trade_cube import set_trade_cube
+
+
+class TestIngestTransactions(unittest.TestCase):
+    """Test cases for loading batches of transactions."""
+
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:")
+        # The product table uses a PostgreSQL ARRAY column, so only the columns the trade cube reads are created
+        tables = [Region.__table__, Country.__table__, Company.__table__, Transaction.__table__]
+        Base.metadata.create_all(bind=engine, tables=tables)
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE product (id CHAR(32) PRIMARY KEY, api_name VARCHAR, therapeutic_category VARCHAR)"
+            ))
+        session_factory = sessionmaker(bind=engine)
+        data_version.track_session_changes(session_factory)
+        self.db = session_factory()
+        geography._index_cache.clear()
+        geography.seed_geography(self.db)
+
+    def tearDown(self):
+        self.db.close()
+        set_trade_cube(None)
+
+    def test_new_countries_bump_trade_once(self):
+        """A batch adding countries bumps the trade data once, after the derived data is refreshed."""
+        bumps = []
+
+        def listener(domains):
+            # Rows in the trade cube when the bump is seen
+            cube = trade_ingest.get_trade_cube()
+            bumps.append((domains, len(cube) if cube is not None else 0))
+
+        data_version.add_listener(listener)
+        try:
+            with tempfile.TemporaryDirectory() as directory, \
+                    patch.object(trade_cube.settings, "TRADE_CUBE_DIR", directory), \
+                    patch.object(trade_ingest, "get_growth_table"):
+                loaded = trade_ingest.ingest_transactions(self.db, [{
+                    "year": 2024, "month": 5, "value": 1e6, "qty": 10, "flow_type": "export",
+                    "company_id": uuid.uuid4(), "product_id": uuid.uuid4(), "product_type": "API",
+                    "source_country": "Vietnam", "destination_country": "Germany",
+                }])
+        finally:
+            data_version.remove_listener(listener)
+
+        self.assertEqual(loaded, 1)
+        self.assertEqual(bumps, [((data_version.TRADE,), 1)])
+        self.assertEqual(self.db.query(Country).filter(Country.name == "Vietnam").count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+Tests for trigram similarity.
+"""
+import random
+import unittest
+
+from app.core.trigrams import TrigramIndex, similarity, trigrams
+
+
+class TestTrigrams(unittest.TestCase):
+    """Test cases for pg_trgm-compatible trigram similarity."""
+
+    def test_pg_trgm_semantics(self):
+        """Words are lowercased and padded, and similarity matches pg_trgm's documented values."""
+        self.assertEqual(trigrams("Word"), {"  w", " wo", "wor", "ord", "rd "})
+        self.assertEqual(trigrams("a-b"), {"  a", " a ", "  b", " b "})
+        self.assertAlmostEqual(similarity("word", "two words"), 0.363636, places=6)
+        self.assertEqual(similarity("", "word"), 0.0)
+
+    def test_index_matches_pairwise_similarity(self):
+        """The index ranks texts by the same similarity as comparing them one by one."""
+        rng = random.Random(3)
+        words = ["amox", "icillin", "para", "cetamol", "nova", "rtis", "ibu", "profen", "sodium", "x1"]
+        texts = [" ".join(rng.choice(words) + rng.choice(words) for _ in range(rng.randint(1, 3))) for _ in range(300)]
+        texts += ["", "---", "Émulsion_crème"]
+        index = TrigramIndex(texts)
+
+        for query in ["amoxycillin", "paracetemol", "novatis sodium", "crème", "émulsion"]:
+            expected = sorted(
+                ((position, similarity(query, text)) for position, text in enumerate(texts)),
+                key=lambda pair: (-pair[1], pair[0]),
+            )
+            expected = [(position, score) for position, score in expected if score >= 0.2][:10]
+            found = index.search(query, threshold=0.2, limit=10)
+            self.assertEqual([position for position, _ in found], [position for position, _ in expected], query)
+            for (_, score), (_, expected_score) in zip(found, expected):
+                self.assertAlmostEqual(score, expected_score)
+
+    def test_unknown_characters(self):
+        """Query trigrams with characters no text has still count towards the query's trigrams."""
+        index = TrigramIndex(["abc"])
+        self.assertEqual(index.search("abcß", threshold=0), [(0, similarity("abcß", "abc"))])
+        self.assertEqual(TrigramIndex([]).search("abc"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()